@@ -1,6 +1,6 @@
 from datetime import timedelta
 from pathlib import Path
-import os, environ
+import os, environ, tempfile
 import dj_database_url
 from dotenv import load_dotenv
 
@@ -39,8 +39,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'edulog_app.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'edulog_app.middleware.AsyncWhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,6 +74,23 @@ DATABASES = {
     'default': env.db(),  # This will automatically use DATABASE_URL from the .env file
 }
 
+# Cache
+# The file backend is shared by every worker on the host, which the
+# response cache's version counters rely on (see edulog_app.response_cache).
+# Set CACHE_URL (e.g. redis://...) to share it across hosts.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='filecache://' + os.path.join(tempfile.gettempdir(), 'edulog-cache')),
+}
+RESPONSE_CACHE_SECONDS = int(os.getenv('RESPONSE_CACHE_SECONDS', 300))
+
+# Analytics snapshot mapped by every worker on the host (see
+# edulog_app.snapshot). An empty value disables it.
+ANALYTICS_SNAPSHOT_PATH = os.getenv('ANALYTICS_SNAPSHOT_PATH', os.path.join(tempfile.gettempdir(), 'edulog-snapshot.bin'))
+# Seconds a snapshot may lag writes; reads rebuild it in the background
+# before then. 0 serves only a current snapshot and never rebuilds it, so
+# `manage.py refresh_snapshot` has to be scheduled.
+ANALYTICS_SNAPSHOT_MAX_AGE = int(os.getenv('ANALYTICS_SNAPSHOT_MAX_AGE', 60))
+
 # Security Headers
 SECURE_SSL_REDIRECT = not DEBUG
 SESSION_COOKIE_SECURE = not DEBUG
@@ -91,22 +109,68 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# AttendanceLog retention (see edulog_app.log_archive and `manage.py archive_logs`).
+# Archived rows are deleted from the database, so the archive directory must
+# be durable storage every instance sees (e.g. a mounted persistent disk),
+# never the ephemeral app filesystem. Unset, archive_logs refuses to run.
+ATTENDANCE_LOG_RETENTION_DAYS = int(os.getenv('ATTENDANCE_LOG_RETENTION_DAYS', 180))
+ATTENDANCE_LOG_ARCHIVE_DIR = os.getenv('ATTENDANCE_LOG_ARCHIVE_DIR') or None
+
+# Write-behind buffering for login_log/logout_log (see edulog_app.log_buffer)
+ATTENDANCE_LOG_BUFFER = os.getenv('ATTENDANCE_LOG_BUFFER', 'False') == 'True'
+ATTENDANCE_LOG_BUFFER_SIZE = int(os.getenv('ATTENDANCE_LOG_BUFFER_SIZE', 500))
+ATTENDANCE_LOG_FLUSH_INTERVAL = float(os.getenv('ATTENDANCE_LOG_FLUSH_INTERVAL', 1.0))
+ATTENDANCE_LOG_BUFFER_MAX = int(os.getenv('ATTENDANCE_LOG_BUFFER_MAX', 10000))
+
+# First month of the academic year, for the per-student attendance
+# calendars (see edulog_app.attendance_calendar). After changing it, delete
+# the StudentAttendanceCalendar rows; they are rebuilt on next access.
+ACADEMIC_YEAR_START_MONTH = int(os.getenv('ACADEMIC_YEAR_START_MONTH', 1))
+
+# Seconds to cache the /api/dashboard/ payload (0 disables caching)
+DASHBOARD_CACHE_SECONDS = int(os.getenv('DASHBOARD_CACHE_SECONDS', 0))
+
+# Dashboard live feed (see edulog_app.live_feed). LocalBroker only reaches
+# streams in the publishing worker; with several workers use
+# edulog_app.live_feed.UnixSocketBroker, which relays through sockets in
+# LIVE_FEED_SOCKET_DIR to every worker on the host.
+LIVE_FEED_BROKER = os.getenv('LIVE_FEED_BROKER', 'edulog_app.live_feed.LocalBroker')
+LIVE_FEED_SOCKET_DIR = os.getenv('LIVE_FEED_SOCKET_DIR', os.path.join(tempfile.gettempdir(), 'edulog-live-feed'))
+LIVE_FEED_HEARTBEAT_SECONDS = int(os.getenv('LIVE_FEED_HEARTBEAT_SECONDS', 15))
+
+# Processes hashing initial passwords in the import_roster command (see
+# edulog_app.roster); 1 hashes in the importing process. The upload
+# endpoint always hashes in the request's own process.
+ROSTER_IMPORT_WORKERS = int(os.getenv('ROSTER_IMPORT_WORKERS', os.cpu_count() or 1))
+
+# Query counts and database time per request (see
+# edulog_app.middleware.QueryInstrumentationMiddleware): the fraction of
+# requests instrumented, and when one of them is logged as slow
+DB_INSTRUMENTATION_SAMPLE_RATE = float(os.getenv('DB_INSTRUMENTATION_SAMPLE_RATE', 1.0 if DEBUG else 0.02))
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_QUERIES = int(os.getenv('SLOW_REQUEST_QUERIES', 50))
+SLOW_REQUEST_TOP_QUERIES = int(os.getenv('SLOW_REQUEST_TOP_QUERIES', 5))
+
 # Authentication
 AUTH_USER_MODEL = "edulog_app.CustomUser"
+# EmailAuthBackend also serves the admin login and ModelBackend's
+# permission checks; a second backend would hash every failed password again
 AUTHENTICATION_BACKENDS = [
     'edulog_app.backends.EmailAuthBackend',
-    'django.contrib.auth.backends.ModelBackend',
 ]
 
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'edulog_app.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 }
+# Default page size of the list views paginated with
+# edulog_app.pagination.KeysetPagination; ?page_size= overrides it
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', 100))
 
 # CORS
 CORS_ALLOW_ALL_ORIGINS = False
@@ -124,6 +188,10 @@ SIMPLE_JWT = {
     "BLACKLIST_AFTER_ROTATION": True,
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
+# Authenticated users are served from an in-process cache (see
+# edulog_app.authentication); 0 disables it
+JWT_USER_CACHE_SIZE = int(os.getenv('JWT_USER_CACHE_SIZE', 10000))
+JWT_USER_CACHE_SECONDS = int(os.getenv('JWT_USER_CACHE_SECONDS', 60))
 
 # Internationalization
 LANGUAGE_CODE = 'en-us'
@@ -152,6 +220,14 @@ LOGGING = {
         'handlers': ['console'],
         'level': 'WARNING',
     },
+    'loggers': {
+        # One JSON object per slow request (see SLOW_REQUEST_MS)
+        'edulog.slow_requests': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
 }
 
 # Silenced system checks
@@ -14,21 +14,29 @@ urlpatterns = [
     path('auth-users/', include('rest_framework.urls', namespace='rest_framework')),
     path('api/login/', views.LoginUserView.as_view(), name="login"),
     path('api/register/', views.RegisterUserView.as_view(), name='register'),
+    path('api/dashboard/', views.DashboardView.as_view(), name='dashboard'),
+    path('api/analytics/cohort/', views.CohortAnalyticsView.as_view(), name='cohort-analytics'),
+    path('api/cache/stats/', views.ResponseCacheStatsView.as_view(), name='response-cache-stats'),
     path('api/students/stats/department-wise/', views.DepartmentStatsView.as_view(), name='department-stats'),
+    path('api/students/import/', views.RosterImportView.as_view(), name='roster-import'),
     path('api/students/<int:student_id>/details/', views.StudentDetailView.as_view(), name='student-detail'),
     path('api/attendance/<int:student_id>/', views.AttendanceStatsView.as_view(), name='attendance-stats'),
     path('api/attendance/clock-in/', views.ClockInView.as_view(), name='clock-in'),
     path('api/attendance/clock-out/', views.ClockOutView.as_view(), name='clock-out'),
+    path('api/attendance/clock-batch/', views.BatchClockView.as_view(), name='clock-batch'),
     path('api/attendance/stats/total-students/', views.TotalStudentsView.as_view(), name = 'total-students'),
     path('api/attendance/stats/attendance-today/', views.AttendanceTodayView.as_view(), name = 'attendance-today'),
     path('api/attendance/update/<int:pk>/', views.AttendanceUpdateView.as_view(), name = 'attendance-update'),
     path('api/attendance/stats/absent-students/', views.AbsentStudentsView.as_view(), name = 'absent-students'),
     path('api/attendance/stats/percentage/', views.AttendancePercentageView.as_view(), name = 'percentage'),
     path('api/attendance/reports/', views.StudentReportView.as_view(), name = 'student-reports'),
+    path('api/attendance/reports/export/', views.AttendanceExportView.as_view(), name = 'attendance-export'),
     path('api/attendance/reports/filters/', views.ReportFilterOptionsView.as_view(), name = 'student-reports-filters'),
     path('api/attendance/reports/students/', views.StudentSearchView.as_view(), name = 'student-reports'),
     path('api/attendance/<int:student_id>/status/', views.AttendanceStatusView.as_view(), name='attendance-status'),
+    path('api/attendance/<int:student_id>/calendar/', views.AttendanceCalendarView.as_view(), name='attendance-calendar'),
     path('api/attendance/recent-logs/', views.RecentAttendanceLogsView.as_view(), name='recent-logs'),
+    path('api/attendance/live/', views.LiveFeedView.as_view(), name='live-feed'),
     path('api/events/upcoming/', views.UpcomingEventsView.as_view(), name='upcoming-events'),
     path('api/attendance/records/', views.AttendanceRecordListCreateView.as_view(), name='attendance-records'),
     path('api/attendance/records/<int:pk>/', views.AttendanceRecordRetrieveUpdateView.as_view(), name='attendance-record-detail'),
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Attendance, AttendanceLog, Department, Student, SchoolEvent
+from .models import CustomUser, Attendance, AttendanceLog, Department, Student, SchoolEvent, DailyAttendanceRollup, StudentAttendanceCounter, StudentMonthlyAttendance, StudentAttendanceCalendar, AttendanceLogArchive
 
 class CustomUserAdmin(UserAdmin):
     list_display = ('email', 'username', 'role', 'is_staff', 'is_active')
@@ -24,4 +24,8 @@ admin.site.register(AttendanceLog)
 admin.site.register(Department)
 admin.site.register(Student)
 admin.site.register(SchoolEvent)
-
+admin.site.register(DailyAttendanceRollup)
+admin.site.register(StudentAttendanceCounter)
+admin.site.register(StudentMonthlyAttendance)
+admin.site.register(StudentAttendanceCalendar)
+admin.site.register(AttendanceLogArchive)
\ No newline at end of file
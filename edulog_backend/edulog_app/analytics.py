@@ -0,0 +1,219 @@
+"""
+Vectorized cohort analytics over a students x days matrix of attendance codes.
+
+The matrix is unpacked from the per-student yearly calendars
+(edulog_app.attendance_calendar): one 92-byte row per student per year
+instead of one Attendance row per student per school day, decoded with
+NumPy shifts. Calendars that do not exist yet are built from raw
+Attendance first; years outside the attendance data are all blank and
+read nothing. Every metric is then computed for all students at once:
+
+* attendance and absence rates over the range, and chronic absenteeism
+  (absent on at least `threshold` of the student's school days);
+* school-wide rolling attendance rates over the trailing 7 and 30 days,
+  from cumulative sums;
+* per-student absence rate over the last 30 days, current attendance
+  streak and longest absence run (days without a record are skipped);
+* per-department rates and chronic absentee counts, from bincounts.
+"""
+from datetime import timedelta
+
+import numpy as np
+
+from .attendance_calendar import (
+    ABSENT, CALENDAR_BYTES, LATE, NONE, PRESENT, academic_year, build_calendars, day_index, recorded_years,
+    year_start,
+)
+from .models import CustomUser, Department, StudentAttendanceCalendar
+
+CHRONIC_THRESHOLD = 0.1
+TREND_WINDOWS = (7, 30)
+RECENT_DAYS = 30
+SHIFTS = np.arange(0, 8, 2, dtype=np.uint8)
+
+
+def decode_calendars(blobs):
+    """Stack calendar blobs into a len(blobs) x (4 * CALENDAR_BYTES) matrix of day codes."""
+    packed = np.frombuffer(b''.join(blobs), dtype=np.uint8).reshape(len(blobs), CALENDAR_BYTES)
+    return ((packed[:, :, None] >> SHIFTS) & 3).reshape(len(blobs), -1)
+
+
+def load_codes(start_date, end_date, department_id=None):
+    """
+    Return (students, codes): the students as (id, username, student_id,
+    department_id) tuples ordered by id, and a matching students x days
+    uint8 matrix of codes for every day from start_date to end_date.
+    """
+    students = CustomUser.objects.filter(role='student')
+    if department_id is not None:
+        students = students.filter(department_id=department_id)
+    students = list(students.order_by('id').values_list('id', 'username', 'student_id', 'department_id'))
+    positions = {student[0]: index for index, student in enumerate(students)}
+
+    parts = []
+    recorded = recorded_years()
+    for year in range(academic_year(start_date), academic_year(end_date) + 1):
+        first = max(start_date, year_start(year))
+        last = min(end_date, year_start(year + 1) - timedelta(days=1))
+        if year not in recorded:
+            parts.append(np.zeros((len(students), (last - first).days + 1), dtype=np.uint8))
+            continue
+        calendars = StudentAttendanceCalendar.objects.filter(year=year, user__role='student')
+        if department_id is not None:
+            calendars = calendars.filter(user__department_id=department_id)
+        # Ignore students that joined after the list above was read
+        calendars = {user_id: bits for user_id, bits in calendars.values_list('user_id', 'bits') if user_id in positions}
+        missing = [(user_id, year) for user_id in positions if user_id not in calendars]
+        if missing:
+            built = build_calendars(missing)
+            StudentAttendanceCalendar.objects.bulk_create([
+                StudentAttendanceCalendar(user_id=user_id, year=year, bits=bits)
+                for (user_id, year), bits in built.items()
+            ], batch_size=2000, ignore_conflicts=True)
+            calendars.update((user_id, bits) for (user_id, _), bits in built.items())
+
+        year_codes = np.zeros((len(students), (last - first).days + 1), dtype=np.uint8)
+        if calendars:
+            rows = np.fromiter((positions[user_id] for user_id in calendars), dtype=np.int64, count=len(calendars))
+            decoded = decode_calendars(list(calendars.values()))
+            year_codes[rows] = decoded[:, day_index(first, year):day_index(last, year) + 1]
+        parts.append(year_codes)
+    codes = np.concatenate(parts, axis=1) if parts else np.zeros((len(students), 0), dtype=np.uint8)
+    return students, codes
+
+
+def _rate(numerator, denominator):
+    """numerator / denominator, NaN where the denominator is zero."""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    return np.divide(numerator, denominator, out=np.full(numerator.shape, np.nan), where=np.asarray(denominator) > 0)
+
+
+def rolling_rate(numerator, denominator, window):
+    """Trailing `window`-day rate for each day of two per-day count series."""
+    numerator = np.concatenate(([0], np.cumsum(numerator)))
+    denominator = np.concatenate(([0], np.cumsum(denominator)))
+    end = np.arange(1, len(numerator))
+    start = np.maximum(end - window, 0)
+    return _rate(numerator[end] - numerator[start], denominator[end] - denominator[start])
+
+
+def streaks(attended, absent):
+    """
+    (current attendance streak, longest absence run) per student. Walks
+    the days once, updating every student per step; a day with neither
+    flag set leaves both runs as they were.
+    """
+    current = np.zeros(attended.shape[0], dtype=np.int32)
+    absence_run = np.zeros_like(current)
+    longest_absence = np.zeros_like(current)
+    for day in range(attended.shape[1]):
+        came, missed = attended[:, day], absent[:, day]
+        current = np.where(came, current + 1, np.where(missed, 0, current))
+        absence_run = np.where(missed, absence_run + 1, np.where(came, 0, absence_run))
+        np.maximum(longest_absence, absence_run, out=longest_absence)
+    return current, longest_absence
+
+
+def cohort_metrics(codes, groups, threshold=CHRONIC_THRESHOLD):
+    """
+    Metrics for a students x days code matrix. `groups` gives each
+    student's department as an index from 0; returns a dict of arrays.
+    """
+    recorded = codes != NONE
+    attended = (codes == PRESENT) | (codes == LATE)
+    absent = codes == ABSENT
+
+    school_days = recorded.sum(axis=1)
+    attended_days = attended.sum(axis=1)
+    absences = absent.sum(axis=1)
+    absence_rate = _rate(absences, school_days)
+    chronic = np.nan_to_num(absence_rate, nan=0.0) >= threshold
+    current_streak, longest_absence = streaks(attended, absent)
+
+    daily_attended = attended.sum(axis=0)
+    daily_recorded = recorded.sum(axis=0)
+    group_count = int(groups.max()) + 1 if len(groups) else 0
+    group_recorded = np.bincount(groups, weights=school_days, minlength=group_count)
+    return {
+        'school_days': school_days,
+        'attended_days': attended_days,
+        'absences': absences,
+        'lates': (codes == LATE).sum(axis=1),
+        'attendance_rate': _rate(attended_days, school_days),
+        'absence_rate': absence_rate,
+        'recent_absence_rate': _rate(absent[:, -RECENT_DAYS:].sum(axis=1), recorded[:, -RECENT_DAYS:].sum(axis=1)),
+        'chronic': chronic,
+        'current_streak': current_streak,
+        'longest_absence': longest_absence,
+        'daily_rate': _rate(daily_attended, daily_recorded),
+        'rolling_rates': {window: rolling_rate(daily_attended, daily_recorded, window) for window in TREND_WINDOWS},
+        'school_rate': _rate(attended_days.sum(), school_days.sum()),
+        'group_students': np.bincount(groups, minlength=group_count),
+        'group_rate': _rate(np.bincount(groups, weights=attended_days, minlength=group_count), group_recorded),
+        'group_chronic': np.bincount(groups, weights=chronic, minlength=group_count).astype(np.int64),
+    }
+
+
+def _number(value, digits=4):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def cohort_report(start_date, end_date, department_id=None, threshold=CHRONIC_THRESHOLD, limit=100):
+    """JSON-ready cohort analytics for start_date..end_date (inclusive)."""
+    students, codes = load_codes(start_date, end_date, department_id)
+    departments = dict(Department.objects.values_list('id', 'name'))
+    # Department ids as dense group indexes; the last group is "no department"
+    group_ids = sorted(departments) + [None]
+    group_index = {department: index for index, department in enumerate(group_ids)}
+    groups = np.array([group_index.get(student[3], len(group_ids) - 1) for student in students], dtype=np.int64)
+    metrics = cohort_metrics(codes, groups, threshold)
+
+    chronic = np.flatnonzero(metrics['chronic'])
+    # Worst first: highest absence rate, then most absences
+    chronic = chronic[np.lexsort((-metrics['absences'][chronic], -metrics['absence_rate'][chronic]))][:limit]
+    days = [start_date + timedelta(days=offset) for offset in range(codes.shape[1])]
+
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'students': len(students),
+        'attendance_rate': _number(metrics['school_rate']),
+        'chronic_threshold': threshold,
+        'chronic_count': int(metrics['chronic'].sum()),
+        'chronic_students': [
+            {
+                'id': students[index][0],
+                'username': students[index][1],
+                'student_id': students[index][2],
+                'department': departments.get(students[index][3]),
+                'school_days': int(metrics['school_days'][index]),
+                'absences': int(metrics['absences'][index]),
+                'absence_rate': _number(metrics['absence_rate'][index]),
+                'recent_absence_rate': _number(metrics['recent_absence_rate'][index]),
+                'current_streak': int(metrics['current_streak'][index]),
+                'longest_absence': int(metrics['longest_absence'][index]),
+            }
+            for index in chronic
+        ],
+        'trend': [
+            {
+                'date': day,
+                'rate': _number(metrics['daily_rate'][offset]),
+                **{f'rate_{window}d': _number(rates[offset]) for window, rates in metrics['rolling_rates'].items()},
+            }
+            for offset, day in enumerate(days)
+        ],
+        'departments': [
+            {
+                'id': department,
+                'name': departments.get(department, 'N/A'),
+                'students': int(metrics['group_students'][index]),
+                'attendance_rate': _number(metrics['group_rate'][index]),
+                'difference': _number(metrics['group_rate'][index] - metrics['school_rate']),
+                'chronic_count': int(metrics['group_chronic'][index]),
+            }
+            for index, department in enumerate(group_ids)
+            if index < len(metrics['group_students']) and metrics['group_students'][index]
+        ],
+    }
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EdulogAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'edulog_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,70 @@
+"""
+APIView for `async def` handlers.
+
+DRF's APIView.dispatch is synchronous. Under ASGI, Django would run a
+view like that in a worker thread, so a request waiting on the database
+holds a thread for the whole wait. AsyncAPIView awaits the handler on the
+event loop, so one process can keep many requests waiting on the database
+at once. Authentication awaits aauthenticate() where an authenticator has
+one (see edulog_app.authentication); the others run in a thread.
+Permission and throttle checks stay synchronous and must not query.
+
+Under WSGI, Django runs these views through async_to_sync, so they keep
+working there, just without the concurrency.
+"""
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+
+    async def aperform_authentication(self, request):
+        """Request._authenticate(), awaiting each authenticator."""
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, 'aauthenticate'):
+                    user_auth_tuple = await authenticator.aauthenticate(request)
+                else:
+                    user_auth_tuple = await sync_to_async(authenticator.authenticate)(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    async def ainitial(self, request, *args, **kwargs):
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        request.accepted_renderer, request.accepted_media_type = self.perform_content_negotiation(request)
+        request.version, request.versioning_scheme = self.determine_version(request, *args, **kwargs)
+
+        await self.aperform_authentication(request)
+        self.check_permissions(request)
+        self.check_throttles(request)
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    # Django requires every handler of an async view to be async
+    async def options(self, request, *args, **kwargs):
+        return super().options(request, *args, **kwargs)
@@ -0,0 +1,193 @@
+"""
+Per-student yearly attendance calendars packed two bits per day.
+
+Day i of an academic year (counted from the 1st of
+settings.ACADEMIC_YEAR_START_MONTH) is held in bits 2i and 2i+1 of a
+little-endian integer, so a year fits in 92 bytes and is one row read.
+Codes: 0 no record (weekend, holiday, not yet happened), 1 present (a
+pending clock-in counts as present), 2 absent, 3 late.
+
+Writes assign a day's code rather than applying a delta, so replaying a
+change is harmless. The streak helpers work on the whole year at once
+with masks and popcounts.
+"""
+import base64
+from datetime import date
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+
+from .models import Attendance, StudentAttendanceCalendar
+
+NONE, PRESENT, ABSENT, LATE = 0, 1, 2, 3
+CODE_NAMES = ['none', 'present', 'absent', 'late']
+STATUS_CODES = {'present': PRESENT, 'pending': PRESENT, 'absent': ABSENT, 'late': LATE}
+YEAR_DAYS = 366
+CALENDAR_BYTES = (YEAR_DAYS * 2 + 7) // 8
+# The low bit of every day's pair
+LOW_BITS = int.from_bytes(b'\x55' * CALENDAR_BYTES, 'little')
+# Calendars can be asked for this many academic years either side of the current one
+YEAR_WINDOW = 50
+
+
+def academic_year(day):
+    """The calendar year in which the academic year containing `day` starts."""
+    return day.year if day.month >= settings.ACADEMIC_YEAR_START_MONTH else day.year - 1
+
+
+def served_years(today):
+    """The academic years a calendar may be asked for, as a range."""
+    current = academic_year(today)
+    return range(current - YEAR_WINDOW, current + YEAR_WINDOW + 1)
+
+
+def recorded_years():
+    """The academic years from the first to the last Attendance date, as a range."""
+    dates = Attendance.objects.aggregate(first=Min('date'), last=Max('date'))
+    if dates['first'] is None:
+        return range(0)
+    return range(academic_year(dates['first']), academic_year(dates['last']) + 1)
+
+
+def year_start(year):
+    return date(year, settings.ACADEMIC_YEAR_START_MONTH, 1)
+
+
+def year_days(year):
+    return (year_start(year + 1) - year_start(year)).days
+
+
+def day_index(day, year):
+    return (day - year_start(year)).days
+
+
+def set_days(bits, codes):
+    """`bits` with each {day index: code} in `codes` assigned."""
+    value = int.from_bytes(bits, 'little')
+    for index, code in codes.items():
+        value = value & ~(3 << 2 * index) | code << 2 * index
+    return value.to_bytes(CALENDAR_BYTES, 'little')
+
+
+def day_codes(bits, year):
+    """The code of every day of `year`, in order."""
+    value = int.from_bytes(bits, 'little')
+    return [value >> 2 * index & 3 for index in range(year_days(year))]
+
+
+def encode(bits):
+    return base64.b64encode(bits).decode('ascii')
+
+
+def status_mask(bits, code):
+    """Bit 2i set where day i has `code`."""
+    value = int.from_bytes(bits, 'little')
+    low = value & LOW_BITS
+    high = value >> 1 & LOW_BITS
+    return {
+        NONE: LOW_BITS & ~(low | high),
+        PRESENT: low & ~high,
+        ABSENT: high & ~low,
+        LATE: low & high,
+    }[code]
+
+
+def _longest_between(counted, breaks):
+    """The most `counted` bits lying between two consecutive `breaks` bits (or the ends)."""
+    best = 0
+    while breaks:
+        lowest = breaks & -breaks
+        best = max(best, (counted & (lowest - 1)).bit_count())
+        counted &= ~((lowest << 1) - 1)
+        breaks ^= lowest
+    return max(best, counted.bit_count())
+
+
+def longest_streak(bits):
+    """Most attended (present or late) school days in a row; days without a record are skipped."""
+    return _longest_between(status_mask(bits, PRESENT) | status_mask(bits, LATE), status_mask(bits, ABSENT))
+
+
+def longest_absence(bits):
+    """Most absent school days in a row; days without a record are skipped."""
+    return _longest_between(status_mask(bits, ABSENT), status_mask(bits, PRESENT) | status_mask(bits, LATE))
+
+
+def current_streak(bits, through):
+    """Attended school days since the last absence on or before day index `through`."""
+    window = (1 << 2 * through + 2) - 1
+    absent = status_mask(bits, ABSENT) & window
+    attended = (status_mask(bits, PRESENT) | status_mask(bits, LATE)) & window
+    return (attended >> absent.bit_length()).bit_count()
+
+
+def build_calendars(keys):
+    """{(user_id, year): bits} for `keys`, read from raw Attendance."""
+    codes = {key: {} for key in keys}
+    for year in {year for _, year in keys}:
+        user_ids = [user_id for user_id, key_year in keys if key_year == year]
+        records = Attendance.objects.filter(
+            user_id__in=user_ids, date__gte=year_start(year), date__lt=year_start(year + 1),
+        ).values_list('user_id', 'date', 'status')
+        for user_id, day, status in records:
+            codes[(user_id, year)][day_index(day, year)] = STATUS_CODES.get(status, NONE)
+    return {key: set_days(bytes(CALENDAR_BYTES), key_codes) for key, key_codes in codes.items()}
+
+
+def _locked_calendars(keys):
+    rows = {}
+    for year in sorted({year for _, year in keys}):
+        user_ids = sorted(user_id for user_id, key_year in keys if key_year == year)
+        for row in StudentAttendanceCalendar.objects.select_for_update().filter(year=year, user_id__in=user_ids).order_by('user_id'):
+            rows[(row.user_id, row.year)] = row
+    return rows
+
+
+def apply_calendar_changes(changes):
+    """
+    Apply (previous, current) AttendanceState pairs to the calendars.
+    Calendars that do not exist yet are built from raw Attendance first;
+    since days are assigned, it does not matter whether the change itself
+    has been written yet.
+    """
+    codes = {}
+    for previous, current in changes:
+        for state, removed in ((previous, True), (current, False)):
+            if state is None:
+                continue
+            year = academic_year(state.date)
+            code = NONE if removed else STATUS_CODES.get(state.status, NONE)
+            codes.setdefault((state.user_id, year), {})[day_index(state.date, year)] = code
+    if not codes:
+        return
+
+    with transaction.atomic(savepoint=False):
+        rows = _locked_calendars(codes)
+        missing = [key for key in codes if key not in rows]
+        if missing:
+            StudentAttendanceCalendar.objects.bulk_create([
+                StudentAttendanceCalendar(user_id=user_id, year=year, bits=bits)
+                for (user_id, year), bits in build_calendars(missing).items()
+            ], ignore_conflicts=True)
+            rows.update(_locked_calendars(missing))
+        for key, row in rows.items():
+            row.bits = set_days(bytes(row.bits), codes[key])
+        StudentAttendanceCalendar.objects.bulk_update(list(rows.values()), ['bits'])
+
+
+def get_calendar(user_id, year):
+    """
+    A user's calendar bits for `year`, building the row on first access.
+    Years outside the attendance data are empty and not stored; their row
+    is created by the first write of that year.
+    """
+    bits = StudentAttendanceCalendar.objects.filter(user_id=user_id, year=year).values_list('bits', flat=True).first()
+    if bits is None:
+        if year not in recorded_years():
+            return bytes(CALENDAR_BYTES)
+        bits = build_calendars([(user_id, year)])[(user_id, year)]
+        StudentAttendanceCalendar.objects.bulk_create(
+            [StudentAttendanceCalendar(user_id=user_id, year=year, bits=bits)], ignore_conflicts=True,
+        )
+    return bytes(bits)
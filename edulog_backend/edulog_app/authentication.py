@@ -0,0 +1,125 @@
+"""
+JWT authentication without a user query per request.
+
+Access tokens issued at login carry the user's role, student_id and
+is_active as claims, so clients can read them without asking the API.
+Requests are authenticated from a bounded in-process LRU cache of users
+keyed by id. Only a miss loads the row, and a save or delete of the user
+evicts it (see edulog_app.signals).
+
+Entries also expire after JWT_USER_CACHE_SECONDS. Eviction only reaches
+the process that made the change, so that TTL bounds how long another
+worker can keep serving a deactivated user or an old role. Requests still
+get a full CustomUser rather than an object built from claims, because
+views write through request.user (as a foreign key, with its department
+read by the rollup signals).
+
+Async views (edulog_app.async_views) authenticate with aauthenticate():
+a cache hit never leaves the event loop, and only a miss loads the user
+in a worker thread.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh token whose claims (copied into its access token) describe the user."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token['role'] = user.role
+        token['student_id'] = user.student_id
+        token['is_active'] = user.is_active
+        return token
+
+
+class UserCache:
+    """Thread-safe LRU of users by id, with a per-entry TTL."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] < time.monotonic():
+                self._entries.pop(user_id, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            # Each request gets its own copy to modify
+            return copy.copy(entry[0])
+
+    def set(self, user_id, user):
+        if not settings.JWT_USER_CACHE_SIZE:
+            return
+        with self._lock:
+            self._entries[user_id] = (copy.copy(user), time.monotonic() + settings.JWT_USER_CACHE_SECONDS)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > settings.JWT_USER_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that loads the user from `user_cache` when it can."""
+
+    def get_cached_user(self, validated_token):
+        """The token's user from `user_cache`, or None on a miss."""
+        try:
+            user_id = self.user_model._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        user = user_cache.get(user_id)
+        if user is not None and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user_id, user
+
+    def get_user(self, validated_token):
+        user_id, user = self.get_cached_user(validated_token)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        return user
+
+    async def aget_user(self, validated_token):
+        user_id, user = self.get_cached_user(validated_token)
+        if user is None:
+            user = await sync_to_async(super().get_user)(validated_token)
+            user_cache.set(user_id, user)
+        return user
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views; the token checks themselves do no I/O."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
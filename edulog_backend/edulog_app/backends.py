@@ -4,18 +4,32 @@ from django.contrib.auth.backends import ModelBackend  # Changed from BaseBacken
 User = get_user_model()
 
 class EmailAuthBackend(ModelBackend):
+    """
+    The only authentication backend: one lookup by email and exactly one
+    password hash per attempt, hit or miss. Also accepts `username`, which
+    the admin login form sends, so nothing falls through to a second
+    backend that would hash the password again.
+    """
     def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None:
+            email = kwargs.get(User.USERNAME_FIELD, kwargs.get('username'))
+        if email is None or password is None:
+            return None
         try:
             user = User.objects.get(email=email)
-            if user.check_password(password) and self.user_can_authenticate(user):
-                return user
-            return None
         except User.DoesNotExist:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            User().set_password(password)
             return None
+        # check_password re-hashes and saves the password when the hasher
+        # or its work factor has changed since it was stored
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
 
     def get_user(self, user_id):
         try:
             user = User.objects.get(pk=user_id)
             return user if self.user_can_authenticate(user) else None
         except User.DoesNotExist:
-            return None
\ No newline at end of file
+            return None
@@ -0,0 +1,124 @@
+"""
+Batched clock-in/clock-out for gate scanners and kiosks.
+
+A batch resolves every student in one query, locks the affected
+Attendance rows in one query, replays the events in timestamp order in
+memory and writes the final rows back with one bulk insert and one bulk
+update. The derived tables are updated with the aggregated deltas.
+
+The lock cannot cover rows that do not exist yet. If another request
+inserts one of the new rows first, the insert fails, the replay is
+rolled back to its savepoint and run again against the rows now there,
+so every delta starts from the state that was really replaced.
+"""
+from datetime import timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Attendance, CustomUser
+from .response_cache import bump_versions
+from .rollups import AttendanceState, apply_attendance_changes
+
+# bulk_update skips auto_now, so updated_at is set explicitly
+ATTENDANCE_FIELDS = ['status', 'clock_in_time', 'clock_out_time', 'updated_at']
+# Replays of a batch whose new rows keep being inserted by other requests
+INSERT_ATTEMPTS = 3
+
+
+def _error(index, event, message):
+    return {'index': index, 'student_id': event.get('student_id'), 'action': event.get('action'), 'ok': False, 'error': message}
+
+
+@transaction.atomic
+def apply_clock_events(events):
+    """
+    Apply validated clock events, each a dict with student_id, action
+    ('clock_in' or 'clock_out') and an aware timestamp. Returns one result
+    dict per event, in input order; a failed event never aborts the batch.
+    """
+    results = [None] * len(events)
+    users = {
+        student_id: (user_id, department_id)
+        for student_id, user_id, department_id in CustomUser.objects.filter(
+            student_id__in={event['student_id'] for event in events}
+        ).values_list('student_id', 'id', 'department_id')
+    }
+
+    pending = []
+    for index, event in enumerate(events):
+        if event['student_id'] not in users:
+            results[index] = _error(index, event, "Student not found")
+            continue
+        moment = event['timestamp'].astimezone(dt_timezone.utc)
+        pending.append((moment, index, event, users[event['student_id']][0]))
+    pending.sort(key=lambda item: (item[0], item[1]))
+
+    for attempt in range(1, INSERT_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                changes = _replay(pending, results)
+            break
+        except IntegrityError:
+            # Raced on a new row; replay against the rows there now
+            if attempt == INSERT_ATTEMPTS:
+                raise
+    apply_attendance_changes(changes, departments=dict(users.values()))
+    if changes:
+        bump_versions('attendance')
+    return results
+
+
+def _locked_rows(keys):
+    """The existing Attendance rows of the (user_id, date) keys, locked."""
+    if not keys:
+        return {}
+    rows = Attendance.objects.select_for_update().filter(
+        user_id__in={user_id for user_id, _ in keys},
+        date__in={day for _, day in keys},
+    )
+    return {(row.user_id, row.date): row for row in rows if (row.user_id, row.date) in keys}
+
+
+def _replay(pending, results):
+    """
+    Replay the sorted events, fill in their results and write the rows.
+    Returns the (previous, current) changes; raises IntegrityError if a
+    row it inserts already exists.
+    """
+    existing = _locked_rows({(user_id, moment.date()) for moment, _, _, user_id in pending})
+    previous = {key: row.rollup_state() for key, row in existing.items()}
+
+    now = timezone.now()
+    created, touched = {}, {}
+    for moment, index, event, user_id in pending:
+        key = (user_id, moment.date())
+        record = touched.get(key) or existing.get(key) or created.get(key)
+        if event['action'] == 'clock_in':
+            if record is None:
+                record = created[key] = Attendance(user_id=user_id, date=key[1])
+            record.clock_in_time = moment.time()
+        elif record is None:
+            results[index] = _error(index, event, "No attendance record found for today")
+            continue
+        else:
+            record.clock_out_time = moment.time()
+        record.status = 'present'
+        record.updated_at = now
+        if key in existing:
+            touched[key] = record
+        time_field = 'clock_in_time' if event['action'] == 'clock_in' else 'clock_out_time'
+        results[index] = {
+            'index': index, 'student_id': event['student_id'], 'action': event['action'],
+            'ok': True, time_field: moment.time().strftime("%H:%M:%S"),
+        }
+
+    if created:
+        # A plain insert: the rows were not there when locked, so each really is new
+        Attendance.objects.bulk_create(created.values(), batch_size=1000)
+    if touched:
+        Attendance.objects.bulk_update(touched.values(), ATTENDANCE_FIELDS, batch_size=1000)
+
+    changes = [(previous[key], record.rollup_state()) for key, record in touched.items()]
+    changes += [(None, record.rollup_state()) for record in created.values()]
+    return changes
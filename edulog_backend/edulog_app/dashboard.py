@@ -0,0 +1,82 @@
+"""
+Payloads for the admin dashboard.
+
+Each dashboard card also has its own endpoint; both read from the
+functions here, so /api/dashboard/ returns exactly what the separate calls
+would, computed in four queries (three while the analytics snapshot is
+current, which has the department counts): today's school-wide rollup row (shared
+by the student total, today's percentage and the absent count), the
+department counts, the ten latest attendance records and the next five
+events. With DASHBOARD_CACHE_SECONDS set, the assembled payload is cached
+for that long.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Attendance, Department, SchoolEvent
+from .rollups import get_daily_rollup
+from .snapshot import current_snapshot
+
+DASHBOARD_CACHE_KEY = 'dashboard:{date}'
+
+
+def today_summary(rollup=None):
+    """Student total, today's attendance percentage and absent count from one rollup row."""
+    rollup = rollup or get_daily_rollup()
+    total = rollup.student_total
+    return {
+        "total": total,
+        "attendancePercentage": (rollup.present / total) * 100 if total > 0 else 0,
+        "absentCount": rollup.absent,
+    }
+
+
+def department_stats():
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        return snapshot.department_stats()
+    return list(Department.objects.annotate(student_count=Count('students')).order_by('id').values('name', 'student_count'))
+
+
+def recent_attendance(limit=10):
+    records = Attendance.objects.order_by('-date', '-id').values(
+        'date', 'status', student_name=F('user__username'), student_id=F('user__student_id'),
+    )[:limit]
+    return [{
+        'student_name': record['student_name'],
+        'student_id': record['student_id'],
+        'date': record['date'].strftime('%Y-%m-%d'),
+        'status': record['status'],
+    } for record in records]
+
+
+def upcoming_events(limit=5):
+    today = timezone.now().date()
+    events = SchoolEvent.objects.filter(date__gte=today).order_by('date').values(
+        'title', 'date', 'location', 'description'
+    )[:limit]
+    return [{**event, 'date': event['date'].strftime('%Y-%m-%d')} for event in events]
+
+
+def build_dashboard():
+    return {
+        **today_summary(),
+        "departmentStats": department_stats(),
+        "recentLogs": recent_attendance(),
+        "upcomingEvents": upcoming_events(),
+    }
+
+
+def get_dashboard():
+    """The dashboard payload, served from the cache for DASHBOARD_CACHE_SECONDS when set."""
+    timeout = settings.DASHBOARD_CACHE_SECONDS
+    if not timeout:
+        return build_dashboard()
+    key = DASHBOARD_CACHE_KEY.format(date=timezone.now().date())
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_dashboard()
+        cache.set(key, payload, timeout)
+    return payload
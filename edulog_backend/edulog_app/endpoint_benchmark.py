@@ -0,0 +1,319 @@
+"""
+Per-endpoint latency, query count and memory against a synthetic school.
+
+ENDPOINTS holds one request builder per method of every route in
+edulog/urls.py, keyed like 'GET /api/attendance/<int:student_id>/'.
+uncovered_routes() lists the routes that have neither a builder nor an
+entry in UNBENCHMARKED, so a new route cannot slip past the benchmark.
+The admin site and DRF's login pages are Django's and DRF's own and are
+not included.
+
+run() sends each request through the test client with a real access
+token. The first request follows a bump of every response cache domain
+and an empty JWT user cache (cold). The next `iterations` requests are
+timed and their queries counted (warm). One last request runs under
+tracemalloc for the peak memory it allocates. Builders run outside the
+timing, so the rows a write needs (a record to delete, a free date) are
+created untimed. Streamed bodies are read to the end, except the live
+feed, which is timed to its first event.
+"""
+import time
+import tracemalloc
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from rest_framework.test import APIClient
+
+from .authentication import ClaimsRefreshToken, user_cache
+from .models import Attendance, AttendanceLog, CustomUser, Department, SchoolEvent
+from .response_cache import DOMAINS, bump_versions
+from .synthetic import SYNTHETIC_PASSWORD
+
+# Third-party URL confs included by edulog/urls.py
+EXTERNAL_NAMESPACES = ('admin', 'rest_framework')
+
+UNBENCHMARKED = {
+    'POST /api/attendance/records/': "AttendanceSerializer has no writable user, so the create cannot succeed",
+}
+
+
+class Context:
+    """What the request builders need from the synthetic school."""
+
+    def __init__(self, students, end_date):
+        self.students = students
+        self.end_date = end_date
+        self.start_date = end_date - timedelta(days=29)
+        self.admin = CustomUser.objects.create_user(
+            'benchmark-admin@example.com', SYNTHETIC_PASSWORD, role='admin', username='Benchmark Admin',
+        )
+        self.departments = list(Department.objects.order_by('id'))
+        self.records = list(Attendance.objects.filter(user__in=students[:100]).order_by('-date', 'id')[:100])
+        self.logs = list(AttendanceLog.objects.filter(user__in=students[:100]).order_by('-timestamp', 'id')[:100])
+        self.events = list(SchoolEvent.objects.order_by('id')[:100])
+        self.tokens = {}
+
+    def student(self, i):
+        return self.students[i % len(self.students)]
+
+    def record(self, i):
+        return self.records[i % len(self.records)]
+
+    def free_day(self, i):
+        # Days after the generated range have no attendance yet
+        return self.end_date + timedelta(days=1 + i)
+
+    def token(self, user):
+        if user.pk not in self.tokens:
+            self.tokens[user.pk] = str(ClaimsRefreshToken.for_user(user).access_token)
+        return self.tokens[user.pk]
+
+
+def call(method, path, data=None, user='admin', expected=200, first_event=False, format='json'):
+    """One request: `user` is 'admin', None (anonymous) or a CustomUser."""
+    return {
+        'method': method, 'path': path, 'data': data, 'user': user, 'expected': expected,
+        'first_event': first_event, 'format': format,
+    }
+
+
+def _record_data(record, **changes):
+    return {'user': record.user_id, 'date': str(record.date), 'status': record.status, **changes}
+
+
+def _roster(i, rows=50):
+    lines = ['email,username,student_id,department'] + [
+        f"roster{i}-{n}@example.com,Roster {i} {n},R{i:04d}{n:04d},Department {n % 3 + 1}" for n in range(rows)
+    ]
+    return SimpleUploadedFile('roster.csv', '\n'.join(lines).encode(), content_type='text/csv')
+
+
+def _event_data(i, **changes):
+    return {'title': f"Benchmark event {i}", 'description': "Benchmark", 'date': '2030-01-01', 'location': 'Hall 1', **changes}
+
+
+ENDPOINTS = {
+    'GET /': lambda ctx, i: call('get', '/'),
+    'GET /attendance/': lambda ctx, i: call('get', '/attendance/'),
+    'POST /attendance/': lambda ctx, i: call('post', '/attendance/', {'user': ctx.student(i).pk, 'action': 'login'}, expected=201),
+    'GET /attendance/buffer-stats/': lambda ctx, i: call('get', '/attendance/buffer-stats/'),
+    'GET /attendance/history/': lambda ctx, i: call('get', f'/attendance/history/?from={ctx.start_date}&to={ctx.end_date}'),
+    'POST /attendance/login_log/': lambda ctx, i: call(
+        'post', '/attendance/login_log/', user=ctx.student(i), expected=202 if settings.ATTENDANCE_LOG_BUFFER else 201,
+    ),
+    'POST /attendance/logout_log/': lambda ctx, i: call(
+        'post', '/attendance/logout_log/', user=ctx.student(i), expected=202 if settings.ATTENDANCE_LOG_BUFFER else 201,
+    ),
+    'GET /attendance/<pk>/': lambda ctx, i: call('get', f'/attendance/{ctx.logs[i % len(ctx.logs)].pk}/'),
+    'PUT /attendance/<pk>/': lambda ctx, i: call(
+        'put', f'/attendance/{ctx.logs[i % len(ctx.logs)].pk}/', {'user': ctx.logs[i % len(ctx.logs)].user_id, 'action': 'logout'},
+    ),
+    'PATCH /attendance/<pk>/': lambda ctx, i: call('patch', f'/attendance/{ctx.logs[i % len(ctx.logs)].pk}/', {'action': 'login'}),
+    'DELETE /attendance/<pk>/': lambda ctx, i: call(
+        'delete', f'/attendance/{AttendanceLog.objects.create(user=ctx.student(i), action="login").pk}/', expected=204,
+    ),
+    'GET /admin/attendance/': lambda ctx, i: call('get', '/admin/attendance/'),
+    'POST /admin/attendance/': lambda ctx, i: call(
+        'post', '/admin/attendance/', {'user': ctx.student(0).pk, 'date': str(ctx.free_day(i)), 'status': 'present'}, expected=201,
+    ),
+    'GET /admin/attendance/<pk>/': lambda ctx, i: call('get', f'/admin/attendance/{ctx.record(i).pk}/'),
+    'PUT /admin/attendance/<pk>/': lambda ctx, i: call(
+        'put', f'/admin/attendance/{ctx.record(i).pk}/', _record_data(ctx.record(i), status='late'),
+    ),
+    'PATCH /admin/attendance/<pk>/': lambda ctx, i: call('patch', f'/admin/attendance/{ctx.record(i).pk}/', {'status': 'present'}),
+    'DELETE /admin/attendance/<pk>/': lambda ctx, i: call(
+        'delete', f'/admin/attendance/{Attendance.objects.create(user=ctx.student(1), date=ctx.free_day(i), status="absent").pk}/',
+        expected=204,
+    ),
+    'GET /departments/': lambda ctx, i: call('get', '/departments/'),
+    'POST /departments/': lambda ctx, i: call('post', '/departments/', {'name': f"Benchmark department {i}"}, expected=201),
+    'GET /departments/<pk>/': lambda ctx, i: call('get', f'/departments/{ctx.departments[0].pk}/'),
+    'PUT /departments/<pk>/': lambda ctx, i: call('put', f'/departments/{ctx.departments[0].pk}/', {'name': ctx.departments[0].name}),
+    'PATCH /departments/<pk>/': lambda ctx, i: call('patch', f'/departments/{ctx.departments[0].pk}/', {'name': ctx.departments[0].name}),
+    'DELETE /departments/<pk>/': lambda ctx, i: call(
+        'delete', f'/departments/{Department.objects.create(name=f"Benchmark department {i}").pk}/', expected=204,
+    ),
+    'POST /api/login/': lambda ctx, i: call(
+        'post', '/api/login/', {'email': ctx.student(i).email, 'password': SYNTHETIC_PASSWORD}, user=None,
+    ),
+    'POST /api/register/': lambda ctx, i: call('post', '/api/register/', {
+        'email': f"benchmark{i}@example.com", 'username': f"Benchmark {i}", 'password': SYNTHETIC_PASSWORD,
+        'role': 'student', 'student_id': f"BM{i:06d}",
+    }, user=None, expected=201),
+    'GET /api/dashboard/': lambda ctx, i: call('get', '/api/dashboard/'),
+    'GET /api/analytics/cohort/': lambda ctx, i: call(
+        'get', f'/api/analytics/cohort/?startDate={ctx.start_date}&endDate={ctx.end_date}',
+    ),
+    'GET /api/cache/stats/': lambda ctx, i: call('get', '/api/cache/stats/'),
+    'GET /api/students/stats/department-wise/': lambda ctx, i: call('get', '/api/students/stats/department-wise/'),
+    'POST /api/students/import/': lambda ctx, i: call('post', '/api/students/import/', {'file': _roster(i)}, format='multipart'),
+    'GET /api/students/<int:student_id>/details/': lambda ctx, i: call('get', f'/api/students/{ctx.student(i).pk}/details/'),
+    'GET /api/attendance/<int:student_id>/': lambda ctx, i: call('get', f'/api/attendance/{ctx.student(i).pk}/'),
+    'POST /api/attendance/clock-in/': lambda ctx, i: call('post', '/api/attendance/clock-in/', user=ctx.student(i), expected=201),
+    # After the clock-ins above, so each student has a record for today
+    'POST /api/attendance/clock-out/': lambda ctx, i: call('post', '/api/attendance/clock-out/', user=ctx.student(i)),
+    'POST /api/attendance/clock-batch/': lambda ctx, i: call('post', '/api/attendance/clock-batch/', {'events': [
+        {'student_id': ctx.student(50 * i + n).student_id, 'action': 'clock_in'} for n in range(50)
+    ]}),
+    'GET /api/attendance/stats/total-students/': lambda ctx, i: call('get', '/api/attendance/stats/total-students/'),
+    'GET /api/attendance/stats/attendance-today/': lambda ctx, i: call('get', '/api/attendance/stats/attendance-today/'),
+    'PUT /api/attendance/update/<int:pk>/': lambda ctx, i: call(
+        'put', f'/api/attendance/update/{ctx.record(i).pk}/', {'status': 'late'},
+    ),
+    'GET /api/attendance/stats/absent-students/': lambda ctx, i: call('get', '/api/attendance/stats/absent-students/'),
+    'GET /api/attendance/stats/percentage/': lambda ctx, i: call('get', '/api/attendance/stats/percentage/'),
+    'GET /api/attendance/reports/': lambda ctx, i: call(
+        'get', f'/api/attendance/reports/?startDate={ctx.start_date}&endDate={ctx.end_date}',
+    ),
+    'GET /api/attendance/reports/export/': lambda ctx, i: call(
+        'get', f'/api/attendance/reports/export/?startDate={ctx.start_date}&endDate={ctx.end_date}',
+    ),
+    'GET /api/attendance/reports/filters/': lambda ctx, i: call('get', '/api/attendance/reports/filters/'),
+    'GET /api/attendance/reports/students/': lambda ctx, i: call(
+        'get', f'/api/attendance/reports/students/?q={ctx.student(i).student_id[:-1]}',
+    ),
+    'GET /api/attendance/<int:student_id>/status/': lambda ctx, i: call(
+        'get', f'/api/attendance/{ctx.student(i).pk}/status/', user=ctx.student(i),
+    ),
+    'GET /api/attendance/<int:student_id>/calendar/': lambda ctx, i: call(
+        'get', f'/api/attendance/{ctx.student(i).pk}/calendar/', user=ctx.student(i),
+    ),
+    'GET /api/attendance/recent-logs/': lambda ctx, i: call('get', '/api/attendance/recent-logs/'),
+    'GET /api/attendance/live/': lambda ctx, i: call('get', '/api/attendance/live/', first_event=True),
+    'GET /api/events/upcoming/': lambda ctx, i: call('get', '/api/events/upcoming/'),
+    'GET /api/attendance/records/': lambda ctx, i: call('get', '/api/attendance/records/'),
+    'GET /api/attendance/records/<int:pk>/': lambda ctx, i: call('get', f'/api/attendance/records/{ctx.record(i).pk}/'),
+    'PUT /api/attendance/records/<int:pk>/': lambda ctx, i: call(
+        'put', f'/api/attendance/records/{ctx.record(i).pk}/', {'date': str(ctx.record(i).date), 'status': 'present'},
+    ),
+    'PATCH /api/attendance/records/<int:pk>/': lambda ctx, i: call(
+        'patch', f'/api/attendance/records/{ctx.record(i).pk}/', {'status': 'present'},
+    ),
+    'GET /api/events/': lambda ctx, i: call('get', '/api/events/'),
+    'POST /api/events/': lambda ctx, i: call('post', '/api/events/', _event_data(i), expected=201),
+    'GET /api/events/<int:pk>/': lambda ctx, i: call('get', f'/api/events/{ctx.events[0].pk}/'),
+    'PUT /api/events/<int:pk>/': lambda ctx, i: call('put', f'/api/events/{ctx.events[0].pk}/', _event_data(i)),
+    'PATCH /api/events/<int:pk>/': lambda ctx, i: call('patch', f'/api/events/{ctx.events[0].pk}/', {'location': 'Hall 2'}),
+    'DELETE /api/events/<int:pk>/': lambda ctx, i: call(
+        'delete', f'/api/events/{SchoolEvent.objects.create(**_event_data(i)).pk}/', expected=204,
+    ),
+}
+
+
+def _route(pattern):
+    """'^attendance/(?P<pk>[^/.]+)/$' -> 'attendance/<pk>/'; path() routes are kept as written."""
+    route = str(pattern).lstrip('^').rstrip('$')
+    return route.replace('(?P<pk>[^/.]+)', '<pk>')
+
+
+def _methods(callback):
+    # Viewsets add 'head' to their actions on the first request; HEAD and OPTIONS are not benchmarked
+    actions = getattr(callback, 'actions', None)
+    if actions:
+        methods = list(actions)
+    else:
+        methods = [method for method in callback.view_class.http_method_names if hasattr(callback.view_class, method)]
+    return [method.upper() for method in methods if method not in ('head', 'options')]
+
+
+def routes(patterns=None, prefix=''):
+    """'METHOD /route' for every method of every route, without the router's format-suffix duplicates."""
+    found = []
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace not in EXTERNAL_NAMESPACES:
+                found += routes(pattern.url_patterns, prefix + _route(pattern.pattern))
+        elif 'format' not in pattern.pattern.regex.groupindex:
+            found += [f"{method} /{prefix}{_route(pattern.pattern)}" for method in _methods(pattern.callback)]
+    return found
+
+
+def uncovered_routes():
+    return [route for route in routes() if route not in ENDPOINTS and route not in UNBENCHMARKED]
+
+
+async def _first_chunk(content):
+    # The stream's generator is closed when async_to_sync's event loop shuts down
+    async for chunk in content:
+        return chunk
+
+
+def _send(client, ctx, request):
+    user = ctx.admin if request['user'] == 'admin' else request['user']
+    headers = {'HTTP_AUTHORIZATION': f"Bearer {ctx.token(user)}"} if user is not None else {}
+    response = getattr(client, request['method'])(request['path'], request['data'], format=request['format'], **headers)
+    if request['first_event']:
+        async_to_sync(_first_chunk)(response.streaming_content)
+    elif response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def _percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def measure(ctx, build, iterations):
+    """Cold, warm and traced runs of one endpoint; `build(ctx, i)` gives the i-th request."""
+    client = APIClient(raise_request_exception=False)
+    failures = []
+
+    def send(i):
+        request = build(ctx, i)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = _send(client, ctx, request)
+            elapsed = time.perf_counter() - started
+        if response.status_code != request['expected']:
+            failures.append(response.status_code)
+        return elapsed, len(queries)
+
+    bump_versions(*DOMAINS)
+    user_cache.clear()
+    cold, cold_queries = send(0)
+    timings, query_counts = [], []
+    for i in range(1, iterations + 1):
+        elapsed, count = send(i)
+        timings.append(elapsed)
+        query_counts.append(count)
+
+    tracemalloc.start()
+    try:
+        send(iterations + 1)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'cold_ms': _ms(cold),
+        'cold_queries': cold_queries,
+        'p50_ms': _ms(_percentile(timings, 0.5)),
+        'p95_ms': _ms(_percentile(timings, 0.95)),
+        'p99_ms': _ms(_percentile(timings, 0.99)),
+        'max_ms': _ms(timings[-1]),
+        'queries': max(query_counts),
+        'peak_kib': round(peak / 1024, 1),
+        'failures': failures,
+    }
+
+
+def run(students, end_date, iterations=20, only=None):
+    """Measure every endpoint whose key contains `only` (all by default)."""
+    ctx = Context(students, end_date)
+    results = {}
+    for key, build in ENDPOINTS.items():
+        if only and only not in key:
+            continue
+        results[key] = measure(ctx, build, iterations)
+    return results
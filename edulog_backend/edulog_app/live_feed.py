@@ -0,0 +1,233 @@
+"""
+Pub/sub behind the admin dashboard's live feed (LiveFeedView).
+
+ClockInView and ClockOutView publish one event per clock-in or clock-out,
+after the write, carrying the attendance record as the recent-logs card
+shows it and today's counters read once from the rollup row.
+BatchClockView publishes the new counters once per batch. Every open
+stream holds a bounded queue on the broker, so an event costs one read
+and one fan-out however many dashboards are open. Nothing is read or sent
+while no stream is open.
+
+settings.LIVE_FEED_BROKER picks the broker. LocalBroker only reaches
+streams in the publishing process, which is enough for a single worker.
+UnixSocketBroker sends each event to a datagram socket per process in
+LIVE_FEED_SOCKET_DIR, so streams on every worker of the host get events
+published by any of them.
+"""
+import asyncio
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .dashboard import today_summary
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100
+
+
+class Subscription:
+    """One stream's queue. put() may be called from any thread."""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.dropped = 0
+
+    def put(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        # A stream that falls behind loses its oldest events; later counters supersede them
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class LocalBroker:
+    """Fans events out to the streams of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    def subscribe(self):
+        subscription = Subscription()
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def has_subscribers(self):
+        return bool(self._subscriptions)
+
+    def publish(self, event):
+        self.deliver(event)
+
+    def deliver(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.put(event)
+
+
+class UnixSocketBroker(LocalBroker):
+    """
+    Relays events between the processes of one host. A process binds
+    `<pid>.sock` in the socket directory when its first stream subscribes,
+    and a thread delivers what arrives there to its streams. Publishing
+    sends one datagram to every socket in the directory, the publisher's
+    own included. Sockets left behind by dead processes are removed when a
+    send is refused.
+    """
+
+    def __init__(self, directory=None):
+        super().__init__()
+        self.directory = directory or settings.LIVE_FEED_SOCKET_DIR
+        self._receiver = None
+        self._sender = None
+
+    def _bind(self):
+        with self._lock:
+            if self._receiver is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f'{os.getpid()}.sock')
+            if os.path.exists(path):
+                os.unlink(path)
+            receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            receiver.bind(path)
+            self._receiver = receiver
+        atexit.register(self._unlink, path)
+        threading.Thread(target=self._receive, args=(receiver,), name='live-feed', daemon=True).start()
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def _receive(self, receiver):
+        while True:
+            data = receiver.recv(65536)
+            try:
+                self.deliver(json.loads(data))
+            except ValueError:
+                logger.warning("Dropped a malformed live feed datagram")
+
+    def _sockets(self):
+        try:
+            return [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.sock')]
+        except FileNotFoundError:
+            return []
+
+    def subscribe(self):
+        subscription = super().subscribe()
+        self._bind()
+        return subscription
+
+    def has_subscribers(self):
+        # Processes keep their socket once bound, so this can over-report; a send to an idle process is cheap
+        return bool(self._sockets())
+
+    def publish(self, event):
+        if self._sender is None:
+            self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._sender.setblocking(False)
+        data = json.dumps(event).encode()
+        for path in self._sockets():
+            try:
+                self._sender.sendto(data, path)
+            except ConnectionRefusedError:
+                self._unlink(path)
+            except (BlockingIOError, FileNotFoundError):
+                # Receiver's buffer is full or it just went away: that process misses this event
+                pass
+
+
+_lock = threading.Lock()
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _lock:
+            if _broker is None:
+                _broker = import_string(settings.LIVE_FEED_BROKER)()
+    return _broker
+
+
+def reset_broker():
+    """Forget the broker, so the next get_broker() builds one from the current settings."""
+    global _broker
+    with _lock:
+        _broker = None
+
+
+async def apublish_attendance(event_type, attendance, user, moment):
+    """Publish a clock_in or clock_out of `user` at `moment`, if any stream is open."""
+    broker = get_broker()
+    if not broker.has_subscribers():
+        return
+    broker.publish({
+        'type': event_type,
+        'time': moment.strftime('%H:%M:%S'),
+        # As the recent-logs card lists records
+        'log': {
+            'student_name': user.username,
+            'student_id': user.student_id,
+            'date': attendance.date.strftime('%Y-%m-%d'),
+            'status': attendance.status,
+        },
+        'counters': await sync_to_async(today_summary)(),
+    })
+
+
+def publish_counters():
+    """Publish today's counters, if any stream is open."""
+    broker = get_broker()
+    if broker.has_subscribers():
+        broker.publish({'type': 'counters', 'counters': today_summary()})
+
+
+def format_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+async def stream():
+    """
+    Server-sent events for one dashboard: the current counters, then every
+    published event, with a comment line while idle so proxies keep the
+    connection open. The counters are read after subscribing, so no event
+    in between is missed.
+    """
+    broker = get_broker()
+    subscription = broker.subscribe()
+    try:
+        yield format_event({'type': 'counters', 'counters': await sync_to_async(today_summary)()})
+        while True:
+            try:
+                event = await subscription.get(settings.LIVE_FEED_HEARTBEAT_SECONDS)
+            except TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
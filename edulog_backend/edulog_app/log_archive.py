@@ -0,0 +1,175 @@
+"""
+Retention for AttendanceLog.
+
+Rows older than the retention window are moved out of the hot table in
+bounded batches. Each batch is appended to one gzip-compressed NDJSON file
+per month under ATTENDANCE_LOG_ARCHIVE_DIR and summarized into
+AttendanceLogArchive (per month, user and action) in the same transaction
+that deletes it. Gzip members concatenate, so a batch is just one more
+member at the end of the month's file and nothing is ever rewritten.
+
+The file write happens before the transaction commits; if the commit then
+fails, the retried batch is appended a second time and readers drop the
+duplicate ids. Since the rows are deleted, nothing is archived until
+ATTENDANCE_LOG_ARCHIVE_DIR names durable storage.
+"""
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AttendanceLog, AttendanceLogArchive
+
+LOG_FIELDS = ['id', 'user', 'timestamp', 'action']
+ARCHIVE_BATCH_SIZE = 5000
+
+
+def retention_cutoff(days=None):
+    """Midnight of the oldest day that stays in the hot table."""
+    if days is None:
+        days = settings.ATTENDANCE_LOG_RETENTION_DAYS
+    day = timezone.now().date() - timedelta(days=days)
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def month_of(value):
+    """First day of the month `value` (a date or aware datetime) falls in."""
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).date()
+    return value.replace(day=1)
+
+
+def check_archive_dir():
+    if not settings.ATTENDANCE_LOG_ARCHIVE_DIR:
+        raise ImproperlyConfigured(
+            "Set ATTENDANCE_LOG_ARCHIVE_DIR to durable storage before archiving; archived logs are deleted"
+        )
+
+
+def archive_path(month):
+    return os.path.join(settings.ATTENDANCE_LOG_ARCHIVE_DIR, f"attendance-logs-{month:%Y-%m}.ndjson.gz")
+
+
+def _append_to_file(month, rows):
+    os.makedirs(settings.ATTENDANCE_LOG_ARCHIVE_DIR, exist_ok=True)
+    lines = ''.join(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows)
+    with open(archive_path(month), 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+            archive.write(lines.encode())
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def _summarize(month, rows):
+    groups = defaultdict(list)
+    for row in rows:
+        groups[(row['user'], row['action'])].append(row['timestamp'])
+
+    existing = {
+        (summary.user_id, summary.action): summary
+        for summary in AttendanceLogArchive.objects.select_for_update().filter(
+            month=month, user_id__in={user_id for user_id, _ in groups}
+        )
+    }
+    changed, created = [], []
+    for (user_id, action), timestamps in groups.items():
+        summary = existing.get((user_id, action))
+        if summary is None:
+            created.append(AttendanceLogArchive(
+                month=month, user_id=user_id, action=action, count=len(timestamps),
+                first_timestamp=min(timestamps), last_timestamp=max(timestamps),
+            ))
+            continue
+        summary.count += len(timestamps)
+        summary.first_timestamp = min(summary.first_timestamp, *timestamps)
+        summary.last_timestamp = max(summary.last_timestamp, *timestamps)
+        changed.append(summary)
+    AttendanceLogArchive.objects.bulk_update(changed, ['count', 'first_timestamp', 'last_timestamp'])
+    AttendanceLogArchive.objects.bulk_create(created)
+
+
+def archive_batch(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move the oldest `batch_size` logs before `cutoff` into the archive.
+    Returns the number of rows moved (0 once nothing is left). Raises
+    ImproperlyConfigured if ATTENDANCE_LOG_ARCHIVE_DIR is not set.
+    """
+    check_archive_dir()
+    with transaction.atomic():
+        rows = list(
+            AttendanceLog.objects.filter(timestamp__lt=cutoff)
+            .order_by('timestamp', 'id')
+            .values('id', 'user', 'timestamp', 'action')[:batch_size]
+        )
+        if not rows:
+            return 0
+        by_month = defaultdict(list)
+        for row in rows:
+            by_month[month_of(row['timestamp'])].append(row)
+        for month, month_rows in sorted(by_month.items()):
+            _append_to_file(month, month_rows)
+            _summarize(month, month_rows)
+        AttendanceLog.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def _months(start_date, end_date):
+    month = month_of(start_date)
+    while month <= end_date:
+        yield month
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+def read_archived_logs(start_date, end_date, user_id=None, action=None):
+    """
+    Yield archived log rows (dicts keyed by LOG_FIELDS) dated between
+    `start_date` and `end_date` inclusive, oldest first, opening only the
+    monthly files that overlap the range.
+    """
+    if not settings.ATTENDANCE_LOG_ARCHIVE_DIR:
+        return
+    for month in _months(start_date, end_date):
+        path = archive_path(month)
+        if not os.path.exists(path):
+            continue
+        seen = set()
+        with gzip.open(path, 'rt') as archive:
+            for line in archive:
+                row = json.loads(line)
+                if row['id'] in seen:
+                    continue
+                seen.add(row['id'])
+                row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+                if not start_date <= timezone.localtime(row['timestamp']).date() <= end_date:
+                    continue
+                if user_id is not None and row['user'] != user_id:
+                    continue
+                if action is not None and row['action'] != action:
+                    continue
+                yield row
+
+
+def read_logs(start_date, end_date, user_id=None, action=None, chunk_size=ARCHIVE_BATCH_SIZE):
+    """
+    Logs between `start_date` and `end_date` inclusive, oldest first,
+    from the archive files for the part of the range that has been
+    archived and from the hot table for the rest.
+    """
+    logs = AttendanceLog.objects.filter(
+        timestamp__gte=timezone.make_aware(datetime.combine(start_date, time.min)),
+        timestamp__lt=timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min)),
+    )
+    if user_id is not None:
+        logs = logs.filter(user_id=user_id)
+    if action is not None:
+        logs = logs.filter(action=action)
+    hot = logs.order_by('timestamp', 'id').values(*LOG_FIELDS).iterator(chunk_size=chunk_size)
+    return chain(read_archived_logs(start_date, end_date, user_id, action), hot)
@@ -0,0 +1,181 @@
+"""
+Write-behind buffering for AttendanceLog.
+
+With ATTENDANCE_LOG_BUFFER on, login_log/logout_log only append the event
+to an in-process queue and return. A daemon thread per worker process
+writes the queue out with one bulk_create whenever it reaches
+ATTENDANCE_LOG_BUFFER_SIZE events or ATTENDANCE_LOG_FLUSH_INTERVAL seconds
+have passed, and once more when the process exits. Events carry their
+own timestamp, so a delayed write still records when the event happened.
+
+The queue is bounded by ATTENDANCE_LOG_BUFFER_MAX; when it is full,
+enqueue() refuses the event and the caller writes it synchronously. When
+one bad event fails the batch (an IntegrityError, such as a user deleted
+since the event was queued), the flush writes the events one at a time
+and drops only those that fail. Any other failed flush is logged and its
+events are counted as dropped. A hard kill (SIGKILL, OOM) loses at most
+one queue's worth of events.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, connection, transaction
+
+from .models import AttendanceLog
+
+logger = logging.getLogger(__name__)
+
+
+class LogBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._queue = []
+        self._worker = None
+        self._pid = None
+        self._stopping = False
+        self._reset_stats()
+
+    # Read on every use so settings overrides take effect without a restart
+    @property
+    def batch_size(self):
+        return settings.ATTENDANCE_LOG_BUFFER_SIZE
+
+    @property
+    def flush_interval(self):
+        return settings.ATTENDANCE_LOG_FLUSH_INTERVAL
+
+    @property
+    def max_queue(self):
+        return settings.ATTENDANCE_LOG_BUFFER_MAX
+
+    def _reset_stats(self):
+        self.enqueued = self.flushed = self.dropped = self.overflowed = 0
+        self.flushes = 0
+        self.last_flush_ms = self.max_flush_ms = self.total_flush_ms = 0.0
+
+    def enqueue(self, user_id, action, timestamp):
+        """
+        Queue one log event. Returns False, without queueing, when the
+        buffer is full and the caller should write the event itself.
+        """
+        with self._lock:
+            if self._pid != os.getpid() or not self._worker.is_alive():
+                self._start_worker()
+            if len(self._queue) >= self.max_queue:
+                self.overflowed += 1
+                return False
+            self._queue.append(AttendanceLog(user_id=user_id, action=action, timestamp=timestamp))
+            self.enqueued += 1
+            if len(self._queue) >= self.batch_size:
+                self._wakeup.notify()
+        return True
+
+    def flush(self):
+        """Write every queued event with bulk_create. Returns how many were written."""
+        with self._flush_lock:
+            with self._lock:
+                events, self._queue = self._queue, []
+            if not events:
+                return 0
+            started = time.perf_counter()
+            try:
+                # A savepoint of its own, so a failure leaves any outer transaction usable
+                with transaction.atomic():
+                    AttendanceLog.objects.bulk_create(events, batch_size=self.batch_size)
+                written = len(events)
+            except IntegrityError:
+                # The whole insert was rolled back; keep the events that are fine
+                written = self._write_each(events)
+            except DatabaseError:
+                logger.exception("Dropped %d buffered attendance log(s)", len(events))
+                with self._lock:
+                    self.dropped += len(events)
+                return 0
+            elapsed = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self.flushed += written
+                self.dropped += len(events) - written
+                self.flushes += 1
+                self.last_flush_ms = elapsed
+                self.max_flush_ms = max(self.max_flush_ms, elapsed)
+                self.total_flush_ms += elapsed
+            return written
+
+    def _write_each(self, events):
+        """Insert `events` one per transaction, logging those that fail. Returns how many were written."""
+        written = 0
+        for event in events:
+            # An id returned before the batch failed was never committed
+            event.pk = None
+            try:
+                with transaction.atomic():
+                    AttendanceLog.objects.bulk_create([event])
+            except DatabaseError:
+                logger.exception(
+                    "Dropped buffered attendance log: user %s %s at %s", event.user_id, event.action, event.timestamp,
+                )
+            else:
+                written += 1
+        return written
+
+    def stop(self):
+        """Flush what is queued and stop the worker thread."""
+        with self._lock:
+            worker = self._worker if self._pid == os.getpid() else None
+            self._stopping = True
+            self._wakeup.notify()
+        if worker is not None and worker.is_alive():
+            worker.join()
+        else:
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": settings.ATTENDANCE_LOG_BUFFER,
+                "queue_depth": len(self._queue),
+                "enqueued": self.enqueued,
+                "flushed": self.flushed,
+                "dropped": self.dropped,
+                "overflowed": self.overflowed,
+                "flushes": self.flushes,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+                "max_flush_ms": round(self.max_flush_ms, 3),
+                "avg_flush_ms": round(self.total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+            }
+
+    def _start_worker(self):
+        # Called with the lock held. A forked worker inherits the parent's
+        # queue and counters but not its thread, so it starts afresh
+        if self._pid is None:
+            atexit.register(self.stop)
+        elif self._pid != os.getpid():
+            self._queue = []
+            self._reset_stats()
+        self._pid = os.getpid()
+        self._stopping = False
+        self._worker = threading.Thread(target=self._run, name='attendance-log-buffer', daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._stopping and len(self._queue) < self.batch_size:
+                        self._wakeup.wait(self.flush_interval)
+                    stopping = self._stopping
+                close_old_connections()
+                self.flush()
+                if stopping:
+                    return
+        finally:
+            connection.close()
+
+
+log_buffer = LogBuffer()
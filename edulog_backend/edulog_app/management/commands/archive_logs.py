@@ -0,0 +1,41 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from edulog_app.log_archive import ARCHIVE_BATCH_SIZE, archive_batch, check_archive_dir, retention_cutoff
+from edulog_app.models import AttendanceLog
+
+
+class Command(BaseCommand):
+    help = (
+        "Move AttendanceLog rows older than the retention window into the monthly archive "
+        "(compressed NDJSON files plus per-user monthly counts), one bounded batch per transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Keep this many days in the hot table (default: ATTENDANCE_LOG_RETENTION_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help="Rows per transaction")
+        parser.add_argument('--max-batches', type=int, help="Stop after this many batches (resume on the next run)")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the rows that would be archived")
+
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['days'] < 0:
+            raise CommandError("--days must not be negative")
+        cutoff = retention_cutoff(options['days'])
+        if options['dry_run']:
+            count = AttendanceLog.objects.filter(timestamp__lt=cutoff).count()
+            self.stdout.write(f"{count} log(s) before {cutoff:%Y-%m-%d} would be archived")
+            return
+        try:
+            check_archive_dir()
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+
+        total = batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            moved = archive_batch(cutoff, options['batch_size'])
+            if not moved:
+                break
+            total += moved
+            batches += 1
+            self.stdout.write(f"Archived {total} log(s)")
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} log(s) before {cutoff:%Y-%m-%d}"))
@@ -0,0 +1,70 @@
+import json
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from edulog_app.analytics import cohort_metrics, cohort_report, load_codes
+from edulog_app.attendance_calendar import STATUS_CODES
+from edulog_app.models import Attendance
+from edulog_app.synthetic import generate_school
+
+
+def load_codes_from_rows(students, start_date, end_date):
+    """The same matrix built from one values_list row per attendance record."""
+    positions = {student[0]: index for index, student in enumerate(students)}
+    codes = np.zeros((len(students), (end_date - start_date).days + 1), dtype=np.uint8)
+    records = Attendance.objects.filter(date__range=(start_date, end_date), user__role='student')
+    for user_id, day, status in records.values_list('user_id', 'date', 'status').iterator(chunk_size=10000):
+        codes[positions[user_id], (day - start_date).days] = STATUS_CODES.get(status, 0)
+    return codes
+
+
+class Command(BaseCommand):
+    help = (
+        "Time cohort analytics for a term: loading the students x days matrix (from calendars and, for "
+        "comparison, from raw Attendance rows) and computing the metrics. Uses a synthetic school in a "
+        "transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=20000)
+        parser.add_argument('--days', type=int, default=90, help="Length of the term in calendar days")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        end_date = timezone.now().date()
+        start_date = end_date - timedelta(days=options['days'] - 1)
+        with transaction.atomic():
+            generate_school(students=options['students'], days=options['days'], events=0, end_date=end_date)
+
+            started = time.perf_counter()
+            students, codes = load_codes(start_date, end_date)
+            loaded = time.perf_counter()
+            groups = np.array([student[3] or 0 for student in students], dtype=np.int64)
+            cohort_metrics(codes, groups)
+            computed = time.perf_counter()
+            cohort_report(start_date, end_date)
+            reported = time.perf_counter()
+            row_codes = load_codes_from_rows(students, start_date, end_date)
+            rows_loaded = time.perf_counter()
+            if not np.array_equal(row_codes, codes):
+                raise RuntimeError("Calendar and raw-row matrices differ")
+            transaction.set_rollback(True)
+
+        results = {
+            'students': len(students),
+            'days': codes.shape[1],
+            'load_calendars_ms': round((loaded - started) * 1000, 1),
+            'compute_metrics_ms': round((computed - loaded) * 1000, 1),
+            'full_report_ms': round((reported - computed) * 1000, 1),
+            'load_raw_rows_ms': round((rows_loaded - reported) * 1000, 1),
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, value in results.items():
+            self.stdout.write(f"{name:>20}: {value}")
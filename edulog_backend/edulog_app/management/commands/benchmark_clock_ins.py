@@ -0,0 +1,167 @@
+import asyncio
+import io
+import json
+import time
+from statistics import median
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from edulog_app.authentication import user_cache
+from edulog_app.models import CustomUser
+from edulog_app.response_cache import bump_versions
+from edulog_app.rollups import apply_student_changes
+from edulog_app.search import index_students
+
+
+def _summary(timings, elapsed, failures):
+    timings = sorted(timings)
+    return {
+        'requests': len(timings),
+        'failures': failures,
+        'requests_per_second': round(len(timings) / elapsed, 1),
+        'p50_ms': round(median(timings) * 1000, 2),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare clock-in and clock-status throughput of one process serving the API synchronously "
+        "(WSGI, one request at a time, like a sync gunicorn worker) and asynchronously (ASGI, many "
+        "requests in flight, like uvicorn). Creates throwaway students, which are deleted afterwards; "
+        "run it against a scratch database, since the requests commit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Requests per endpoint and mode, one per student")
+        parser.add_argument('--concurrency', type=int, default=50, help="Requests in flight in ASGI mode")
+        parser.add_argument(
+            '--db-latency-ms', type=float, default=0,
+            help="Sleep this long in every query, to stand in for the round trip to a database server",
+        )
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        offset = CustomUser.objects.count()
+        password = make_password(None)
+        students = CustomUser.objects.bulk_create([
+            CustomUser(email=f"clockbench{offset + i}@example.com", username=f"Clock Bench {i}", role='student',
+                       student_id=f"CB{offset + i:06d}", password=password)
+            for i in range(2 * count)
+        ])
+        # bulk_create skips the save signals; the deletes at the end go through them
+        index_students(students)
+        apply_student_changes([(None, ('student', None))] * len(students))
+        bump_versions('students')
+        tokens = [str(AccessToken.for_user(student)) for student in students]
+        self.host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS[0] not in ('', '*') else 'localhost'
+
+        latency = options['db_latency_ms'] / 1000
+
+        def delay(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def add_latency(connection, **kwargs):
+            if delay not in connection.execute_wrappers:
+                connection.execute_wrappers.append(delay)
+
+        if latency:
+            connection_created.connect(add_latency)
+        # Each mode clocks in its own half of the students, then asks for their status
+        halves = {
+            'wsgi': list(zip(students[:count], tokens[:count])),
+            'asgi': list(zip(students[count:], tokens[count:])),
+        }
+        scenarios = {
+            'clock_in': lambda student: ('POST', reverse('clock-in'), 201),
+            'status': lambda student: ('GET', reverse('attendance-status', args=[student.id]), 200),
+        }
+        results = {}
+        try:
+            for name, scenario in scenarios.items():
+                requests = {mode: [(*scenario(student), token) for student, token in half] for mode, half in halves.items()}
+                user_cache.clear()
+                wsgi = self.run_wsgi(requests['wsgi'])
+                user_cache.clear()
+                asgi = asyncio.run(self.run_asgi(requests['asgi'], options['concurrency']))
+                speedup = round(asgi['requests_per_second'] / wsgi['requests_per_second'], 2)
+                results[name] = {'wsgi': wsgi, 'asgi': asgi, 'speedup': speedup}
+        finally:
+            connection_created.disconnect(add_latency)
+            CustomUser.objects.filter(id__in=[student.id for student in students]).delete()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            for mode in ('wsgi', 'asgi'):
+                self.stdout.write(
+                    f"{name:>8} {mode}: {result[mode]['requests_per_second']:8.1f} requests/s  "
+                    f"p50 {result[mode]['p50_ms']:8.1f} ms  p95 {result[mode]['p95_ms']:8.1f} ms  "
+                    f"{result[mode]['failures']} failed"
+                )
+            self.stdout.write(f"{name:>8} speedup: {result['speedup']}x")
+
+    def run_wsgi(self, requests):
+        application = WSGIHandler()
+        timings, failures = [], 0
+        started = time.perf_counter()
+        for method, path, expected, token in requests:
+            environ = {
+                'REQUEST_METHOD': method, 'PATH_INFO': path, 'HTTP_HOST': self.host,
+                'HTTP_AUTHORIZATION': f'Bearer {token}', 'wsgi.url_scheme': 'https', 'HTTPS': 'on',
+                'wsgi.input': io.BytesIO(b''), 'CONTENT_LENGTH': '0',
+            }
+            setup_testing_defaults(environ)
+            statuses = []
+            begin = time.perf_counter()
+            response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+            b''.join(response)
+            response.close()
+            timings.append(time.perf_counter() - begin)
+            failures += not statuses[0].startswith(str(expected))
+        return _summary(timings, time.perf_counter() - started, failures)
+
+    async def run_asgi(self, requests, concurrency):
+        application = ASGIHandler()
+        slots = asyncio.Semaphore(concurrency)
+        timings, failures = [], [0]
+
+        async def request(method, path, expected, token):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+                'scheme': 'https', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+                'root_path': '', 'client': ('127.0.0.1', 0), 'server': (self.host, 443),
+                'headers': [(b'host', self.host.encode()), (b'authorization', f'Bearer {token}'.encode())],
+            }
+            body = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+            statuses = []
+
+            async def receive():
+                if body:
+                    return body.pop()
+                await asyncio.Event().wait()  # No disconnect; cancelled once the response is sent
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+
+            async with slots:
+                begin = time.perf_counter()
+                await application(scope, receive, send)
+                timings.append(time.perf_counter() - begin)
+            failures[0] += statuses[0] != expected
+
+        started = time.perf_counter()
+        await asyncio.gather(*(request(*item) for item in requests))
+        return _summary(timings, time.perf_counter() - started, failures[0])
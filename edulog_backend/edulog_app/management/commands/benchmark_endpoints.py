@@ -0,0 +1,92 @@
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from edulog_app.endpoint_benchmark import UNBENCHMARKED, run, uncovered_routes
+from edulog_app.response_cache import DOMAINS, bump_versions
+from edulog_app.synthetic import generate_school
+
+
+def regressions(baseline, results, tolerance, noise_ms):
+    """Endpoints slower, hungrier or chattier than in `baseline`, one line each."""
+    found = []
+    for key, result in results.items():
+        before = baseline.get('endpoints', {}).get(key)
+        if before is None:
+            continue
+        if result['queries'] > before['queries']:
+            found.append(f"{key}: {before['queries']} -> {result['queries']} queries")
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance) and result['p95_ms'] - before['p95_ms'] > noise_ms:
+            found.append(f"{key}: p95 {before['p95_ms']} -> {result['p95_ms']} ms")
+        if result['peak_kib'] > before['peak_kib'] * (1 + tolerance):
+            found.append(f"{key}: peak {before['peak_kib']} -> {result['peak_kib']} KiB")
+    return found
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every route in edulog/urls.py through the test client against a synthetic school: "
+        "latency percentiles, queries per request and peak memory per endpoint, written as JSON that "
+        "can be diffed between commits or checked against a baseline with --baseline. Runs in a "
+        "transaction that is rolled back, and invalidates the responses it cached."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=10)
+        parser.add_argument('--students', type=int, default=2000)
+        parser.add_argument('--days', type=int, default=60)
+        parser.add_argument('--events', type=int, default=100)
+        parser.add_argument('--iterations', type=int, default=20, help="Timed requests per endpoint after the cold one")
+        parser.add_argument('--only', help="Only endpoints whose key (e.g. 'GET /api/attendance/reports/') contains this")
+        parser.add_argument('--output', help="Write the results to this file instead of stdout")
+        parser.add_argument('--baseline', help="Results file from an earlier run to compare against")
+        parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed relative growth of p95 and peak memory")
+        parser.add_argument('--noise-ms', type=float, default=1.0, help="p95 growth below this many ms is never a regression")
+
+    def handle(self, *args, **options):
+        uncovered = uncovered_routes()
+        if uncovered:
+            raise CommandError("No benchmark request for: " + ', '.join(uncovered))
+
+        end_date = timezone.now().date()
+        try:
+            with transaction.atomic():
+                students = generate_school(
+                    departments=options['departments'], students=options['students'], days=options['days'],
+                    events=options['events'], end_date=end_date,
+                )
+                endpoints = run(students, end_date, options['iterations'], options['only'])
+                transaction.set_rollback(True)
+        finally:
+            # The rollback drops the synthetic school but not the responses
+            # cached from it, which real requests would otherwise be served
+            bump_versions(*DOMAINS)
+
+        results = {
+            'school': {key: options[key] for key in ('departments', 'students', 'days', 'events')},
+            'iterations': options['iterations'],
+            'environment': {
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'endpoints': endpoints,
+            'unbenchmarked': UNBENCHMARKED,
+        }
+        output = json.dumps(results, indent=2, sort_keys=True) + '\n'
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output, ending='')
+
+        problems = [f"{key}: unexpected status {result['failures']}" for key, result in endpoints.items() if result['failures']]
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                problems += regressions(json.load(f), endpoints, options['tolerance'], options['noise_ms'])
+        if problems:
+            raise CommandError("\n".join(problems))
@@ -0,0 +1,98 @@
+import json
+import time
+from contextlib import contextmanager
+from statistics import median
+
+from django.contrib.auth import hashers
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from edulog_app.models import CustomUser
+from edulog_app.views import LoginUserView
+
+BENCHMARK_PASSWORD = 'benchmark-pass'
+
+
+@contextmanager
+def count_hashes():
+    """Count PBKDF2 derivations (the CPU cost of a login) while active."""
+    calls = [0]
+    original = hashers.pbkdf2
+
+    def counting_pbkdf2(*args, **kwargs):
+        calls[0] += 1
+        return original(*args, **kwargs)
+
+    hashers.pbkdf2 = counting_pbkdf2
+    try:
+        yield calls
+    finally:
+        hashers.pbkdf2 = original
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure single-worker login throughput through LoginUserView for valid, wrong-password "
+        "and unknown-email attempts. Uses throwaway users in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=20, help="Login attempts per scenario")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        results = {}
+        with transaction.atomic():
+            password = make_password(BENCHMARK_PASSWORD)
+            users = CustomUser.objects.bulk_create([
+                CustomUser(email=f"bench{i}@example.com", username=f"Bench {i}", role='student',
+                           student_id=f"B{i:06d}", password=password)
+                for i in range(options['users'])
+            ])
+            scenarios = {
+                'valid': lambda i: (users[i % len(users)].email, BENCHMARK_PASSWORD, 200),
+                'wrong_password': lambda i: (users[i % len(users)].email, 'not-the-password', 401),
+                'unknown_email': lambda i: (f"nobody{i}@example.com", BENCHMARK_PASSWORD, 401),
+            }
+            for name, attempt in scenarios.items():
+                results[name] = self.run_scenario(attempt, options['requests'])
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:>15}: {result['logins_per_second']:8.2f} logins/s  "
+                f"p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  "
+                f"{result['queries_per_login']:.1f} queries/login  {result['hashes_per_login']:.1f} hashes/login"
+            )
+
+    def run_scenario(self, attempt, requests):
+        factory = APIRequestFactory()
+        view = LoginUserView.as_view()
+        timings = []
+        with count_hashes() as hashes, CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for i in range(requests):
+                email, password, expected = attempt(i)
+                request = factory.post('/api/login/', {'email': email, 'password': password}, format='json')
+                begin = time.perf_counter()
+                response = view(request)
+                timings.append(time.perf_counter() - begin)
+                if response.status_code != expected:
+                    raise RuntimeError(f"Login for {email} returned {response.status_code}, expected {expected}")
+            elapsed = time.perf_counter() - started
+        timings.sort()
+        return {
+            'requests': requests,
+            'logins_per_second': round(requests / elapsed, 2),
+            'p50_ms': round(median(timings) * 1000, 2),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 2),
+            'queries_per_login': len(queries.captured_queries) / requests,
+            'hashes_per_login': hashes[0] / requests,
+        }
@@ -0,0 +1,82 @@
+import json
+import time
+from statistics import median
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+
+from edulog_app.models import CustomUser
+from edulog_app.search import search_students
+from edulog_app.synthetic import generate_school
+
+QUERIES = {
+    'exact_id': lambda ids: ids[len(ids) // 2],
+    'id_prefix': lambda ids: ids[len(ids) // 3][:-2],
+    'name_prefix': lambda ids: 'Student 12',
+    'name_substring': lambda ids: 'udent 777',
+    'no_match': lambda ids: 'zzzz',
+}
+
+
+def legacy_search(query):
+    """The unindexed search StudentSearchView used before search_students()."""
+    return list(CustomUser.objects.filter(
+        Q(role='student') & (Q(username__icontains=query) | Q(student_id__icontains=query))
+    ).values('id', 'username', 'student_id')[:10])
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the legacy icontains student search with the indexed search_students() "
+        "on a synthetic school of --students students, created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20, help="Searches per query and implementation")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        results = {}
+        with transaction.atomic():
+            students = generate_school(students=options['students'], days=0, events=0)
+            ids = sorted(student.student_id for student in students)
+            if connection.vendor in ('postgresql', 'sqlite'):
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+            for name, make_query in QUERIES.items():
+                query = make_query(ids)
+                results[name] = {
+                    'query': query,
+                    'legacy': self.measure(legacy_search, query, options['repeat']),
+                    'indexed': self.measure(search_students, query, options['repeat']),
+                }
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            legacy, indexed = result['legacy'], result['indexed']
+            self.stdout.write(
+                f"{name:>15} {result['query']!r:>12}: legacy p50 {legacy['p50_ms']:8.2f} ms  "
+                f"indexed p50 {indexed['p50_ms']:8.2f} ms  ({indexed['queries']} queries, "
+                f"{indexed['results']} results)"
+            )
+
+    def measure(self, search, query, repeat):
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(repeat):
+                begin = time.perf_counter()
+                rows = search(query)
+                timings.append(time.perf_counter() - begin)
+        timings.sort()
+        return {
+            'p50_ms': round(median(timings) * 1000, 2),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 2),
+            'queries': len(queries.captured_queries) // repeat,
+            'results': len(rows),
+        }
@@ -0,0 +1,79 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from edulog_app.models import Attendance, AttendanceLog
+from edulog_app.row_serializers import row_serializer
+from edulog_app.serializers import AdminAttendanceSerializer, AttendanceLogSerializer, AttendanceSerializer
+from edulog_app.synthetic import generate_school
+
+LISTINGS = {
+    'admin_attendance': (Attendance.objects.select_related('user'), AdminAttendanceSerializer, ('-date', '-id')),
+    'attendance_records': (Attendance.objects.select_related('user'), AttendanceSerializer, ('-date', '-id')),
+    'attendance_logs': (AttendanceLog.objects.all(), AttendanceLogSerializer, ('-timestamp', '-id')),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/second of the list endpoints' two serialization paths: model instances through "
+        "the serializer, and values_list() rows through row_serializer(). Each run reads and renders "
+        "--rows rows to JSON, and the two outputs must be identical. Uses a synthetic school in a "
+        "transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--rows', type=int, default=10000, help="Rows per listing, like one page of that size")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per path; the fastest counts")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        results = {}
+        with transaction.atomic():
+            generate_school(students=options['students'], days=options['days'], events=0)
+            for name, (queryset, serializer_class, ordering) in LISTINGS.items():
+                queryset = queryset.order_by(*ordering)[:options['rows']]
+                rows = row_serializer(serializer_class)
+
+                def serializer_path():
+                    return JSONRenderer().render(serializer_class(list(queryset), many=True).data)
+
+                def row_path():
+                    return JSONRenderer().render(rows.serialize(queryset.values_list(*rows.paths)))
+
+                serializer_seconds, expected = self.best_of(serializer_path, options['repeat'])
+                row_seconds, rendered = self.best_of(row_path, options['repeat'])
+                if rendered != expected:
+                    raise RuntimeError(f"{name}: the two paths rendered different JSON")
+                count = len(json.loads(expected))
+                results[name] = {
+                    'rows': count,
+                    'serializer_rows_per_second': round(count / serializer_seconds),
+                    'values_rows_per_second': round(count / row_seconds),
+                    'speedup': round(serializer_seconds / row_seconds, 2),
+                }
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:>18}: serializer {result['serializer_rows_per_second']:8d} rows/s  "
+                f"values {result['values_rows_per_second']:8d} rows/s  {result['speedup']}x"
+            )
+
+    @staticmethod
+    def best_of(run, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            output = run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, output
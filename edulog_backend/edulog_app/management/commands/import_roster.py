@@ -0,0 +1,46 @@
+import json
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from edulog_app.roster import ROSTER_CHUNK_SIZE, import_roster
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update students and admins, and their departments, from a roster CSV with the columns "
+        "email, username and optionally student_id, department, role and password (see edulog_app.roster). "
+        "Rows with errors are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Roster CSV, or - for standard input")
+        parser.add_argument('--chunk-size', type=int, default=ROSTER_CHUNK_SIZE, help="Rows per transaction")
+        parser.add_argument('--workers', type=int, help="Password hashing processes (default: ROSTER_IMPORT_WORKERS)")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+        workers = settings.ROSTER_IMPORT_WORKERS if options['workers'] is None else options['workers']
+        try:
+            if options['path'] == '-':
+                sys.stdin.reconfigure(encoding='utf-8-sig', newline='')
+                report = import_roster(sys.stdin, options['chunk_size'], workers)
+            else:
+                with open(options['path'], encoding='utf-8-sig', newline='') as f:
+                    report = import_roster(f, options['chunk_size'], workers)
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for error in report['errors']:
+            for field, messages in error['errors'].items():
+                self.stderr.write(f"Line {error['line']}: {field}: {' '.join(messages)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {report['rows']} row(s): {report['created']} user(s) created, {report['updated']} updated, "
+            f"{report['departments_created']} department(s) created, {len(report['errors'])} row(s) skipped"
+        ))
@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from edulog_app.management.dates import parse_date
+from edulog_app.models import Attendance, CustomUser
+from edulog_app.response_cache import bump_versions
+from edulog_app.rollups import AttendanceState, apply_attendance_changes
+
+# Reads of a chunk whose students keep getting rows written under it
+INSERT_ATTEMPTS = 3
+
+
+class Command(BaseCommand):
+    help = (
+        "Insert 'absent' Attendance rows for every active student with no record on the given day(s). "
+        "Idempotent: students that already have a row are left alone, so the command can be re-run or resumed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Day to materialize (YYYY-MM-DD, default: yesterday)")
+        parser.add_argument('--from', dest='from_date', help="First day of a backfill range (YYYY-MM-DD)")
+        parser.add_argument('--to', dest='to_date', help="Last day of a backfill range (YYYY-MM-DD, default: yesterday)")
+        parser.add_argument('--include-weekends', action='store_true', help="Also mark Saturdays and Sundays")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Students per INSERT/transaction")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the missing rows")
+
+    def handle(self, *args, **options):
+        yesterday = timezone.now().date() - timedelta(days=1)
+        if options['date']:
+            start_date = end_date = parse_date(options['date'])
+        elif options['from_date']:
+            start_date = parse_date(options['from_date'])
+            end_date = parse_date(options['to_date']) if options['to_date'] else yesterday
+        else:
+            start_date = end_date = yesterday
+        if start_date > end_date:
+            raise CommandError("--from must not be after --to")
+        if end_date >= timezone.now().date():
+            raise CommandError("Refusing to mark absences for today or future days")
+
+        total = 0
+        day = start_date
+        while day <= end_date:
+            if options['include_weekends'] or day.weekday() < 5:
+                marked = self.mark_day(day, options['chunk_size'], options['dry_run'])
+                total += marked
+                self.stdout.write(f"{day}: {marked} absence(s) {'missing' if options['dry_run'] else 'marked'}")
+            day += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f"{total} absence(s) {'missing' if options['dry_run'] else 'marked'}"))
+
+    def missing_students(self, day):
+        """Active students with no Attendance row for `day` (one anti-join)."""
+        return CustomUser.objects.filter(role='student', is_active=True).exclude(
+            Exists(Attendance.objects.filter(user=OuterRef('pk'), date=day))
+        )
+
+    def mark_day(self, day, chunk_size, dry_run):
+        missing = self.missing_students(day)
+        if dry_run:
+            return missing.count()
+
+        marked = 0
+        last_id = 0
+        while True:
+            # Each chunk commits on its own, so an interrupted run resumes
+            # from wherever it stopped when re-run
+            for attempt in range(1, INSERT_ATTEMPTS + 1):
+                try:
+                    with transaction.atomic():
+                        chunk = self.next_chunk(missing, last_id, chunk_size)
+                        if chunk:
+                            self.insert(day, chunk)
+                    break
+                except IntegrityError:
+                    # A row was written after the anti-join read (e.g. a late
+                    # clock-in); read the chunk again without it
+                    if attempt == INSERT_ATTEMPTS:
+                        raise
+            if not chunk:
+                return marked
+            last_id = chunk[-1][0]
+            marked += len(chunk)
+
+    def next_chunk(self, missing, last_id, chunk_size):
+        """(id, department_id) of the next `chunk_size` missing students after `last_id`."""
+        return list(missing.filter(id__gt=last_id).order_by('id').values_list('id', 'department_id')[:chunk_size])
+
+    def insert(self, day, chunk):
+        # A plain insert, so every row the deltas count really was written
+        # here; a row that appeared since the read fails the whole chunk
+        Attendance.objects.bulk_create(
+            [Attendance(user_id=user_id, date=day, status='absent') for user_id, _ in chunk], batch_size=len(chunk),
+        )
+        apply_attendance_changes(
+            [(None, AttendanceState(user_id, day, 'absent')) for user_id, _ in chunk],
+            departments=dict(chunk),
+        )
+        bump_versions('attendance')
@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from edulog_app.management.dates import parse_date
+from edulog_app.models import DailyAttendanceRollup
+from edulog_app.response_cache import bump_versions
+from edulog_app.rollups import ROLLUP_STATUSES, count_students, compute_daily_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or with --verify, check) the daily attendance rollup from raw Attendance rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Only this day (YYYY-MM-DD)")
+        parser.add_argument('--from', dest='from_date', help="First day of the range (YYYY-MM-DD)")
+        parser.add_argument('--to', dest='to_date', help="Last day of the range (YYYY-MM-DD)")
+        parser.add_argument('--verify', action='store_true', help="Report mismatches without writing anything")
+
+    def handle(self, *args, **options):
+        start_date = end_date = None
+        if options['date']:
+            start_date = end_date = parse_date(options['date'])
+        else:
+            if options['from_date']:
+                start_date = parse_date(options['from_date'])
+            if options['to_date']:
+                end_date = parse_date(options['to_date'])
+
+        expected = compute_daily_rollups(start_date, end_date)
+        existing = DailyAttendanceRollup.objects.all()
+        if start_date:
+            existing = existing.filter(date__gte=start_date)
+        if end_date:
+            existing = existing.filter(date__lte=end_date)
+        existing = {(row.date, row.department_id): row for row in existing}
+
+        if options['verify']:
+            self._verify(expected, existing)
+        else:
+            self._rebuild(expected, existing, start_date, end_date)
+
+    def _verify(self, expected, existing):
+        zero = dict.fromkeys(ROLLUP_STATUSES, 0)
+        mismatches = 0
+        for key in sorted(set(expected) | set(existing), key=lambda k: (k[0], k[1] or 0)):
+            row = existing.get(key)
+            actual = {status: getattr(row, status) for status in ROLLUP_STATUSES} if row else None
+            # Days nobody has looked at yet have no row; that is not drift
+            if actual is None:
+                continue
+            if actual != expected.get(key, zero):
+                mismatches += 1
+                self.stdout.write(f"{key[0]} department={key[1]}: rollup {actual} != raw {expected.get(key, zero)}")
+        if mismatches:
+            raise CommandError(f"{mismatches} rollup row(s) out of date; rerun without --verify to rebuild")
+        self.stdout.write(self.style.SUCCESS(f"{len(existing)} rollup row(s) match raw attendance"))
+
+    @transaction.atomic
+    def _rebuild(self, expected, existing, start_date, end_date):
+        today = timezone.now().date()
+        totals = {}
+
+        def student_total(key):
+            # Historical rows keep their snapshot; only current rows are recounted
+            if key in existing and key[0] < today:
+                return existing[key].student_total
+            if key[1] not in totals:
+                totals[key[1]] = count_students(key[1])
+            return totals[key[1]]
+
+        rows = [
+            DailyAttendanceRollup(date=day, department_id=department_id, student_total=student_total((day, department_id)), **counts)
+            for (day, department_id), counts in expected.items()
+        ]
+        stale = DailyAttendanceRollup.objects.all()
+        if start_date:
+            stale = stale.filter(date__gte=start_date)
+        if end_date:
+            stale = stale.filter(date__lte=end_date)
+        stale.delete()
+        DailyAttendanceRollup.objects.bulk_create(rows, batch_size=1000)
+        bump_versions('attendance', 'students')
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(rows)} rollup row(s)"))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from edulog_app.models import StudentAttendanceCounter
+from edulog_app.response_cache import bump_versions
+from edulog_app.rollups import COUNTER_STATUSES, compute_attendance_counters
+
+COUNTER_FIELDS = ('total',) + COUNTER_STATUSES
+
+
+class Command(BaseCommand):
+    help = "Reconcile (or with --verify, check) per-student attendance counters against raw Attendance."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help="Only this user id (repeatable)")
+        parser.add_argument('--verify', action='store_true', help="Report mismatches without writing anything")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        expected = compute_attendance_counters(user_ids)
+        counters = StudentAttendanceCounter.objects.all()
+        if user_ids:
+            counters = counters.filter(user_id__in=user_ids)
+        zero = dict.fromkeys(COUNTER_FIELDS, 0)
+
+        stale, missing = [], []
+        existing = set()
+        for counter in counters.iterator(chunk_size=options['batch_size']):
+            existing.add(counter.user_id)
+            wanted = expected.get(counter.user_id, zero)
+            if any(getattr(counter, field) != wanted[field] for field in COUNTER_FIELDS):
+                for field in COUNTER_FIELDS:
+                    setattr(counter, field, wanted[field])
+                stale.append(counter)
+        for user_id, fields in expected.items():
+            if user_id not in existing:
+                missing.append(StudentAttendanceCounter(user_id=user_id, **fields))
+
+        if options['verify']:
+            for counter in stale:
+                self.stdout.write(f"user {counter.user_id}: expected {expected.get(counter.user_id, zero)}")
+            for counter in missing:
+                self.stdout.write(f"user {counter.user_id}: missing")
+            # The percentage view reads a missing row as no attendance, so it is drift
+            drift = len(stale) + len(missing)
+            if drift:
+                raise CommandError(f"{drift} counter(s) out of date; rerun without --verify to fix")
+            self.stdout.write(self.style.SUCCESS(f"{len(existing)} counter(s) match raw attendance"))
+            return
+
+        with transaction.atomic():
+            StudentAttendanceCounter.objects.bulk_update(stale, COUNTER_FIELDS, batch_size=options['batch_size'])
+            StudentAttendanceCounter.objects.bulk_create(missing, batch_size=options['batch_size'], ignore_conflicts=True)
+            bump_versions('attendance')
+        self.stdout.write(self.style.SUCCESS(f"Fixed {len(stale)} counter(s), created {len(missing)}"))
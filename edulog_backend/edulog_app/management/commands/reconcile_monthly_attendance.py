@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from edulog_app.models import StudentMonthlyAttendance
+from edulog_app.response_cache import bump_versions
+from edulog_app.rollups import ROLLUP_STATUSES, compute_monthly_attendance
+
+MONTHLY_FIELDS = ROLLUP_STATUSES + tuple(f'last_{status}' for status in ROLLUP_STATUSES)
+# A month whose rows were all deleted keeps its (now empty) row
+EMPTY_MONTH = {field: 0 if field in ROLLUP_STATUSES else None for field in MONTHLY_FIELDS}
+
+
+class Command(BaseCommand):
+    help = "Reconcile (or with --verify, check) per-student monthly attendance rows against raw Attendance."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help="Only this user id (repeatable)")
+        parser.add_argument('--verify', action='store_true', help="Report mismatches without writing anything")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        expected = compute_monthly_attendance(user_ids)
+        rows = StudentMonthlyAttendance.objects.all()
+        if user_ids:
+            rows = rows.filter(user_id__in=user_ids)
+
+        stale, missing = [], []
+        existing = set()
+        for row in rows.iterator(chunk_size=options['batch_size']):
+            key = (row.user_id, row.month)
+            existing.add(key)
+            wanted = expected.get(key, EMPTY_MONTH)
+            if any(getattr(row, field) != wanted[field] for field in MONTHLY_FIELDS):
+                for field in MONTHLY_FIELDS:
+                    setattr(row, field, wanted[field])
+                stale.append(row)
+        for (user_id, month), fields in expected.items():
+            if (user_id, month) not in existing:
+                missing.append(StudentMonthlyAttendance(user_id=user_id, month=month, **fields))
+
+        if options['verify']:
+            for row in stale:
+                self.stdout.write(f"user {row.user_id} {row.month:%Y-%m}: expected {expected.get((row.user_id, row.month), EMPTY_MONTH)}")
+            for row in missing:
+                self.stdout.write(f"user {row.user_id} {row.month:%Y-%m}: missing")
+            # Reports read whole months from these rows, so a missing row is drift
+            drift = len(stale) + len(missing)
+            if drift:
+                raise CommandError(f"{drift} monthly row(s) out of date; rerun without --verify to fix")
+            self.stdout.write(self.style.SUCCESS(f"{len(existing)} monthly row(s) match raw attendance"))
+            return
+
+        with transaction.atomic():
+            StudentMonthlyAttendance.objects.bulk_update(stale, MONTHLY_FIELDS, batch_size=options['batch_size'])
+            StudentMonthlyAttendance.objects.bulk_create(missing, batch_size=options['batch_size'], ignore_conflicts=True)
+            bump_versions('attendance')
+        self.stdout.write(self.style.SUCCESS(f"Fixed {len(stale)} monthly row(s), created {len(missing)}"))
@@ -0,0 +1,36 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from edulog_app.snapshot import Snapshot, build_snapshot, refresh
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the analytics snapshot that workers map read-only (see edulog_app.snapshot) and swap it "
+        "into place. Reads rebuild a stale snapshot themselves unless ANALYTICS_SNAPSHOT_MAX_AGE is 0; "
+        "then run this periodically, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help="Snapshot file (default ANALYTICS_SNAPSHOT_PATH)")
+        parser.add_argument('--if-stale', action='store_true', help="Do nothing if the current snapshot is still current")
+
+    def handle(self, *args, **options):
+        path = options['path'] or settings.ANALYTICS_SNAPSHOT_PATH
+        if not path:
+            raise CommandError("No snapshot path: pass --path or set ANALYTICS_SNAPSHOT_PATH")
+
+        if options['if_stale']:
+            version = refresh(path)
+            if version is None:
+                self.stdout.write(f"{path} is current or being rebuilt, nothing to do")
+                return
+        else:
+            version = build_snapshot(path)
+        snapshot = Snapshot(path)
+        self.stdout.write(
+            f"Wrote {path}: version {version}, {len(snapshot.students)} students, "
+            f"{len(snapshot.departments)} departments, {os.path.getsize(path)} bytes"
+        )
@@ -0,0 +1,179 @@
+import contextvars
+import heapq
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+slow_request_logger = logging.getLogger('edulog.slow_requests')
+
+SQL_LOG_LENGTH = 1000
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware that can also run async. WhiteNoise itself is
+    sync-only, and one sync-only middleware makes Django run every view
+    below it in a thread, async views included. Static files are still
+    served from a thread; everything else passes straight through.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class QueryStats:
+    """Queries of one request: how many, their total time and the slowest few."""
+
+    def __init__(self, keep):
+        self.keep = keep
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest = []  # Min-heap of (seconds, sequence, sql)
+
+    def add(self, sql, seconds):
+        self.count += 1
+        self.seconds += seconds
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, (seconds, self.count, sql))
+        elif self.keep and seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, self.count, sql))
+
+
+_request_stats = contextvars.ContextVar('request_query_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper timing each query into the current request's QueryStats, if it is sampled."""
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add(sql, time.perf_counter() - started)
+
+
+def instrument(db_connection):
+    if record_query not in db_connection.execute_wrappers:
+        db_connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def instrument_new_connection(sender, connection, **kwargs):
+    instrument(connection)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Counts and times the database queries of a sampled fraction
+    (DB_INSTRUMENTATION_SAMPLE_RATE) of requests. Sampled responses get a
+    Server-Timing header with the query count, database time and total
+    time. A sampled request that takes longer than SLOW_REQUEST_MS or runs
+    more than SLOW_REQUEST_QUERIES queries is logged as JSON to the
+    edulog.slow_requests logger, with its view, parameters and its
+    SLOW_REQUEST_TOP_QUERIES slowest statements (SQL without parameter
+    values).
+
+    Every connection gets the record_query() execute wrapper when it
+    opens. The request's QueryStats travel in a context variable, so the
+    queries of async views, which run in worker threads, are counted too.
+    Unsampled requests pay one context variable lookup per query. Times
+    run until the response is returned, so rows read while a streamed
+    body is sent are not included.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        # Connections opened before this module was loaded missed the signal
+        instrument(connection)
+        stats, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self.finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        stats, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self.finish(request, response, stats, started)
+
+    @staticmethod
+    def sampled():
+        rate = settings.DB_INSTRUMENTATION_SAMPLE_RATE
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    @staticmethod
+    def start():
+        stats = QueryStats(settings.SLOW_REQUEST_TOP_QUERIES)
+        return stats, _request_stats.set(stats), time.perf_counter()
+
+    def finish(self, request, response, stats, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = stats.seconds * 1000
+        response['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{stats.count} queries", app;dur={total_ms - db_ms:.1f}, total;dur={total_ms:.1f}'
+        )
+        if total_ms > settings.SLOW_REQUEST_MS or stats.count > settings.SLOW_REQUEST_QUERIES:
+            self.log_slow_request(request, response, stats, total_ms)
+        return response
+
+    @staticmethod
+    def log_slow_request(request, response, stats, total_ms):
+        match = request.resolver_match
+        slow_request_logger.warning(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'params': {'url': match.kwargs if match else {}, 'query': request.GET.dict()},
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'db_ms': round(stats.seconds * 1000, 1),
+            'queries': stats.count,
+            'slowest_queries': [
+                {'ms': round(seconds * 1000, 2), 'sql': sql[:SQL_LOG_LENGTH]}
+                for seconds, _, sql in sorted(stats.slowest, reverse=True)
+            ],
+        }, default=str))
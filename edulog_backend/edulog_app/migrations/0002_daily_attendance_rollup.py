@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edulog_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('late', models.IntegerField(default=0)),
+                ('pending', models.IntegerField(default=0)),
+                ('student_total', models.IntegerField(default=0)),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='edulog_app.department')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('department__isnull', False)), fields=('date', 'department'), name='unique_department_daily_rollup'), models.UniqueConstraint(condition=models.Q(('department__isnull', True)), fields=('date',), name='unique_school_daily_rollup')],
+            },
+        ),
+    ]
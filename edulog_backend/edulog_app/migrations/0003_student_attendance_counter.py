@@ -0,0 +1,41 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_counters(apps, schema_editor):
+    Attendance = apps.get_model('edulog_app', 'Attendance')
+    StudentAttendanceCounter = apps.get_model('edulog_app', 'StudentAttendanceCounter')
+    rows = Attendance.objects.values('user_id').annotate(
+        total=Count('id'),
+        present=Count('id', filter=Q(status='present')),
+        absent=Count('id', filter=Q(status='absent')),
+        late=Count('id', filter=Q(status='late')),
+    ).order_by()
+    StudentAttendanceCounter.objects.bulk_create(
+        (StudentAttendanceCounter(**row) for row in rows.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edulog_app', '0002_daily_attendance_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAttendanceCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='attendance_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total', models.IntegerField(default=0)),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('late', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('edulog_app', '0003_student_attendance_counter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'status'], name='attendance_date_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['user', 'status'], name='attendance_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancelog',
+            index=models.Index(fields=['user', 'timestamp'], name='attendancelog_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('role', 'student')), fields=['department'], name='student_department_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schoolevent',
+            index=models.Index(fields=['date'], name='schoolevent_date_idx'),
+        ),
+    ]
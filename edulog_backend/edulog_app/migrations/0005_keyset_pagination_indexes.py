@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edulog_app', '0004_attendance_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='schoolevent',
+            name='schoolevent_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'id'], name='attendance_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancelog',
+            index=models.Index(fields=['timestamp', 'id'], name='attendancelog_time_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schoolevent',
+            index=models.Index(fields=['date', 'id'], name='schoolevent_date_id_idx'),
+        ),
+    ]
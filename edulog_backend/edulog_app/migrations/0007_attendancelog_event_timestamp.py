@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edulog_app', '0006_attendance_log_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attendancelog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Copied from edulog_app.search as of this migration, so later changes
+# there do not change what it backfills
+def normalize(value):
+    return ' '.join((value or '').lower().split())
+
+
+def student_terms(username, student_id):
+    name = normalize(username)[:150]
+    sid = normalize(student_id)[:150]
+    terms = set()
+    if sid:
+        terms.add(('id', sid))
+    if name:
+        terms.add(('name', name))
+        terms.update(('name', word) for word in name.split())
+    for text in (name, sid):
+        terms.update(('gram', text[i:i + 3]) for i in range(len(text) - 2))
+    return terms
+
+
+def byte_order_terms(apps, schema_editor):
+    # Prefix lookups are range scans; on PostgreSQL they need byte-wise
+    # ordering rather than the database's linguistic collation
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE edulog_app_studentsearchterm ALTER COLUMN term TYPE varchar(150) COLLATE "C"')
+
+
+def backfill_search_terms(apps, schema_editor):
+    CustomUser = apps.get_model('edulog_app', 'CustomUser')
+    StudentSearchTerm = apps.get_model('edulog_app', 'StudentSearchTerm')
+    students = CustomUser.objects.filter(role='student').values_list('id', 'username', 'student_id')
+    StudentSearchTerm.objects.bulk_create((
+        StudentSearchTerm(user_id=user_id, kind=kind, term=term)
+        for user_id, username, student_id in students.iterator()
+        for kind, term in student_terms(username, student_id)
+    ), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edulog_app', '0008_change_timestamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('id', 'Student ID'), ('name', 'Name'), ('gram', 'Trigram')], max_length=4)),
+                ('term', models.CharField(max_length=150)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'term', 'user'], name='search_term_idx')],
+            },
+        ),
+        migrations.RunPython(byte_order_terms, migrations.RunPython.noop),
+        migrations.RunPython(backfill_search_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncMonth
+
+STATUSES = ('present', 'absent', 'late', 'pending')
+
+
+def backfill_monthly_attendance(apps, schema_editor):
+    Attendance = apps.get_model('edulog_app', 'Attendance')
+    StudentMonthlyAttendance = apps.get_model('edulog_app', 'StudentMonthlyAttendance')
+    fields = {status: Count('id', filter=Q(status=status)) for status in STATUSES}
+    fields.update({f'last_{status}': Max('date', filter=Q(status=status)) for status in STATUSES})
+    rows = Attendance.objects.annotate(month=TruncMonth('date')).values('user_id', 'month').annotate(**fields).order_by()
+    StudentMonthlyAttendance.objects.bulk_create(
+        (StudentMonthlyAttendance(**row) for row in rows.iterator()), batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edulog_app', '0009_student_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentMonthlyAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('late', models.IntegerField(default=0)),
+                ('pending', models.IntegerField(default=0)),
+                ('last_present', models.DateField(blank=True, null=True)),
+                ('last_absent', models.DateField(blank=True, null=True)),
+                ('last_late', models.DateField(blank=True, null=True)),
+                ('last_pending', models.DateField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_attendance', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'month'), name='unique_student_month')],
+            },
+        ),
+        migrations.RunPython(backfill_monthly_attendance, migrations.RunPython.noop),
+    ]
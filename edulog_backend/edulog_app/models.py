@@ -22,6 +22,7 @@ class CustomUserManager(BaseUserManager):
 
 class Department(models.Model):
     name = models.CharField(max_length=50)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -48,20 +49,47 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = [] 
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so save signals can compute deltas
+        instance._loaded_state = instance.rollup_state()
+        return instance
+
+    def rollup_state(self):
+        if 'role' in self.get_deferred_fields() or 'department_id' in self.get_deferred_fields():
+            return None
+        return (self.role, self.department_id)
+
     def __str__(self):
         return self.email
 
     class Meta:
         db_table = 'edulog_app_customuser' 
+        indexes = [
+            # Student counts overall and per department, department filters.
+            # Partial: MySQL does not support the condition and Django skips
+            # the index there, leaving those queries the department_id
+            # foreign key index
+            models.Index(fields=['department'], condition=models.Q(role='student'), name='student_department_idx'),
+        ]
 
 class AttendanceLog(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when a buffered write reaches the table
+    timestamp = models.DateTimeField(default=timezone.now)
     action = models.CharField(max_length=50, choices=[('login', 'Login'), ('logout', 'Logout')])
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'timestamp'], name='attendancelog_user_time_idx'),
+            # Keyset pagination key
+            models.Index(fields=['timestamp', 'id'], name='attendancelog_time_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username if self.user else 'Unknown User'} - {self.action} at {self.timestamp}"
     
@@ -78,9 +106,158 @@ class Attendance(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES)
     clock_in_time = models.TimeField(null=True, blank=True)
     clock_out_time = models.TimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ('user', 'date')  # One record per user per day
+        indexes = [
+            # Daily status counts and newest-first listings
+            models.Index(fields=['date', 'status'], name='attendance_date_status_idx'),
+            # Per-student status counts
+            models.Index(fields=['user', 'status'], name='attendance_user_status_idx'),
+            # Keyset pagination key
+            models.Index(fields=['date', 'id'], name='attendance_date_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so save signals can compute deltas
+        instance._loaded_state = instance.rollup_state()
+        return instance
+
+    def rollup_state(self):
+        from .rollups import AttendanceState
+        if self.get_deferred_fields() & {'user_id', 'date', 'status'}:
+            return None
+        return AttendanceState(self.user_id, self.date, self.status)
+
+class DailyAttendanceRollup(models.Model):
+    """
+    Pre-aggregated attendance counts for one day, either school-wide
+    (department is NULL) or for a single department. Maintained by
+    edulog_app.rollups on every Attendance write.
+    """
+    date = models.DateField()
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, blank=True, related_name='daily_rollups')
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    late = models.IntegerField(default=0)
+    pending = models.IntegerField(default=0)
+    student_total = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'department'], condition=models.Q(department__isnull=False), name='unique_department_daily_rollup'),
+            models.UniqueConstraint(fields=['date'], condition=models.Q(department__isnull=True), name='unique_school_daily_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.department or 'All departments'}"
+
+class StudentAttendanceCounter(models.Model):
+    """
+    Denormalized lifetime attendance counts for one user, kept exact by
+    edulog_app.rollups on every Attendance write.
+    """
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='attendance_counter')
+    total = models.IntegerField(default=0)
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    late = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.present}/{self.total} present"
+
+class StudentMonthlyAttendance(models.Model):
+    """
+    One user's attendance counts and latest date per status for one
+    calendar month, kept exact by edulog_app.rollups on every Attendance
+    write. Student reports read whole months from here.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='monthly_attendance')
+    month = models.DateField()  # first day of the month
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    late = models.IntegerField(default=0)
+    pending = models.IntegerField(default=0)
+    last_present = models.DateField(null=True, blank=True)
+    last_absent = models.DateField(null=True, blank=True)
+    last_late = models.DateField(null=True, blank=True)
+    last_pending = models.DateField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='unique_student_month'),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} - {self.user_id}: {self.present} present"
+
+class StudentAttendanceCalendar(models.Model):
+    """
+    One user's attendance for one academic year packed two bits per day
+    (see edulog_app.attendance_calendar), kept current by
+    edulog_app.rollups on every Attendance write.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='attendance_calendars')
+    year = models.IntegerField()  # calendar year the academic year starts in
+    bits = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'year'], name='unique_student_calendar_year'),
+        ]
+
+    def __str__(self):
+        return f"{self.year} - {self.user_id}"
+
+class AttendanceLogArchive(models.Model):
+    """
+    Monthly per-user login/logout counts for AttendanceLog rows that
+    archive_logs has moved out of the hot table. The rows themselves are
+    kept in the month's compressed NDJSON file (see edulog_app.log_archive).
+    """
+    month = models.DateField()  # first day of the month
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='log_archives')
+    action = models.CharField(max_length=50, choices=[('login', 'Login'), ('logout', 'Logout')])
+    count = models.IntegerField(default=0)
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'user', 'action'], name='unique_log_archive_month'),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} - {self.user_id} {self.action} x{self.count}"
+
+class StudentSearchTerm(models.Model):
+    """
+    Search index for StudentSearchView, maintained by edulog_app.search on
+    every student save: normalized student ids, names and name words for
+    exact and prefix lookups, and their trigrams for substring lookups.
+    """
+    KIND_CHOICES = [
+        ('id', 'Student ID'),
+        ('name', 'Name'),
+        ('gram', 'Trigram'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='search_terms')
+    kind = models.CharField(max_length=4, choices=KIND_CHOICES)
+    # COLLATE "C" on PostgreSQL (set in migration 0009) so prefix ranges follow byte order
+    term = models.CharField(max_length=150)
+
+    class Meta:
+        indexes = [
+            # Equality, prefix ranges and posting lists, all in (term, user) order
+            models.Index(fields=['kind', 'term', 'user'], name='search_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.term} -> {self.user_id}"
 
 class Student(models.Model):
     name = models.CharField(max_length=100)
@@ -96,6 +273,12 @@ class SchoolEvent(models.Model):
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Upcoming events and the keyset pagination key
+            models.Index(fields=['date', 'id'], name='schoolevent_date_id_idx'),
+            # Conditional-GET validators: COUNT/MAX(updated_at) from the index alone
+            models.Index(fields=['updated_at'], name='schoolevent_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.date}"
\ No newline at end of file
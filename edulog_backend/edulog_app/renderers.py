@@ -0,0 +1,22 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class StreamingExportRenderer(BaseRenderer):
+    """
+    Lets DRF content negotiation accept ?format=csv / ?format=ndjson.
+    Views that support these formats return a StreamingHttpResponse
+    themselves, so only error payloads ever reach render(); those are
+    written as JSON.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return JSONRenderer().render(data, renderer_context=renderer_context)
+
+
+class CSVRenderer(StreamingExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(StreamingExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
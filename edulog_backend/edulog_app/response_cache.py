@@ -0,0 +1,128 @@
+"""
+Versioned response cache for the read-heavy stats and report views.
+
+Every cached view declares the data domains it reads ('attendance',
+'students', 'departments', 'events'). Each domain has a version number in
+the cache, and a response is stored under the view name, the versions of
+its domains and the normalized query string. A write never deletes
+entries; it bumps the version of its domain, so every response built from
+the old data stops being addressable and ages out of the cache on its own.
+
+Saves and deletes bump versions from edulog_app.signals. Bulk writes that
+bypass the signals (bulk_create, queryset update) call bump_versions()
+themselves. The bump happens right away and again once the transaction
+commits, so a response cached by a concurrent reader between the two
+cannot outlive the commit.
+
+The versions live in the cache, so every process sharing the cache
+backend sees a bump. The default file backend is shared by the workers on
+one host; a plain local-memory cache is only safe with a single worker.
+"""
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+DOMAINS = ('attendance', 'students', 'departments', 'events')
+VERSION_KEY = 'response-cache:version:{domain}'
+RESPONSE_KEY = 'response-cache:{view}:{versions}:{params}'
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+
+def _new_version():
+    # Not a counter from 1: an evicted version key must never come back
+    # as a number an older response was stored under
+    return time.time_ns()
+
+
+def _bump(domains):
+    for domain in domains:
+        key = VERSION_KEY.format(domain=domain)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+
+
+def bump_versions(*domains):
+    """Invalidate every cached response that reads any of `domains`."""
+    _bump(domains)
+    transaction.on_commit(lambda: _bump(domains))
+
+
+def get_versions(domains):
+    keys = {domain: VERSION_KEY.format(domain=domain) for domain in domains}
+    stored = cache.get_many(keys.values())
+    versions = []
+    for domain, key in keys.items():
+        if key not in stored:
+            cache.add(key, _new_version(), None)
+            stored[key] = cache.get(key)
+        versions.append(str(stored[key]))
+    return versions
+
+
+def _params_key(request):
+    params = sorted((name, value) for name, values in request.query_params.lists() for value in values)
+    return hashlib.md5(urlencode(params).encode()).hexdigest()
+
+
+def _record(view, outcome):
+    with _stats_lock:
+        _stats[view][outcome] += 1
+
+
+def cache_stats():
+    """Per-view hit/miss counts for this process since it started."""
+    with _stats_lock:
+        stats = {view: dict(counts) for view, counts in _stats.items()}
+    for counts in stats.values():
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_rate'] = round(counts['hits'] / lookups, 3) if lookups else 0.0
+    return stats
+
+
+def cached_response(*domains):
+    """
+    Cache the data of a view's successful Response for
+    RESPONSE_CACHE_SECONDS, keyed on `domains`' versions and the query
+    string. Anything else the view returns (errors, streamed exports)
+    passes through uncached. Sets X-Cache: HIT/MISS.
+    """
+    def decorator(get):
+        @wraps(get)
+        def wrapper(view, request, *args, **kwargs):
+            timeout = settings.RESPONSE_CACHE_SECONDS
+            if not timeout:
+                return get(view, request, *args, **kwargs)
+            name = type(view).__name__
+            key = RESPONSE_KEY.format(
+                view=name,
+                versions='.'.join(get_versions(domains)),
+                params=_params_key(request),
+            )
+            data = cache.get(key)
+            if data is not None:
+                _record(name, 'hits')
+                response = Response(data, status=status.HTTP_200_OK)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            _record(name, 'misses')
+            response = get(view, request, *args, **kwargs)
+            if isinstance(response, Response) and response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data, timeout)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
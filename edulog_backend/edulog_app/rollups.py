@@ -0,0 +1,370 @@
+"""
+Incrementally maintained attendance aggregates.
+
+Every Attendance write is described as a (previous, current) pair of
+AttendanceState snapshots and applied as counter deltas, so the dashboard
+stats views read one pre-aggregated row instead of scanning Attendance.
+The same deltas keep the per-student StudentAttendanceCounter and
+StudentMonthlyAttendance rows exact, and the same changes are written
+into the per-student yearly calendars (edulog_app.attendance_calendar).
+Rows that do not exist yet are built from the raw tables the first time
+they are touched, which also makes the rollup self-healing after a purge.
+"""
+from collections import Counter, defaultdict, namedtuple
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, TruncMonth
+from django.utils import timezone
+
+from .attendance_calendar import apply_calendar_changes
+from .models import Attendance, CustomUser, DailyAttendanceRollup, StudentAttendanceCounter, StudentMonthlyAttendance
+
+AttendanceState = namedtuple('AttendanceState', ['user_id', 'date', 'status'])
+
+ROLLUP_STATUSES = ('present', 'absent', 'late', 'pending')
+COUNTER_STATUSES = ('present', 'absent', 'late')
+
+
+def _status_counts(queryset):
+    return queryset.aggregate(**{
+        status: Count('id', filter=Q(status=status)) for status in ROLLUP_STATUSES
+    })
+
+
+def count_students(department_id=None):
+    students = CustomUser.objects.filter(role='student')
+    if department_id is not None:
+        students = students.filter(department_id=department_id)
+    return students.count()
+
+
+def _create_daily_rollup(day, department_id=None):
+    """
+    Build a rollup row from the raw tables. Returns (row, created); when
+    another transaction won the race the existing row is returned instead.
+    """
+    records = Attendance.objects.filter(date=day)
+    if department_id is not None:
+        records = records.filter(user__department_id=department_id)
+    fields = _status_counts(records)
+    fields['student_total'] = count_students(department_id)
+    try:
+        with transaction.atomic():
+            row = DailyAttendanceRollup.objects.create(date=day, department_id=department_id, **fields)
+        return row, True
+    except IntegrityError:
+        return DailyAttendanceRollup.objects.get(date=day, department_id=department_id), False
+
+
+def get_daily_rollup(day=None, department_id=None):
+    """Return the rollup row for a day, building it on first access."""
+    day = day or timezone.now().date()
+    row = DailyAttendanceRollup.objects.filter(date=day, department_id=department_id).first()
+    if row is None:
+        row, _ = _create_daily_rollup(day, department_id)
+    return row
+
+
+def _counter_fields(queryset):
+    return queryset.aggregate(total=Count('id'), **{
+        status: Count('id', filter=Q(status=status)) for status in COUNTER_STATUSES
+    })
+
+
+def _create_attendance_counter(user_id):
+    fields = _counter_fields(Attendance.objects.filter(user_id=user_id))
+    try:
+        with transaction.atomic():
+            return StudentAttendanceCounter.objects.create(user_id=user_id, **fields), True
+    except IntegrityError:
+        return StudentAttendanceCounter.objects.get(user_id=user_id), False
+
+
+def get_attendance_counter(user_id):
+    """Return a user's lifetime attendance counter, building it on first access."""
+    counter = StudentAttendanceCounter.objects.filter(user_id=user_id).first()
+    if counter is None:
+        counter, _ = _create_attendance_counter(user_id)
+    return counter
+
+
+async def aget_attendance_counter(user_id):
+    counter = await StudentAttendanceCounter.objects.filter(user_id=user_id).afirst()
+    if counter is None:
+        counter, _ = await sync_to_async(_create_attendance_counter)(user_id)
+    return counter
+
+
+def next_month(day):
+    """First day of the month after the one `day` falls in."""
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _monthly_fields():
+    fields = {status: Count('id', filter=Q(status=status)) for status in ROLLUP_STATUSES}
+    fields.update({f'last_{status}': Max('date', filter=Q(status=status)) for status in ROLLUP_STATUSES})
+    return fields
+
+
+def _create_monthly_attendance(user_id, month):
+    records = Attendance.objects.filter(user_id=user_id, date__gte=month, date__lt=next_month(month))
+    fields = records.aggregate(**_monthly_fields())
+    try:
+        with transaction.atomic():
+            return StudentMonthlyAttendance.objects.create(user_id=user_id, month=month, **fields), True
+    except IntegrityError:
+        return StudentMonthlyAttendance.objects.get(user_id=user_id, month=month), False
+
+
+def _apply_monthly_changes(deltas, latest, removed, written):
+    """
+    Counts take deltas and latest dates only move forward on insert. A
+    removal can only lower last_<status> when it was that latest date, and
+    those rows are re-read from the month's remaining raw rows. That needs
+    the removal to have been written, so before a delete it is left to
+    refresh_monthly_latest().
+    """
+    patterns = defaultdict(list)
+    for user_id, month in sorted(set(deltas) | set(latest)):
+        counts = tuple(sorted((status, delta) for status, delta in deltas[(user_id, month)].items() if delta))
+        patterns[(month, counts, tuple(sorted(latest[(user_id, month)].items())))].append(user_id)
+    for (month, counts, dates), user_ids in sorted(patterns.items()):
+        updates = {status: F(status) + delta for status, delta in counts}
+        for status, day in dates:
+            field = f'last_{status}'
+            updates[field] = Greatest(Coalesce(F(field), Value(day)), Value(day))
+        if not updates:
+            continue
+        rows = StudentMonthlyAttendance.objects.filter(month=month, user_id__in=user_ids)
+        if rows.update(**updates) == len(user_ids):
+            continue
+        existing = set(rows.values_list('user_id', flat=True))
+        for user_id in user_ids:
+            if user_id in existing:
+                continue
+            _, created = _create_monthly_attendance(user_id, month)
+            if not (created and written):
+                StudentMonthlyAttendance.objects.filter(month=month, user_id=user_id).update(**updates)
+
+    if written:
+        _refresh_latest(removed)
+
+
+def _refresh_latest(removed):
+    for (month, status, day), user_ids in sorted(removed.items()):
+        field = f'last_{status}'
+        remaining = Attendance.objects.filter(
+            user_id=OuterRef('user_id'), status=status, date__gte=month, date__lt=next_month(month),
+        ).order_by('-date').values('date')[:1]
+        StudentMonthlyAttendance.objects.filter(month=month, user_id__in=sorted(user_ids), **{field: day}).update(
+            **{field: Subquery(remaining)}
+        )
+
+
+def refresh_monthly_latest(states):
+    """
+    Re-read the monthly latest dates that removed AttendanceStates may have
+    held, once the rows are gone (e.g. from post_delete). A queryset delete
+    fires every pre_delete first, so re-reading there would still see rows
+    that are about to be deleted.
+    """
+    removed = defaultdict(set)
+    for state in states:
+        if state is not None and state.status in ROLLUP_STATUSES:
+            removed[(state.date.replace(day=1), state.status, state.date)].add(state.user_id)
+    _refresh_latest(removed)
+
+
+def _scope_key(key):
+    # Lock school-wide rows before department rows to keep lock order stable
+    day, department_id = key
+    return (day, -1 if department_id is None else department_id)
+
+
+def _user_departments(user_ids, departments=None):
+    departments = dict(departments or {})
+    missing = set(user_ids) - set(departments)
+    if missing:
+        departments.update(CustomUser.objects.filter(pk__in=missing).values_list('id', 'department_id'))
+    return departments
+
+
+def apply_attendance_changes(changes, departments=None, update_counters=True, written=True):
+    """
+    Apply (previous, current) AttendanceState pairs to the daily rollup,
+    the per-student counters, monthly rows and calendars. Either side may be None for inserts and
+    deletes. `departments` is an optional {user_id: department_id} map to
+    skip the department lookup. Must run inside the transaction that
+    performs the Attendance writes; pass written=False when the writes
+    have not hit the table yet (e.g. from pre_delete), so rows built from
+    raw counts still get the delta.
+    """
+    changes = [(previous, current) for previous, current in changes if previous != current]
+    if not changes:
+        return
+    user_ids = {state.user_id for pair in changes for state in pair if state is not None}
+    departments = _user_departments(user_ids, departments)
+
+    deltas = defaultdict(Counter)
+    counter_deltas = defaultdict(Counter)
+    monthly_deltas = defaultdict(Counter)
+    monthly_latest = defaultdict(dict)
+    monthly_removed = defaultdict(set)
+    for previous, current in changes:
+        for state, sign in ((previous, -1), (current, 1)):
+            if state is None:
+                continue
+            if update_counters:
+                counter_deltas[state.user_id]['total'] += sign
+            if update_counters and state.status in COUNTER_STATUSES:
+                counter_deltas[state.user_id][state.status] += sign
+            if state.status not in ROLLUP_STATUSES:
+                continue
+            if update_counters:
+                key = (state.user_id, state.date.replace(day=1))
+                monthly_deltas[key][state.status] += sign
+                if sign > 0:
+                    latest = monthly_latest[key]
+                    latest[state.status] = max(latest.get(state.status, state.date), state.date)
+                else:
+                    monthly_removed[(key[1], state.status, state.date)].add(state.user_id)
+            deltas[(state.date, None)][state.status] += sign
+            department_id = departments.get(state.user_id)
+            if department_id is not None:
+                deltas[(state.date, department_id)][state.status] += sign
+
+    with transaction.atomic(savepoint=False):
+        # Per-student rows first so the contended daily rows are held briefly.
+        # Students with identical deltas (e.g. a batch of clock-ins) share
+        # one UPDATE.
+        patterns = defaultdict(list)
+        for user_id in sorted(counter_deltas):
+            pattern = tuple(sorted((field, delta) for field, delta in counter_deltas[user_id].items() if delta))
+            if pattern:
+                patterns[pattern].append(user_id)
+        for pattern, pattern_user_ids in sorted(patterns.items()):
+            updates = {field: F(field) + delta for field, delta in pattern}
+            counters = StudentAttendanceCounter.objects.filter(user_id__in=pattern_user_ids)
+            if counters.update(**updates) == len(pattern_user_ids):
+                continue
+            existing = set(counters.values_list('user_id', flat=True))
+            for user_id in pattern_user_ids:
+                if user_id in existing:
+                    continue
+                _, created = _create_attendance_counter(user_id)
+                if not (created and written):
+                    StudentAttendanceCounter.objects.filter(user_id=user_id).update(**updates)
+        _apply_monthly_changes(monthly_deltas, monthly_latest, monthly_removed, written)
+        if update_counters:
+            apply_calendar_changes(changes)
+
+        for key in sorted(deltas, key=_scope_key):
+            updates = {status: F(status) + delta for status, delta in deltas[key].items() if delta}
+            if not updates:
+                continue
+            day, department_id = key
+            rollups = DailyAttendanceRollup.objects.filter(date=day, department_id=department_id)
+            if rollups.update(**updates):
+                continue
+            # A freshly built row already reflects writes that have happened
+            _, created = _create_daily_rollup(day, department_id)
+            if not (created and written):
+                rollups.update(**updates)
+
+
+def apply_student_changes(changes):
+    """
+    Keep student_total on today's (and any future) rollup rows in step
+    with student sign-ups, deletions, role and department changes. Each
+    change is a ((role, department_id) | None, (role, department_id) | None)
+    pair; historical rows keep the total they were built with.
+    """
+    deltas = Counter()
+    for previous, current in changes:
+        if previous == current:
+            continue
+        for state, sign in ((previous, -1), (current, 1)):
+            if state is None or state[0] != 'student':
+                continue
+            deltas[None] += sign
+            if state[1] is not None:
+                deltas[state[1]] += sign
+
+    today = timezone.now().date()
+    with transaction.atomic(savepoint=False):
+        for department_id in sorted(deltas, key=lambda d: -1 if d is None else d):
+            if deltas[department_id]:
+                DailyAttendanceRollup.objects.filter(
+                    date__gte=today, department_id=department_id
+                ).update(student_total=F('student_total') + deltas[department_id])
+
+
+def move_student_attendance(moves):
+    """
+    Move the status counts of students whose department changed between
+    the department rows of the rollup: `moves` is {user_id:
+    (previous department_id, current department_id)}. Rows count each
+    record under the student's current department, so every day moves,
+    not just today. Must run after the change is written; rows not built
+    yet are built from raw counts with the new department.
+    """
+    with transaction.atomic(savepoint=False):
+        for user_id, (previous, current) in sorted(moves.items()):
+            if previous == current:
+                continue
+            for status in ROLLUP_STATUSES:
+                # One record per student per day, so each day moves by one
+                days = Attendance.objects.filter(user_id=user_id, status=status).values('date')
+                for department_id, sign in sorted(((previous, -1), (current, 1)), key=lambda move: move[0] or 0):
+                    if department_id is not None:
+                        DailyAttendanceRollup.objects.filter(department_id=department_id, date__in=days).update(
+                            **{status: F(status) + sign}
+                        )
+
+
+def compute_daily_rollups(start_date=None, end_date=None):
+    """
+    Recompute status counts from raw Attendance, grouped by day and
+    department. Returns {(date, department_id): {status: count}}.
+    """
+    records = Attendance.objects.all()
+    if start_date:
+        records = records.filter(date__gte=start_date)
+    if end_date:
+        records = records.filter(date__lte=end_date)
+    counts = {status: Count('id', filter=Q(status=status)) for status in ROLLUP_STATUSES}
+
+    result = {}
+    for row in records.values('date').annotate(**counts).order_by():
+        result[(row['date'], None)] = {status: row[status] for status in ROLLUP_STATUSES}
+    by_department = records.filter(user__department__isnull=False).values('date', 'user__department_id')
+    for row in by_department.annotate(**counts).order_by():
+        result[(row['date'], row['user__department_id'])] = {status: row[status] for status in ROLLUP_STATUSES}
+    return result
+
+
+def compute_attendance_counters(user_ids=None):
+    """Recompute lifetime counters from raw Attendance as {user_id: fields}."""
+    records = Attendance.objects.all()
+    if user_ids is not None:
+        records = records.filter(user_id__in=user_ids)
+    counts = {status: Count('id', filter=Q(status=status)) for status in COUNTER_STATUSES}
+    return {
+        row.pop('user_id'): row
+        for row in records.values('user_id').annotate(total=Count('id'), **counts).order_by()
+    }
+
+
+def compute_monthly_attendance(user_ids=None):
+    """Recompute monthly rows from raw Attendance as {(user_id, month): fields}."""
+    records = Attendance.objects.all()
+    if user_ids is not None:
+        records = records.filter(user_id__in=user_ids)
+    rows = records.annotate(month=TruncMonth('date')).values('user_id', 'month')
+    return {
+        (row.pop('user_id'), row.pop('month')): row
+        for row in rows.annotate(**_monthly_fields()).order_by()
+    }
@@ -0,0 +1,256 @@
+"""
+Bulk roster import: students (and admins) with their departments from CSV.
+
+The CSV has a header row naming its columns: email and username are
+required; student_id, department, role (default student) and password
+are optional, and blank cells count as missing. Rows are validated one at
+a time as they are read and written in chunks of ROSTER_CHUNK_SIZE, each
+in its own transaction:
+
+* departments named in the chunk that do not exist yet are created;
+* users are upserted on email with bulk_create(update_conflicts=True), so
+  a known email gets the row's username and those of student_id, role and
+  department that are columns of the file (a blank student_id or
+  department cell clears it; a blank role keeps it). New users without a
+  role are students;
+* new users get their password hashed, or an unusable one when the row
+  has none. Existing users keep their password. import_roster() hashes in
+  the calling process unless given more workers; the import_roster
+  command runs ROSTER_IMPORT_WORKERS processes, which a web request must
+  not fork.
+
+A row that fails validation, repeats an email or student_id seen earlier
+in the file, or claims a student_id another user holds is reported with
+its line number and skipped; the rest of the file is still imported.
+The derived rows the save signals would maintain (search terms, rollup
+student totals and department counts, the JWT user cache and response
+cache versions) are updated per chunk.
+"""
+import csv
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from rest_framework.serializers import ValidationError, as_serializer_error
+
+from .authentication import user_cache
+from .models import CustomUser, Department
+from .response_cache import bump_versions
+from .rollups import apply_student_changes, move_student_attendance
+from .search import index_students
+from .serializers import RosterRowSerializer
+from .signals import SEARCH_FIELDS
+
+ROSTER_CHUNK_SIZE = 1000
+REQUIRED_COLUMNS = {'email', 'username'}
+# Updated on a known email when they are columns of the roster, with username always
+OPTIONAL_FIELDS = ['student_id', 'role', 'department']
+
+
+def read_roster(lines):
+    """
+    The header's column names, and an iterator of (line number, cells) for
+    each CSV record; cells without a value are left out.
+    """
+    reader = csv.DictReader(lines)
+    columns = {(name or '').strip().lower() for name in reader.fieldnames or ()}
+    if not REQUIRED_COLUMNS <= columns:
+        raise ValueError(f"The roster needs a header row with the columns {', '.join(sorted(REQUIRED_COLUMNS))}")
+    return columns, _records(reader)
+
+
+def _records(reader):
+    for row in reader:
+        yield reader.line_num, {
+            name.strip().lower(): value.strip()
+            for name, value in row.items()
+            if name and isinstance(value, str) and value.strip()
+        }
+
+
+class PasswordHasher:
+    """make_password() over a process pool, started on first use."""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._pool = None
+
+    def hash(self, passwords):
+        if self.workers <= 1 or len(passwords) < 2:
+            return [make_password(password) for password in passwords]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, initializer=django.setup)
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self._pool.map(make_password, passwords, chunksize=chunksize))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+
+
+def _messages(errors):
+    return {field: [str(message) for message in messages] for field, messages in errors.items()}
+
+
+class RosterImport:
+    """State carried across the chunks of one import."""
+
+    def __init__(self, hasher, columns):
+        self.hasher = hasher
+        self.update_fields = ['username'] + [field for field in OPTIONAL_FIELDS if field in columns]
+        # One serializer validates every row; building its fields per row would cost more than the check
+        self.serializer = RosterRowSerializer()
+        self.departments = {}
+        self.emails = {}
+        self.student_ids = {}
+        self.report = {'rows': 0, 'created': 0, 'updated': 0, 'departments_created': 0, 'errors': []}
+
+    def error(self, line, errors):
+        self.report['errors'].append({'line': line, 'errors': errors})
+
+    def validate(self, line, cells):
+        """The row's validated data, or None after reporting why it is skipped."""
+        self.report['rows'] += 1
+        try:
+            row = self.serializer.run_validation(cells)
+        except ValidationError as exc:
+            self.error(line, _messages(as_serializer_error(exc)))
+            return None
+        row['email'] = CustomUser.objects.normalize_email(row['email'])
+        for field, seen in (('email', self.emails), ('student_id', self.student_ids)):
+            value = row.get(field)
+            if value is not None and value in seen:
+                self.error(line, {field: [f"Already on line {seen[value]} of this roster"]})
+                return None
+        self.emails[row['email']] = line
+        if row.get('student_id') is not None:
+            self.student_ids[row['student_id']] = line
+        return row
+
+    def write(self, chunk):
+        """Upsert one chunk of (line, row) pairs."""
+        errors, departments, report = len(self.report['errors']), dict(self.departments), dict(self.report)
+        try:
+            with transaction.atomic():
+                self._write(chunk)
+        except IntegrityError as exc:
+            # Raced by a concurrent write: the chunk is rolled back and each of its rows reported
+            del report['errors'][errors:]
+            self.report, self.departments = report, departments
+            for line, _ in chunk:
+                self.error(line, {'non_field_errors': [f"Not imported: {exc}"]})
+
+    def _write(self, chunk):
+        self._create_departments({row['department'] for _, row in chunk if 'department' in row})
+        previous = {
+            user['email']: user for user in CustomUser.objects.filter(
+                email__in=[row['email'] for _, row in chunk]
+            ).values('email', 'department_id', *SEARCH_FIELDS)
+        }
+        holders = dict(CustomUser.objects.filter(
+            student_id__in=[row['student_id'] for _, row in chunk if 'student_id' in row]
+        ).values_list('student_id', 'email'))
+
+        rows = []
+        for line, row in chunk:
+            if holders.get(row.get('student_id'), row['email']) != row['email']:
+                self.error(line, {'student_id': ["Already belongs to another user"]})
+            else:
+                rows.append(row)
+        new = [row for row in rows if row['email'] not in previous and 'password' in row]
+        hashes = dict(zip((row['email'] for row in new), self.hasher.hash([row['password'] for row in new])))
+        users = []
+        for row in rows:
+            # Fields the roster leaves out keep their current value, so the derived rows see what is stored
+            user = CustomUser(**previous.get(row['email'], {'email': row['email'], 'role': 'student'}))
+            user.username = row['username']
+            if 'student_id' in self.update_fields:
+                user.student_id = row.get('student_id')
+            if 'department' in self.update_fields:
+                user.department_id = self.departments.get(row.get('department'))
+            user.role = row.get('role', user.role)
+            # Only used for new users: a conflict on email updates self.update_fields
+            user.password = hashes.get(row['email']) or make_password(None)
+            users.append(user)
+        if not users:
+            return
+        CustomUser.objects.bulk_create(
+            users, update_conflicts=True, unique_fields=['email'], update_fields=self.update_fields,
+        )
+        if any(user.pk is None for user in users):
+            # Backends that cannot return the rows of an upsert
+            ids = dict(CustomUser.objects.filter(email__in=[user.email for user in users]).values_list('email', 'id'))
+            for user in users:
+                user.pk = ids[user.email]
+
+        # What the user save signals would have done for each row
+        index_students([user for user in users if user.email not in previous], new=True)
+        index_students([
+            user for user in users if user.email in previous
+            and any(previous[user.email][field] != getattr(user, field) for field in SEARCH_FIELDS)
+        ])
+        apply_student_changes([
+            ((previous[user.email]['role'], previous[user.email]['department_id']) if user.email in previous else None,
+             user.rollup_state())
+            for user in users
+        ])
+        move_student_attendance({
+            user.pk: (previous[user.email]['department_id'], user.department_id)
+            for user in users if user.email in previous
+        })
+        for user in users:
+            if user.email in previous:
+                user_cache.invalidate(user.pk)
+        bump_versions('students', 'departments')
+        self.report['updated'] += sum(user.email in previous for user in users)
+        self.report['created'] += sum(user.email not in previous for user in users)
+
+    def _create_departments(self, names):
+        names -= self.departments.keys()
+        if not names:
+            return
+        # Names are not unique; rows use the oldest department of that name
+        for name, pk in Department.objects.filter(name__in=names).order_by('-id').values_list('name', 'id'):
+            self.departments[name] = pk
+        created = Department.objects.bulk_create([Department(name=name) for name in sorted(names - self.departments.keys())])
+        if created and any(department.pk is None for department in created):
+            created = Department.objects.filter(name__in=[department.name for department in created])
+        for department in created:
+            self.departments[department.name] = department.pk
+        self.report['departments_created'] += len(created)
+
+
+def import_roster(lines, chunk_size=ROSTER_CHUNK_SIZE, workers=1):
+    """
+    Import the roster CSV read from `lines` (an iterable of text lines, such
+    as a file opened with newline=''), hashing passwords in `workers`
+    processes. Returns the counts of rows read, users created and updated
+    and departments created, and the errors of the rows skipped, by line
+    number. Raises ValueError if the header lacks a required column.
+    """
+    columns, records = read_roster(lines)
+    hasher = PasswordHasher(workers)
+    roster = RosterImport(hasher, columns)
+    chunk = []
+    line = 1
+    try:
+        while True:
+            try:
+                line, cells = next(records)
+            except StopIteration:
+                break
+            except UnicodeDecodeError:
+                roster.error(line + 1, {'non_field_errors': ["Not UTF-8 text; the rest of the roster was not read"]})
+                break
+            row = roster.validate(line, cells)
+            if row is not None:
+                chunk.append((line, row))
+            if len(chunk) >= chunk_size:
+                roster.write(chunk)
+                chunk = []
+        if chunk:
+            roster.write(chunk)
+    finally:
+        hasher.close()
+    return roster.report
@@ -0,0 +1,129 @@
+"""
+Read-only serialization straight from values_list() rows.
+
+A ModelSerializer builds a model instance per row, then walks every
+field's source and calls its to_representation(). For listings of
+thousands of rows that costs more CPU than the query. RowSerializer
+compiles a serializer class once into the values_list() paths its
+readable fields read and a generated function that turns one row tuple
+into the dict the serializer would have returned: same keys, same order,
+same values, so the rendered JSON is byte for byte the same.
+
+Fields whose to_representation() returns database values unchanged
+(integers, strings, string choices, related primary keys) are copied.
+Dates, times and timestamps in the default ISO 8601 format are formatted
+inline, with the current time zone looked up once per call rather than
+once per value; any other field goes through its own to_representation().
+Fields that need the model instance (method fields, nested serializers,
+to-many relations) are rejected when compiling.
+"""
+import functools
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .pagination import KeysetPagination
+
+
+# Serializer field -> column types for which its to_representation() returns the value unchanged
+COPIED_VALUES = {
+    serializers.IntegerField: ('AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField', 'SmallIntegerField'),
+    serializers.CharField: ('CharField', 'TextField', 'EmailField', 'SlugField'),
+    serializers.EmailField: ('EmailField',),
+}
+
+
+def _column(model, source_attrs):
+    for name in source_attrs[:-1]:
+        model = model._meta.get_field(name).related_model
+    return model._meta.get_field(source_attrs[-1])
+
+
+def _copies_value(field, column):
+    """Whether to_representation() is the identity for the values `column` returns."""
+    if isinstance(field, serializers.ChoiceField):
+        return all(isinstance(key, str) for key in field.choices)
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        return field.pk_field is None
+    return column.get_internal_type() in COPIED_VALUES.get(type(field), ())
+
+
+def _iso_format(field, default):
+    output_format = getattr(field, 'format', default)
+    return output_format is not None and output_format.lower() == ISO_8601
+
+
+def _iso_datetime(value, tz):
+    """DateTimeField.to_representation() of an aware datetime, for ISO 8601 output in `tz`."""
+    value = value.astimezone(tz).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def _expression(field, column, value, namespace):
+    """Python source computing `field`'s representation of `value`, the row item it reads."""
+    if _copies_value(field, column):
+        return value
+    if type(field) in (serializers.DateField, serializers.TimeField):
+        if _iso_format(field, api_settings.DATE_FORMAT if type(field) is serializers.DateField else api_settings.TIME_FORMAT):
+            return f'None if {value} is None else {value}.isoformat()'
+    elif type(field) is serializers.DateTimeField and settings.USE_TZ and not hasattr(field, 'timezone') \
+            and _iso_format(field, api_settings.DATETIME_FORMAT) and column.get_internal_type() == 'DateTimeField':
+        # With USE_TZ the database hands back aware datetimes
+        return f'None if {value} is None else iso_datetime({value}, tz)'
+    converter = f'convert_{len(namespace)}'
+    namespace[converter] = field.to_representation
+    return f'None if {value} is None else {converter}({value})'
+
+
+class RowSerializer:
+    """A serializer class compiled for values_list() rows; build with row_serializer()."""
+
+    def __init__(self, serializer_class):
+        fields = [field for field in serializer_class().fields.values() if not field.write_only]
+        self.paths = []
+        items, namespace = [], {'iso_datetime': _iso_datetime}
+        for field in fields:
+            if isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer, serializers.ManyRelatedField)) \
+                    or field.source == '*':
+                raise ImproperlyConfigured(f"{serializer_class.__name__}.{field.field_name} needs the model instance")
+            path = '__'.join(field.source_attrs)
+            if path not in self.paths:
+                self.paths.append(path)
+            column = _column(serializer_class.Meta.model, field.source_attrs)
+            value = _expression(field, column, f'row[{self.paths.index(path)}]', namespace)
+            items.append(f'{field.field_name!r}: {value}')
+        # Bound to the time zone per call, since the current one can change between requests
+        self.compiled = eval(f"lambda tz: lambda row: {{{', '.join(items)}}}", namespace)
+
+    def serialize(self, rows):
+        to_representation = self.compiled(timezone.get_current_timezone())
+        return [to_representation(row) for row in rows]
+
+
+@functools.cache
+def row_serializer(serializer_class):
+    return RowSerializer(serializer_class)
+
+
+class ValuesListMixin:
+    """
+    list() for list views whose serializer_class only reads plain columns:
+    rows come from values_list() and go through row_serializer() rather
+    than the serializer. The keyset paginator gets named rows, so it reads
+    the cursor fields as it would from instances.
+    """
+
+    def list(self, request, *args, **kwargs):
+        rows = row_serializer(self.get_serializer_class())
+        ordering = [field.lstrip('-') for field in getattr(self, 'cursor_ordering', KeysetPagination.ordering)]
+        paths = rows.paths + [field for field in ordering if field not in rows.paths]
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*paths, named=True)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(rows.serialize(page))
+        return Response(rows.serialize(queryset))
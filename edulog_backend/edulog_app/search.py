@@ -0,0 +1,148 @@
+"""
+Indexed student search.
+
+Each student's name and student_id are normalized (lowercased, with
+whitespace collapsed) into StudentSearchTerm rows:
+
+* 'id' and 'name' terms: the student id, the full name and each word of
+  it. Prefix matches are index range scans over these.
+* 'gram' terms: every trigram of the name and the id. Substring matches
+  join the posting list of the query's rarest trigram to the users and
+  check the real columns in the same query, stopping at the limit.
+
+A query that is a student id, as stored, is one lookup on the unique
+student_id index and returns that student alone. Other results are
+ranked prefix matches (an id matching in any case first), then substring
+matches, and capped at MAX_RESULTS. Queries shorter than three characters
+have no trigrams and only get prefix matches. Writes go through
+index_students(), called from the user save signal and by bulk paths.
+"""
+from django.db.models import Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import CustomUser, StudentSearchTerm
+
+MAX_RESULTS = 10
+# Posting-list rows counted per probed trigram
+CANDIDATE_PAGE = 1000
+# Students of a longer posting list checked for a substring
+MAX_CANDIDATES = 20000
+# Trigrams whose posting lists are sized to pick the rarest one
+MAX_PROBED_GRAMS = 3
+PREFIX_END = '\U0010ffff'
+
+
+def normalize(value):
+    return ' '.join((value or '').lower().split())
+
+
+def trigrams(value):
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def student_terms(username, student_id):
+    """The (kind, term) pairs that index one student."""
+    name = normalize(username)[:150]
+    sid = normalize(student_id)[:150]
+    terms = set()
+    if sid:
+        terms.add(('id', sid))
+    if name:
+        terms.add(('name', name))
+        terms.update(('name', word) for word in name.split())
+    for text in (name, sid):
+        terms.update(('gram', gram) for gram in trigrams(text))
+    return terms
+
+
+def index_students(users, batch_size=2000, new=False):
+    """
+    Replace the search terms of `users`; only students are indexed. Pass
+    new=True for users created since, which have no terms to delete yet.
+    """
+    users = list(users)
+    if not new:
+        StudentSearchTerm.objects.filter(user_id__in=[user.pk for user in users]).delete()
+    StudentSearchTerm.objects.bulk_create([
+        StudentSearchTerm(user_id=user.pk, kind=kind, term=term)
+        for user in users if user.role == 'student'
+        for kind, term in student_terms(user.username, user.student_id)
+    ], batch_size=batch_size)
+
+
+def _prefix_matches(q, limit):
+    user_ids = []
+    for kind in ('id', 'name'):
+        # One ordered range scan per kind; a student can match several words
+        matches = StudentSearchTerm.objects.filter(
+            kind=kind, term__gte=q, term__lt=q + PREFIX_END,
+        ).order_by('term', 'user_id').values_list('user_id', flat=True)[:limit * 3]
+        user_ids.extend(matches)
+    return user_ids
+
+
+def _substring_matches(q, limit, exclude):
+    """Up to `limit` {id, username, student_id} rows containing `q`, not in `exclude`."""
+    grams = sorted(trigrams(q))
+    step = max(1, len(grams) // MAX_PROBED_GRAMS)
+    probes = grams[::step][:MAX_PROBED_GRAMS]
+    # Posting-list sizes, counted only up to one page each
+    sizes = {
+        gram: StudentSearchTerm.objects.filter(kind='gram', term=gram)[:CANDIDATE_PAGE].count()
+        for gram in probes
+    }
+    rarest = min(probes, key=lambda gram: sizes[gram])
+    if not sizes[rarest]:
+        return []
+
+    postings = {'search_terms__kind': 'gram', 'search_terms__term': rarest}
+    if sizes[rarest] == CANDIDATE_PAGE:
+        # A long list: bound the scan to its first MAX_CANDIDATES students,
+        # in a subquery rather than a round trip of its own
+        bound = StudentSearchTerm.objects.filter(kind='gram', term=rarest).order_by('user_id').values('user_id')
+        postings['search_terms__user_id__lte'] = Coalesce(
+            Subquery(bound[MAX_CANDIDATES - 1:MAX_CANDIDATES]), Value(2 ** 63 - 1),
+        )
+    # One filter() call, so every condition applies to the same posting row;
+    # walked in posting-list order, which needs no sort
+    return list(
+        CustomUser.objects.filter(**postings)
+        .filter(Q(username__icontains=q) | Q(student_id__icontains=q))
+        .exclude(id__in=exclude)
+        .order_by('search_terms__user_id')
+        .values('id', 'username', 'student_id')[:limit]
+    )
+
+
+def search_students(query, limit=MAX_RESULTS):
+    """Up to `limit` students as {id, username, student_id} dicts, best match first."""
+    q = normalize(query)
+    if not q:
+        return list(CustomUser.objects.filter(role='student').order_by('id').values('id', 'username', 'student_id')[:limit])
+
+    exact = list(
+        CustomUser.objects.filter(student_id=query.strip(), role='student').values('id', 'username', 'student_id')[:1]
+    )
+    if exact:
+        return exact
+
+    ranked = []
+    seen = set()
+
+    def add(user_ids):
+        for user_id in user_ids:
+            if user_id not in seen and len(ranked) < limit:
+                seen.add(user_id)
+                ranked.append(user_id)
+
+    # An id term equal to the query sorts first in its range
+    add(_prefix_matches(q, limit))
+    rows = {}
+    if len(ranked) < limit and len(q) >= 3:
+        for row in _substring_matches(q, limit - len(ranked), seen):
+            rows[row['id']] = row
+            add([row['id']])
+    missing = [user_id for user_id in ranked if user_id not in rows]
+    if missing:
+        rows.update((row['id'], row) for row in CustomUser.objects.filter(id__in=missing).values('id', 'username', 'student_id'))
+    return [rows[user_id] for user_id in ranked if user_id in rows]
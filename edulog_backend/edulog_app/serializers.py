@@ -6,6 +6,7 @@ class AttendanceLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = AttendanceLog
         fields = ["id", "user", "timestamp", "action"]
+        read_only_fields = ["timestamp"]
 
 class CustomUserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -94,3 +95,21 @@ class SchoolEventSerializer(serializers.ModelSerializer):
         model = SchoolEvent
         fields = ['id', 'title', 'description', 'date', 'location', 'created_at']
         read_only_fields = ['created_at', 'id']
+
+class ClockEventSerializer(serializers.Serializer):
+    student_id = serializers.CharField(max_length=20)
+    action = serializers.ChoiceField(choices=['clock_in', 'clock_out'])
+    timestamp = serializers.DateTimeField(required=False)
+
+class ClockEventBatchSerializer(serializers.Serializer):
+    events = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=5000)
+
+class RosterRowSerializer(serializers.Serializer):
+    """One line of a roster CSV (see edulog_app.roster)."""
+    email = serializers.EmailField(max_length=254)
+    username = serializers.CharField(max_length=50)
+    student_id = serializers.CharField(max_length=20, required=False)
+    department = serializers.CharField(max_length=50, required=False)
+    # Left out, a new user is a student and an existing one keeps their role
+    role = serializers.ChoiceField(choices=CustomUser.ROLE_CHOICES, required=False)
+    password = serializers.CharField(required=False, write_only=True)
@@ -0,0 +1,101 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Attendance, CustomUser, Department, SchoolEvent, Student
+from . import rollups, search
+from .authentication import user_cache
+from .response_cache import bump_versions
+
+
+SEARCH_FIELDS = {'username', 'student_id', 'role'}
+
+
+def _previous_state(instance):
+    if instance._state.adding:
+        return None
+    if getattr(instance, '_loaded_state', None) is None:
+        # Saved without being fully loaded first (e.g. constructed with a pk)
+        loaded = type(instance)._base_manager.filter(pk=instance.pk).first()
+        instance._loaded_state = loaded.rollup_state() if loaded else None
+    return instance._loaded_state
+
+
+@receiver(pre_save, sender=Attendance)
+@receiver(pre_save, sender=CustomUser)
+def remember_previous_state(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._previous_state = _previous_state(instance)
+
+
+@receiver(post_save, sender=Attendance)
+def attendance_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = instance.__dict__.pop('_previous_state', None)
+    # A deferred field is not written by the save, so the row keeps its state
+    current = instance.rollup_state() or previous
+    departments = None
+    if Attendance.user.is_cached(instance):
+        departments = {instance.user_id: instance.user.department_id}
+    rollups.apply_attendance_changes([(previous, current)], departments)
+    instance._loaded_state = current
+
+
+# Applied before the DELETE runs: a queryset delete removes every row
+# before any post_delete fires, so a rollup row rebuilt from raw counts in
+# post_delete would already reflect the deletions still to be applied.
+@receiver(pre_delete, sender=Attendance)
+def attendance_deleting(sender, instance, origin=None, **kwargs):
+    previous = getattr(instance, '_loaded_state', None) or instance.rollup_state()
+    # The counter and monthly rows are cascade-deleted along with their user
+    rollups.apply_attendance_changes([(previous, None)], update_counters=not _deleting_user(origin), written=False)
+
+
+@receiver(post_delete, sender=Attendance)
+def attendance_deleted(sender, instance, origin=None, **kwargs):
+    if not _deleting_user(origin):
+        rollups.refresh_monthly_latest([getattr(instance, '_loaded_state', None) or instance.rollup_state()])
+
+
+def _deleting_user(origin):
+    return isinstance(origin, CustomUser) or getattr(origin, 'model', None) is CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    user_cache.invalidate(instance.pk)
+    if raw:
+        return
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        search.index_students([instance])
+    previous = instance.__dict__.pop('_previous_state', None)
+    # A deferred role or department is not written by the save, so the row keeps its state
+    current = instance.rollup_state() or previous
+    rollups.apply_student_changes([(previous, current)])
+    if previous is not None and previous[1] != current[1]:
+        rollups.move_student_attendance({instance.pk: (previous[1], current[1])})
+    instance._loaded_state = current
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+    previous = getattr(instance, '_loaded_state', None) or instance.rollup_state()
+    rollups.apply_student_changes([(previous, None)])
+
+
+CACHE_DOMAINS = {
+    Attendance: 'attendance',
+    CustomUser: 'students',
+    Department: 'departments',
+    Student: 'departments',
+    SchoolEvent: 'events',
+}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_cached_responses(sender, raw=False, **kwargs):
+    domain = CACHE_DOMAINS.get(sender)
+    if domain and not raw:
+        bump_versions(domain)
@@ -0,0 +1,305 @@
+"""
+Read-only analytics snapshot shared by every worker on a host.
+
+build_snapshot() writes the per-student attendance counters and the
+student and department lookup tables into one file: a versioned header,
+fixed-width record arrays and a UTF-8 string blob. Workers mmap the file
+read-only and view the arrays in place with numpy.frombuffer, so the data
+is held once in the page cache however many gunicorn workers (the
+Procfile's uvicorn workers) read it, and a newly started worker has it
+without querying the database.
+
+build_snapshot() writes the new file next to the old one and
+os.replace()s it into place, which is atomic. Each worker notices the new
+file on its next read (one stat() call) and maps it. Readers still holding
+the old mapping keep a consistent view of the old version.
+
+The header records when the snapshot was built and the response-cache
+versions (edulog_app.response_cache) of the domains it was built from.
+Views read from it while those versions are current, and after a write
+for up to ANALYTICS_SNAPSHOT_MAX_AGE seconds more. A read that finds it
+stale and at least half that old rebuilds it in a background thread, one
+process per host at a time, so writes reach it without anything
+scheduled. Responses built from it are cached like any other, so they
+can lag writes by ANALYTICS_SNAPSHOT_MAX_AGE + RESPONSE_CACHE_SECONDS. A
+max age of 0 only reads a current snapshot and leaves rebuilding it to
+`manage.py refresh_snapshot`.
+
+gunicorn.conf.py calls warm_snapshot() in each worker after it has
+forked, which maps the snapshot and builds a missing or stale one the
+same way. Under other servers the first read maps it, and a missing one
+waits for `manage.py refresh_snapshot`.
+"""
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count
+
+from .models import CustomUser, Department
+from .response_cache import get_versions
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'EDULOGSS'
+FORMAT_VERSION = 1
+SNAPSHOT_DOMAINS = ('attendance', 'students', 'departments')
+# magic, format, built_at (ns, also the snapshot version), domain versions,
+# student count, department count, string blob size
+HEADER = struct.Struct('<8sIxxxxq3qQQQ')
+# Strings are (offset into the blob, length); a length of -1 is None
+STUDENT_DTYPE = np.dtype([
+    ('id', '<i8'), ('department_id', '<i8'),
+    ('total', '<i4'), ('present', '<i4'), ('absent', '<i4'), ('late', '<i4'),
+    ('username_offset', '<i8'), ('username_length', '<i4'),
+    ('student_id_offset', '<i8'), ('student_id_length', '<i4'),
+])
+DEPARTMENT_DTYPE = np.dtype([
+    ('id', '<i8'), ('student_count', '<i4'),
+    ('name_offset', '<i8'), ('name_length', '<i4'),
+])
+NO_DEPARTMENT = -1
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _aligned(offset):
+    return (offset + 7) // 8 * 8
+
+
+def _layout(student_count, department_count):
+    """Byte offsets of the student array, department array and string blob."""
+    students = _aligned(HEADER.size)
+    departments = _aligned(students + student_count * STUDENT_DTYPE.itemsize)
+    strings = _aligned(departments + department_count * DEPARTMENT_DTYPE.itemsize)
+    return students, departments, strings
+
+
+class _Strings:
+    def __init__(self):
+        self.blob = bytearray()
+
+    def add(self, value):
+        if value is None:
+            return 0, -1
+        encoded = value.encode()
+        offset = len(self.blob)
+        self.blob += encoded
+        return offset, len(encoded)
+
+
+def build_snapshot(path=None):
+    """Write a new snapshot to `path` (default ANALYTICS_SNAPSHOT_PATH) and atomically swap it in."""
+    path = path or settings.ANALYTICS_SNAPSHOT_PATH
+    # Time and versions first: a write after this point makes the snapshot
+    # stale, never wrongly current, and its age counts from before the reads
+    built_at = time.time_ns()
+    versions = [int(version) for version in get_versions(SNAPSHOT_DOMAINS)]
+    students = CustomUser.objects.filter(role='student').order_by('id').values_list(
+        'id', 'department_id', 'attendance_counter__total', 'attendance_counter__present',
+        'attendance_counter__absent', 'attendance_counter__late', 'username', 'student_id',
+    )
+    departments = Department.objects.annotate(student_count=Count('students')).order_by('id').values_list(
+        'id', 'student_count', 'name',
+    )
+
+    strings = _Strings()
+    student_rows = np.array([
+        (user_id, NO_DEPARTMENT if department_id is None else department_id,
+         total or 0, present or 0, absent or 0, late or 0, *strings.add(username), *strings.add(student_id))
+        for user_id, department_id, total, present, absent, late, username, student_id in students.iterator()
+    ], dtype=STUDENT_DTYPE)
+    department_rows = np.array([
+        (department_id, student_count, *strings.add(name)) for department_id, student_count, name in departments
+    ], dtype=DEPARTMENT_DTYPE)
+
+    offsets = _layout(len(student_rows), len(department_rows))
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.snapshot-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, built_at, *versions,
+                                len(student_rows), len(department_rows), len(strings.blob)))
+            for offset, data in zip(offsets, (student_rows.tobytes(), department_rows.tobytes(), strings.blob)):
+                f.write(b'\0' * (offset - f.tell()))
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return built_at
+
+
+class Snapshot:
+    """One mapped snapshot file; the arrays are read-only views of the mapping."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.key = (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+            if stat.st_size < HEADER.size:
+                raise SnapshotError(f"{path} is too short to be a snapshot")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, format_version, self.version, *versions,
+         student_count, department_count, strings_size) = HEADER.unpack_from(self._map)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise SnapshotError(f"{path} is not a format {FORMAT_VERSION} snapshot")
+        self.domain_versions = tuple(versions)
+        students, departments, self._strings = _layout(student_count, department_count)
+        if len(self._map) < self._strings + strings_size:
+            raise SnapshotError(f"{path} is truncated")
+        self.students = np.frombuffer(self._map, STUDENT_DTYPE, student_count, students)
+        self.departments = np.frombuffer(self._map, DEPARTMENT_DTYPE, department_count, departments)
+
+    def is_current(self):
+        """Whether no write has touched the snapshot's domains since it was built."""
+        return self.domain_versions == tuple(int(version) for version in get_versions(SNAPSHOT_DOMAINS))
+
+    def age(self):
+        """Seconds since the data was read from the database."""
+        return (time.time_ns() - self.version) / 1e9
+
+    def text(self, offset, length):
+        if length < 0:
+            return None
+        start = self._strings + int(offset)
+        return self._map[start:start + int(length)].decode()
+
+    def attendance_percentages(self):
+        """[{id, username, attendance_percentage}] for every student, by id."""
+        total = self.students['total']
+        percentages = np.divide(self.students['present'] * 100.0, total, out=np.zeros(len(total)), where=total > 0)
+        return [
+            {'id': int(user_id), 'username': self.text(offset, length), 'attendance_percentage': float(percentage)}
+            for user_id, offset, length, percentage in zip(
+                self.students['id'], self.students['username_offset'], self.students['username_length'], percentages,
+            )
+        ]
+
+    def department_stats(self):
+        """[{name, student_count}] for every department, by id."""
+        return [
+            {'name': self.text(row['name_offset'], row['name_length']), 'student_count': int(row['student_count'])}
+            for row in self.departments
+        ]
+
+
+_lock = threading.Lock()
+_snapshot = None
+_unusable = None  # (dev, inode, mtime) of a file that failed to map
+
+
+def get_snapshot():
+    """
+    This process's mapping of the snapshot file, remapped when a refresh
+    has replaced the file. None when there is no usable snapshot.
+    """
+    global _snapshot, _unusable
+    path = settings.ANALYTICS_SNAPSHOT_PATH
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.key == key:
+        return snapshot
+    if key == _unusable:
+        return None
+    with _lock:
+        if _snapshot is None or _snapshot.key != key:
+            try:
+                _snapshot = Snapshot(path)
+            except (OSError, ValueError, SnapshotError):
+                logger.exception("Could not map analytics snapshot %s", path)
+                _snapshot, _unusable = None, key
+        return _snapshot
+
+
+def refresh(path=None):
+    """
+    Rebuild the snapshot at `path` (default ANALYTICS_SNAPSHOT_PATH) unless
+    it is current or another process is rebuilding it. Returns the new
+    version, or None if nothing was written.
+    """
+    path = path or settings.ANALYTICS_SNAPSHOT_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + '.lock', 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        try:
+            if Snapshot(path).is_current():
+                return None
+        except (OSError, ValueError, SnapshotError):
+            pass  # Missing or unreadable: rebuild it
+        return build_snapshot(path)
+
+
+_refresher = None
+
+
+def _refresh_in_background():
+    global _refresher
+    with _lock:
+        if _refresher is not None and _refresher.is_alive():
+            return
+        _refresher = threading.Thread(target=_background_refresh, name='snapshot-refresh', daemon=True)
+        _refresher.start()
+
+
+def _background_refresh():
+    try:
+        refresh()
+    except Exception:
+        logger.exception("Could not refresh analytics snapshot")
+    finally:
+        # The thread's own connections would otherwise stay open
+        connections.close_all()
+
+
+def current_snapshot():
+    """
+    get_snapshot() while its data is current or less than
+    ANALYTICS_SNAPSHOT_MAX_AGE seconds old, else None. Starts a background
+    refresh when it is stale and at least half that age.
+    """
+    snapshot = get_snapshot()
+    if snapshot is None or snapshot.is_current():
+        return snapshot
+    max_age = settings.ANALYTICS_SNAPSHOT_MAX_AGE
+    age = snapshot.age()
+    if max_age and age >= max_age / 2:
+        _refresh_in_background()
+    return snapshot if age < max_age else None
+
+
+def warm_snapshot():
+    """
+    Map the snapshot in a newly started worker, building it in the
+    background if it is missing or stale. Call it after the server has
+    forked, never at import time.
+    """
+    if not settings.ANALYTICS_SNAPSHOT_PATH:
+        return
+    snapshot = get_snapshot()
+    if settings.ANALYTICS_SNAPSHOT_MAX_AGE and (snapshot is None or not snapshot.is_current()):
+        _refresh_in_background()
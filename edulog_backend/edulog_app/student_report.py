@@ -0,0 +1,123 @@
+"""
+Per-student attendance totals for StudentReportView.
+
+Whole calendar months inside the requested range are read from
+StudentMonthlyAttendance, one row per student per month. Only the partial
+months at either edge of the range are aggregated from raw Attendance, so
+a year-long report reads about 12 summary rows per student instead of
+every school day. Without a date range, every month is whole.
+"""
+from collections import Counter
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db.models import BooleanField, Count, ExpressionWrapper, Max, Q, Sum, Value
+
+from .models import Attendance, CustomUser, StudentMonthlyAttendance
+from .rollups import ROLLUP_STATUSES, next_month
+
+REPORT_CHUNK_SIZE = 2000
+
+SUMMARY_FIELDS = {status: Sum(status) for status in ROLLUP_STATUSES}
+SUMMARY_FIELDS.update({f'last_{status}': Max(f'last_{status}') for status in ROLLUP_STATUSES})
+RAW_FIELDS = {status: Count('id', filter=Q(status=status)) for status in ROLLUP_STATUSES}
+RAW_FIELDS.update({f'last_{status}': Max('date', filter=Q(status=status)) for status in ROLLUP_STATUSES})
+
+
+def split_range(start_date, end_date):
+    """
+    Split [start_date, end_date] into whole months and leftover days.
+    Returns (first_month, stop_month, edges): summary rows with
+    first_month <= month < stop_month cover the whole months (both are None
+    when none fit), and edges lists the (first, last) day ranges around them.
+    """
+    first_month = start_date if start_date.day == 1 else next_month(start_date)
+    after_end = end_date + timedelta(days=1)
+    stop_month = after_end if after_end.day == 1 else end_date.replace(day=1)
+    if first_month >= stop_month:
+        return None, None, [(start_date, end_date)]
+    edges = []
+    if start_date < first_month:
+        edges.append((start_date, first_month - timedelta(days=1)))
+    if stop_month <= end_date:
+        edges.append((stop_month, end_date))
+    return first_month, stop_month, edges
+
+
+def _add_totals(totals, rows):
+    for row in rows:
+        counts, latest = totals.setdefault(row['user_id'], (Counter(), {}))
+        for status in ROLLUP_STATUSES:
+            counts[status] += row[status] or 0
+            day = row[f'last_{status}']
+            if day is not None and (status not in latest or day > latest[status]):
+                latest[status] = day
+
+
+def _report_row(student, totals, status_filter):
+    counts, latest = totals.get(student['id'], (Counter(), {}))
+    statuses = [status_filter] if status_filter else ROLLUP_STATUSES
+    total = sum(counts[status] for status in statuses)
+    present = counts['present'] if 'present' in statuses else 0
+    absent = counts['absent'] if 'absent' in statuses else 0
+    return {
+        **student,
+        'total_attendance': total,
+        'present_attendance': present,
+        'absent_attendance': absent,
+        'attendance_percentage': present * 100.0 / total if total else 0.0,
+        'latest_attendance_date': max((latest[status] for status in statuses if status in latest), default=None),
+    }
+
+
+def student_report(start_date=None, end_date=None, status_filter=None, department_filter=None,
+                   student_name_filter=None, chunk_size=REPORT_CHUNK_SIZE):
+    """
+    Yield one dict per student, ordered by id: id, username, student_id,
+    department__name, total/present/absent_attendance,
+    attendance_percentage and latest_attendance_date. Students are read in
+    chunks of `chunk_size`, with at most three queries per chunk. As
+    before, the date range applies only when both ends are given. Students
+    outside student_name_filter are still listed, with zero counts.
+    """
+    students = CustomUser.objects.filter(role='student')
+    if department_filter:
+        students = students.filter(department__name=department_filter)
+    students = students.annotate(
+        counted=ExpressionWrapper(Q(username__icontains=student_name_filter) if student_name_filter else Value(True),
+                                  output_field=BooleanField()),
+    ).order_by('id').values('id', 'username', 'student_id', 'department__name', 'counted')
+
+    first_month = stop_month = None
+    edges = []
+    if start_date and end_date:
+        first_month, stop_month, edges = split_range(start_date, end_date)
+    whole_months = not (start_date and end_date) or first_month is not None
+
+    last_id = None
+    while True:
+        page = students if last_id is None else students.filter(id__gt=last_id)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        user_ids = [student['id'] for student in chunk if student.pop('counted')]
+        totals = {}
+        if user_ids and whole_months:
+            summary = StudentMonthlyAttendance.objects.filter(user_id__in=user_ids)
+            if first_month is not None:
+                summary = summary.filter(month__gte=first_month, month__lt=stop_month)
+            _add_totals(totals, summary.values('user_id').annotate(**SUMMARY_FIELDS).order_by())
+        if user_ids and edges:
+            records = Attendance.objects.filter(user_id__in=user_ids).filter(
+                reduce(or_, (Q(date__range=edge) for edge in edges))
+            )
+            if status_filter:
+                records = records.filter(status=status_filter)
+            _add_totals(totals, records.values('user_id').annotate(**RAW_FIELDS).order_by())
+
+        for student in chunk:
+            yield _report_row(student, totals, status_filter)
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1]['id']
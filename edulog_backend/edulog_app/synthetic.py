@@ -0,0 +1,107 @@
+"""
+Deterministic synthetic school data for query-plan tests and benchmarks.
+
+Everything is inserted with bulk_create, so the derived tables that the
+save signals normally maintain are rebuilt explicitly at the end.
+"""
+import random
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Attendance, AttendanceLog, CustomUser, DailyAttendanceRollup, Department, SchoolEvent, StudentAttendanceCounter,
+    StudentAttendanceCalendar, StudentMonthlyAttendance,
+)
+from .attendance_calendar import academic_year, build_calendars
+from .response_cache import DOMAINS, bump_versions
+from .rollups import compute_attendance_counters, compute_monthly_attendance
+from .search import index_students
+
+STATUS_WEIGHTS = {'present': 80, 'absent': 10, 'late': 8, 'pending': 2}
+SYNTHETIC_PASSWORD = 'synthetic-pass'
+
+
+@transaction.atomic
+def generate_school(departments=5, students=500, days=30, events=20, end_date=None, seed=0, batch_size=2000):
+    """
+    Create `departments` departments, `students` students spread across
+    them, one Attendance row per student per weekday for the `days` days
+    ending at `end_date` (default today), a login/logout AttendanceLog pair
+    per attendance, and `events` SchoolEvents around the range. All students
+    share the password SYNTHETIC_PASSWORD. Returns the created students.
+    """
+    rng = random.Random(seed)
+    end_date = end_date or timezone.now().date()
+    statuses, weights = zip(*STATUS_WEIGHTS.items())
+
+    department_rows = Department.objects.bulk_create(
+        [Department(name=f"Department {i + 1}") for i in range(departments)]
+    )
+    password = make_password(SYNTHETIC_PASSWORD)
+    offset = CustomUser.objects.count()
+    student_rows = CustomUser.objects.bulk_create([
+        CustomUser(
+            email=f"student{offset + i}@example.com",
+            username=f"Student {offset + i}",
+            student_id=f"S{offset + i:06d}",
+            role='student',
+            department=department_rows[i % departments] if departments else None,
+            password=password,
+        )
+        for i in range(students)
+    ], batch_size=batch_size)
+    index_students(student_rows, batch_size=batch_size)
+
+    school_days = [end_date - timedelta(days=n) for n in range(days)]
+    school_days = [day for day in reversed(school_days) if day.weekday() < 5]
+    for day in school_days:
+        records, logs = [], []
+        moment = timezone.make_aware(datetime.combine(day, time(8)))
+        for student in student_rows:
+            status = rng.choices(statuses, weights)[0]
+            clock_in = clock_out = None
+            if status != 'absent':
+                clock_in = time(7 + (status == 'late'), rng.randrange(60))
+                clock_out = time(16, rng.randrange(60)) if status != 'pending' else None
+                logs.append(AttendanceLog(user=student, action='login', timestamp=moment))
+                logs.append(AttendanceLog(user=student, action='logout', timestamp=moment))
+            records.append(Attendance(
+                user=student, date=day, status=status,
+                clock_in_time=clock_in, clock_out_time=clock_out,
+            ))
+        Attendance.objects.bulk_create(records, batch_size=batch_size)
+        AttendanceLog.objects.bulk_create(logs, batch_size=batch_size)
+
+    SchoolEvent.objects.bulk_create([
+        SchoolEvent(
+            title=f"Event {i + 1}",
+            description="Synthetic event",
+            date=end_date + timedelta(days=rng.randint(-days, days)),
+            location=f"Hall {rng.randint(1, 5)}",
+        )
+        for i in range(events)
+    ])
+
+    # Daily rollups rebuild lazily from the raw rows on next access
+    DailyAttendanceRollup.objects.filter(date__in=school_days).delete()
+    counters = compute_attendance_counters([student.pk for student in student_rows])
+    StudentAttendanceCounter.objects.bulk_create(
+        [StudentAttendanceCounter(user_id=user_id, **fields) for user_id, fields in counters.items()],
+        batch_size=batch_size,
+    )
+    monthly = compute_monthly_attendance([student.pk for student in student_rows])
+    StudentMonthlyAttendance.objects.bulk_create(
+        [StudentMonthlyAttendance(user_id=user_id, month=month, **fields) for (user_id, month), fields in monthly.items()],
+        batch_size=batch_size,
+    )
+    years = {academic_year(day) for day in school_days}
+    calendars = build_calendars([(student.pk, year) for student in student_rows for year in years])
+    StudentAttendanceCalendar.objects.bulk_create(
+        [StudentAttendanceCalendar(user_id=user_id, year=year, bits=bits) for (user_id, year), bits in calendars.items()],
+        batch_size=batch_size,
+    )
+    bump_versions(*DOMAINS)
+    return student_rows
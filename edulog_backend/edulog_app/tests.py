@@ -1,3 +1,1374 @@
-from django.test import TestCase
+# Run from edulog_backend/ with: python manage.py test -t . edulog_app
+# (-t keeps the repo-level __init__.py from renaming the package)
+import base64
+import fcntl
+import json
+import os
+import re
+import socket
+import tempfile
+import unittest
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, get_hasher
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count, F, Max, Q
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework import mixins
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import clock_events, snapshot
+from .analytics import cohort_metrics, rolling_rate
+from .attendance_calendar import (
+    ABSENT, CODE_NAMES, LATE, NONE, PRESENT, current_streak, day_codes, day_index, longest_absence, longest_streak,
+    set_days,
+)
+from .authentication import user_cache
+from .dashboard import department_stats
+from .endpoint_benchmark import ENDPOINTS, routes, run, uncovered_routes
+from .live_feed import UnixSocketBroker, get_broker, publish_counters, reset_broker, stream
+from .log_archive import retention_cutoff
+from .management.commands.benchmark_logins import count_hashes
+from .management.commands.mark_absences import Command as MarkAbsences
+from .log_buffer import log_buffer
+from .middleware import instrument
+from .models import (
+    Attendance, AttendanceLog, AttendanceLogArchive, CustomUser, DailyAttendanceRollup, Department, SchoolEvent,
+    StudentAttendanceCalendar, StudentAttendanceCounter, StudentMonthlyAttendance, StudentSearchTerm,
+)
+from .rollups import get_attendance_counter, get_daily_rollup
+from .response_cache import DOMAINS, bump_versions, get_versions
+from .roster import import_roster
+from .search import search_students
+from .snapshot import Snapshot, current_snapshot, get_snapshot
+from .student_report import split_range, student_report
+from .synthetic import generate_school
+from .views import AttendanceLogViewSet, AttendanceRecordListCreateView, AttendanceViewSet
+
+ATTENDANCE = Attendance._meta.db_table
+USER = CustomUser._meta.db_table
+EVENT = SchoolEvent._meta.db_table
+SEARCH = StudentSearchTerm._meta.db_table
+MONTHLY = StudentMonthlyAttendance._meta.db_table
+TRANSACTION_CONTROL = re.compile(r'\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE SAVEPOINT)\b', re.I)
+
+# Keep a snapshot left on this host out of the tests, and its background
+# rebuilds off the test database; AnalyticsSnapshotTestCase maps its own
+without_host_snapshot = override_settings(ANALYTICS_SNAPSHOT_PATH='')
+
+
+def setUpModule():
+    without_host_snapshot.enable()
+
+
+def tearDownModule():
+    without_host_snapshot.disable()
+
+
+def explain(sql):
+    """
+    Return the query plan for `sql` as one string per plan line; skips the
+    test on databases with no parser for their plans here (MySQL).
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Tiny test tables are cheaper to scan; ask whether an index *could* be used
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + sql)
+            return [row[0] for row in cursor.fetchall()]
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+    raise unittest.SkipTest(f"No plan parser for {connection.vendor}")
+
+
+def sequential_scans(plan):
+    """Names of the tables the plan reads in full without an index."""
+    tables = set()
+    for line in plan:
+        if connection.vendor == 'postgresql':
+            match = re.search(r'Seq Scan on (\w+)', line)
+        else:
+            match = re.match(r'SCAN (\w+)$', line.strip())
+        if match:
+            tables.add(match.group(1))
+    return tables
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    Drives the attendance endpoints against a seeded school and checks each
+    hot query's plan and the number of queries the request issues.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.students = generate_school(departments=5, students=300, days=40, events=50)
+        cls.admin = CustomUser.objects.create_user('admin@example.com', 'admin-pass', role='admin', username='Admin')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        # Cached responses would outlive each test's rollback
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def warm_rollups(self):
+        get_daily_rollup()
+        for department_id in Department.objects.values_list('id', flat=True):
+            get_daily_rollup(department_id=department_id)
+
+    def assertIndexedRequest(self, method, url, max_queries, indexed_tables=(), user=None, **kwargs):
+        """
+        Run the request and fail if it issues more than `max_queries` queries
+        or any SELECT reads one of `indexed_tables` with a sequential scan.
+        """
+        if user is not None:
+            self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, **kwargs)
+            if response.streaming:
+                response.content_bytes = b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, getattr(response, 'content_bytes', None) or response.content)
+
+        queries = [
+            query['sql'] for query in context.captured_queries
+            if not TRANSACTION_CONTROL.match(query['sql'])
+        ]
+        self.assertLessEqual(
+            len(queries), max_queries,
+            f"{url} issued {len(queries)} queries (budget {max_queries}):\n" + '\n'.join(queries)
+        )
+        for sql in queries:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            plan = explain(sql)
+            scanned = sequential_scans(plan) & set(indexed_tables)
+            self.assertFalse(scanned, f"{url} scans {scanned}:\n{sql}\n" + '\n'.join(plan))
+        return response
+
+    def test_attendance_today(self):
+        # The first read of a day builds the rollup row; counting every
+        # student once per day is a full pass over the student set by design
+        self.assertIndexedRequest('get', reverse('attendance-today'), 4, [ATTENDANCE])
+        self.assertIndexedRequest('get', reverse('attendance-today'), 1, [ATTENDANCE, USER])
+        self.assertIndexedRequest('get', reverse('absent-students'), 1, [ATTENDANCE, USER])
+
+    def test_total_students(self):
+        self.warm_rollups()
+        self.assertIndexedRequest('get', reverse('total-students'), 1, [USER])
+
+    def test_department_rollup_build(self):
+        department = Department.objects.first()
+        with CaptureQueriesContext(connection) as context:
+            get_daily_rollup(department_id=department.pk)
+        for query in context.captured_queries:
+            if query['sql'].startswith('SELECT'):
+                self.assertFalse(sequential_scans(explain(query['sql'])) & {ATTENDANCE, USER}, query['sql'])
+
+    def test_attendance_stats(self):
+        student = self.students[0]
+        self.assertIndexedRequest('get', reverse('attendance-stats', args=[student.pk]), 2, [ATTENDANCE, USER])
+
+    def test_attendance_status(self):
+        student = self.students[0]
+        self.assertIndexedRequest('get', reverse('attendance-status', args=[student.pk]), 2, [ATTENDANCE, USER])
+
+    def test_clock_in_and_out(self):
+        # First clock-in of the day also builds today's rollup and monthly rows
+        self.assertIndexedRequest('post', reverse('clock-in'), 15, [ATTENDANCE], user=self.students[0])
+        self.warm_rollups()
+        student = self.students[1]
+        self.assertIndexedRequest('post', reverse('clock-in'), 9, [ATTENDANCE, USER], user=student)
+        self.assertIndexedRequest('post', reverse('clock-in'), 3, [ATTENDANCE, USER], user=student)
+        self.assertIndexedRequest('post', reverse('clock-out'), 2, [ATTENDANCE, USER], user=student)
+
+    def test_clock_batch(self):
+        self.warm_rollups()
+        # A small slice of the school, so resolving ids by index beats a table scan
+        students = self.students[:20]
+        events = [{'student_id': student.student_id, 'action': 'clock_in'} for student in students]
+        response = self.assertIndexedRequest(
+            'post', reverse('clock-batch'), 13, [ATTENDANCE, USER], data={'events': events}, format='json'
+        )
+        self.assertEqual(response.data['processed'], len(students))
+        self.assertEqual(get_daily_rollup().present, len(students))
+
+    def test_attendance_update(self):
+        record = Attendance.objects.filter(user=self.students[2], status='present').first()
+        get_daily_rollup(record.date)
+        get_daily_rollup(record.date, self.students[2].department_id)
+        # Moving a status off its month's latest date re-reads that date
+        self.assertIndexedRequest(
+            'put', reverse('attendance-update', args=[record.pk]), 10, [ATTENDANCE, USER],
+            data={'status': 'late'}, format='json',
+        )
+
+    def test_percentage(self):
+        # Lists every student, but must not touch Attendance at all
+        response = self.assertIndexedRequest('get', reverse('percentage'), 1, [ATTENDANCE])
+        self.assertEqual(len(response.data), len(self.students))
+
+    def test_recent_logs(self):
+        self.assertIndexedRequest('get', reverse('recent-logs'), 1, [ATTENDANCE])
+
+    def test_upcoming_events(self):
+        # Conditional-GET validators, then the events themselves
+        self.assertIndexedRequest('get', reverse('upcoming-events'), 2, [EVENT])
+
+    def test_student_detail(self):
+        student = self.students[3]
+        self.assertIndexedRequest('get', reverse('student-detail', args=[student.pk]), 1, [USER])
+
+    def test_exports(self):
+        day = self.students[0].attendance_records.first().date
+        response = self.assertIndexedRequest(
+            'get', f'/api/attendance/reports/export/?startDate={day}&endDate={day}&format=ndjson', 1, [ATTENDANCE]
+        )
+        self.assertEqual(response.content_bytes.count(b'\n'), len(self.students))
+        response = self.assertIndexedRequest('get', '/api/attendance/reports/?format=csv', 2)
+        self.assertEqual(response.content_bytes.count(b'\n'), len(self.students) + 1)
+
+    def test_dashboard(self):
+        self.warm_rollups()
+        response = self.assertIndexedRequest('get', reverse('dashboard'), 4, [ATTENDANCE, USER, EVENT])
+        for url, keys in [
+            (reverse('total-students'), ['total']),
+            (reverse('attendance-today'), ['attendancePercentage']),
+            (reverse('absent-students'), ['absentCount']),
+        ]:
+            self.assertEqual({key: response.data[key] for key in keys}, self.client.get(url).data)
+        self.assertEqual(response.data['departmentStats'], self.client.get(reverse('department-stats')).data)
+        self.assertEqual(response.data['recentLogs'], self.client.get(reverse('recent-logs')).data)
+        self.assertEqual(response.data['upcomingEvents'], self.client.get(reverse('upcoming-events')).data)
+
+        with self.settings(DASHBOARD_CACHE_SECONDS=30):
+            cache.clear()
+            self.assertIndexedRequest('get', reverse('dashboard'), 4)
+            self.assertIndexedRequest('get', reverse('dashboard'), 0)
+
+    def test_conditional_get(self):
+        for url in [reverse('event-list'), reverse('upcoming-events'), '/departments/', reverse('student-reports-filters')]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+            # Only the validator aggregate runs; nothing is fetched or serialized
+            response = self.assertIndexedRequest('get', url, 1, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(self.client.get(url + '?page_size=5', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get('/departments/')['ETag']
+        Department.objects.create(name='Department 6')
+        response = self.client.get('/departments/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = self.client.get(reverse('event-list'))['ETag']
+        SchoolEvent.objects.order_by('id').first().delete()
+        self.assertEqual(self.client.get(reverse('event-list'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_response_cache(self):
+        url = reverse('percentage')
+        first = self.assertIndexedRequest('get', url, 1)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        cached = self.assertIndexedRequest('get', url, 0)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.data, first.data)
+        # Query strings are normalized, so parameter order does not matter
+        self.assertIndexedRequest('get', '/api/attendance/reports/?statusFilter=late&departmentFilter=Department 1', 2)
+        self.assertIndexedRequest('get', '/api/attendance/reports/?departmentFilter=Department 1&statusFilter=late', 0)
+
+        student = self.students[5]
+        record = student.attendance_records.exclude(status='present').first()
+        record.status = 'present'
+        record.save()
+        changed = self.client.get(url)
+        self.assertEqual(changed['X-Cache'], 'MISS')
+        self.assertNotEqual(changed.data, first.data)
+
+        stats = self.client.get(reverse('response-cache-stats')).data['AttendancePercentageView']
+        self.assertGreaterEqual(stats['hits'], 1)
+        self.assertGreaterEqual(stats['misses'], 2)
+
+    def test_student_search(self):
+        url = '/api/attendance/reports/students/?q='
+        student = self.students[12]
+        # A stored student id is one unique-index lookup
+        response = self.assertIndexedRequest('get', url + student.student_id, 1, [USER])
+        self.assertEqual(response.data, [{'id': student.id, 'username': student.username, 'student_id': student.student_id}])
+        # Other students whose id starts with the query
+        response = self.assertIndexedRequest('get', url + student.student_id[:-1], 4, [USER, SEARCH])
+        self.assertEqual(len(response.data), 10)
+        self.assertTrue(all(row['student_id'].startswith(student.student_id[:-1]) for row in response.data))
+        # Too few prefix matches, so substring matching runs too: up to three
+        # posting-list probes and the join of the rarest to the users
+        response = self.assertIndexedRequest('get', url + student.student_id.lower(), 8, [USER, SEARCH])
+        self.assertEqual(response.data[0], {'id': student.id, 'username': student.username, 'student_id': student.student_id})
+
+        response = self.assertIndexedRequest('get', url + 'Student 1', 4, [USER, SEARCH])
+        self.assertEqual(len(response.data), 10)
+        self.assertTrue(all(row['username'].lower().startswith('student 1') for row in response.data))
+
+        # Substring matches come after prefix matches
+        response = self.assertIndexedRequest('get', url + 'tudent 29', 8, [USER, SEARCH])
+        expected = set(CustomUser.objects.filter(role='student', username__icontains='tudent 29').values_list('id', flat=True))
+        self.assertEqual(len(response.data), min(10, len(expected)))
+        self.assertLessEqual({row['id'] for row in response.data}, expected)
+        renamed = self.students[40]
+        renamed.username = 'Zebulon Quartz'
+        renamed.save()
+        response = self.client.get(url + 'quar')
+        self.assertEqual([row['id'] for row in response.data], [renamed.id])
+        self.assertEqual(self.client.get(url + 'tudent ' + renamed.student_id[-3:]).data, [])
+
+    def test_keyset_pages(self):
+        # Deep pages must cost the same single index range scan as the first
+        # (events add one aggregate for their conditional-GET validators)
+        for url, table, budget in [
+            ('/admin/attendance/', ATTENDANCE, 1),
+            (reverse('attendance-records'), ATTENDANCE, 1),
+            ('/attendance/', AttendanceLog._meta.db_table, 1),
+            (reverse('event-list'), EVENT, 2),
+        ]:
+            seen = set()
+            url += '?page_size=40'
+            for _ in range(3):
+                response = self.assertIndexedRequest('get', url, budget, [table])
+                ids = [row['id'] for row in response.data['results']]
+                self.assertFalse(seen & set(ids), url)
+                seen.update(ids)
+                url = response.data['next']
+                if url is None:
+                    break
+            previous = self.assertIndexedRequest('get', response.data['previous'], budget, [table])
+            self.assertEqual(len(previous.data['results']), 40)
+
+    def test_values_list_serialization(self):
+        # The row fast path renders the same bytes, page after page, as the serializer it stands in for
+        for url, view, table in [
+            ('/admin/attendance/', AttendanceViewSet, ATTENDANCE),
+            (reverse('attendance-records'), AttendanceRecordListCreateView, ATTENDANCE),
+            ('/attendance/', AttendanceLogViewSet, AttendanceLog._meta.db_table),
+        ]:
+            url += '?page_size=70'
+            for _ in range(2):
+                fast = self.assertIndexedRequest('get', url, 1, [table])
+                with mock.patch.object(view, 'list', mixins.ListModelMixin.list):
+                    self.assertEqual(self.client.get(url).content, fast.content, url)
+                url = fast.data['next']
+
+    def test_query_budgets(self):
+        # Endpoints that still read whole tables by design are held to a query budget only
+        self.assertIndexedRequest('get', reverse('department-stats'), 1)
+        # 'student-reports' names two routes, so the report view is addressed by path
+        self.assertIndexedRequest('get', '/api/attendance/reports/', 2)
+        self.assertIndexedRequest('get', reverse('student-reports-filters'), 2)
+        self.assertIndexedRequest('get', reverse('attendance-records'), 1)
+        self.assertIndexedRequest('get', reverse('event-list'), 2)
+        self.assertIndexedRequest('get', '/admin/attendance/', 1)
+        self.assertIndexedRequest('get', '/attendance/', 1)
+        self.assertIndexedRequest('get', '/departments/', 2)
+
+
+class AttendanceRollupTestCase(TestCase):
+    """Every Attendance and student write keeps the built rollup rows equal to raw counts."""
+
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        self.students = generate_school(departments=2, students=6, days=10, events=0, end_date=self.today - timedelta(days=1))
+        self.admin = CustomUser.objects.create_user('admin@example.com', 'admin-pass', role='admin', username='Admin')
+        self.client = APIClient()
+        # Built rows take deltas from here on
+        for day in {self.today, *Attendance.objects.values_list('date', flat=True)}:
+            get_daily_rollup(day)
+            for department_id in Department.objects.values_list('id', flat=True):
+                get_daily_rollup(day, department_id)
+        for student in self.students:
+            get_attendance_counter(student.id)
+
+    def assertMatchesRaw(self):
+        out = StringIO()
+        call_command('rebuild_attendance_rollups', verify=True, stdout=out)
+        self.assertIn(f"{DailyAttendanceRollup.objects.count()} rollup row(s) match", out.getvalue())
+        call_command('reconcile_attendance_counters', verify=True, stdout=StringIO())
+        for student in self.students:
+            counter = StudentAttendanceCounter.objects.get(user=student)
+            records = Attendance.objects.filter(user=student)
+            self.assertEqual(
+                (counter.total, counter.present, counter.absent, counter.late),
+                (records.count(), *(records.filter(status=status).count() for status in ('present', 'absent', 'late'))),
+            )
+        today = Attendance.objects.filter(date=self.today)
+        rollup = get_daily_rollup()
+        for status in ('present', 'absent', 'late', 'pending'):
+            self.assertEqual(getattr(rollup, status), today.filter(status=status).count())
+
+    def test_write_paths(self):
+        first, second = self.students[:2]
+        self.client.force_authenticate(first)
+        self.assertEqual(self.client.post(reverse('clock-in')).status_code, 201)
+        self.assertEqual(self.client.post(reverse('clock-out')).status_code, 200)
+        self.client.force_authenticate(second)
+        self.assertEqual(self.client.post(reverse('clock-in')).status_code, 201)
+        self.assertMatchesRaw()
+
+        self.client.force_authenticate(self.admin)
+        record = Attendance.objects.get(user=second, date=self.today)
+        response = self.client.put(reverse('attendance-update', args=[record.pk]), {'status': 'late'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_daily_rollup().late, 1)
+        old = Attendance.objects.filter(user=first).exclude(date=self.today).first()
+        response = self.client.patch(f'/admin/attendance/{old.pk}/', {'status': 'absent'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertMatchesRaw()
+
+        self.assertEqual(self.client.delete(f'/admin/attendance/{record.pk}/').status_code, 204)
+        self.assertEqual(self.client.delete(f'/admin/attendance/{old.pk}/').status_code, 204)
+        self.assertEqual(get_daily_rollup().late, 0)
+        self.assertMatchesRaw()
+
+    def test_department_change(self):
+        student = self.students[0]
+        self.client.force_authenticate(student)
+        self.assertEqual(self.client.post(reverse('clock-in')).status_code, 201)
+        other = Department.objects.exclude(id=student.department_id).first()
+        before = get_daily_rollup(department_id=other.id).present
+
+        student.department = other
+        student.save()
+        self.assertEqual(get_daily_rollup(department_id=other.id).present, before + 1)
+        self.assertEqual(get_daily_rollup(department_id=other.id).student_total, 4)
+        self.assertMatchesRaw()
+
+        student.department = None
+        student.save()
+        self.assertMatchesRaw()
+
+    def test_deferred_field_saves(self):
+        student = self.students[0]
+        self.client.force_authenticate(student)
+        self.assertEqual(self.client.post(reverse('clock-in')).status_code, 201)
+        before = get_daily_rollup()
+
+        # Saves that leave role, department or status unloaded do not write them
+        user = CustomUser.objects.only('username').get(pk=student.pk)
+        user.username = 'Renamed'
+        user.save(update_fields=['username'])
+        record = Attendance.objects.only('clock_in_time').get(user=student, date=self.today)
+        record.save()
+        after = get_daily_rollup()
+        self.assertEqual(
+            [getattr(after, field) for field in ('student_total', 'present', 'absent', 'late', 'pending')],
+            [getattr(before, field) for field in ('student_total', 'present', 'absent', 'late', 'pending')],
+        )
+        self.assertMatchesRaw()
+
+    def test_verify_reports_drift(self):
+        DailyAttendanceRollup.objects.filter(date=self.today, department_id=None).update(present=5)
+        with self.assertRaisesMessage(CommandError, "1 rollup row(s) out of date"):
+            call_command('rebuild_attendance_rollups', verify=True, stdout=StringIO())
+        call_command('rebuild_attendance_rollups', stdout=StringIO())
+        self.assertMatchesRaw()
+
+    def test_counter_verify_reports_drift(self):
+        StudentAttendanceCounter.objects.filter(user=self.students[0]).update(present=F('present') + 1)
+        # The percentage view reads a missing counter as no attendance
+        StudentAttendanceCounter.objects.filter(user=self.students[1]).delete()
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "2 counter(s) out of date"):
+            call_command('reconcile_attendance_counters', verify=True, stdout=out)
+        self.assertIn(f"user {self.students[1].id}: missing", out.getvalue())
+        call_command('reconcile_attendance_counters', stdout=StringIO())
+        self.assertMatchesRaw()
+
+
+class ClockBatchTestCase(TestCase):
+    """Batched clock events keep the derived tables exact, even against a row inserted under them."""
+
+    def setUp(self):
+        cache.clear()
+        department = Department.objects.create(name='Science')
+        self.students = [
+            CustomUser.objects.create_user(f'student{n}@example.com', 'student-pass', username=f'Student {n}',
+                                           student_id=f'S{n:03d}', department=department)
+            for n in range(2)
+        ]
+        self.admin = CustomUser.objects.create_user('admin@example.com', 'admin-pass', role='admin', username='Admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_row_inserted_after_the_lock(self):
+        student = self.students[0]
+        Attendance.objects.create(user=student, date=timezone.now().date(), status='late')
+        get_daily_rollup()
+        get_attendance_counter(student.id)
+        locked_rows = clock_events._locked_rows
+        calls = []
+
+        def missed_first(keys):
+            # The first read misses the row, as if another request inserted it just after
+            calls.append(keys)
+            return {} if len(calls) == 1 else locked_rows(keys)
+
+        events = [{'student_id': other.student_id, 'action': 'clock_in'} for other in self.students]
+        with mock.patch('edulog_app.clock_events._locked_rows', side_effect=missed_first):
+            response = self.client.post(reverse('clock-batch'), {'events': events}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(response.data['processed'], 2)
+
+        rollup = get_daily_rollup()
+        self.assertEqual((rollup.present, rollup.late), (2, 0))
+        counter = get_attendance_counter(student.id)
+        self.assertEqual((counter.total, counter.present, counter.late), (1, 1, 0))
+        for command in ('rebuild_attendance_rollups', 'reconcile_attendance_counters', 'reconcile_monthly_attendance'):
+            call_command(command, verify=True, stdout=StringIO())
+
+
+class MarkAbsencesTestCase(TestCase):
+    """The nightly absence backfill is idempotent, resumable and keeps the derived tables exact."""
+
+    DAYS = ['2024-03-04', '2024-03-08']
+
+    def setUp(self):
+        cache.clear()
+        departments = [Department.objects.create(name=name) for name in ('Science', 'History')]
+        self.students = [
+            CustomUser.objects.create_user(f'student{n}@example.com', 'student-pass', username=f'Student {n}',
+                                           student_id=f'S{n:03d}', department=departments[n % 2] if n < 4 else None)
+            for n in range(5)
+        ]
+        Attendance.objects.create(user=self.students[0], date=date(2024, 3, 4), status='present')
+        Attendance.objects.create(user=self.students[1], date=date(2024, 3, 5), status='late')
+        # Built rows take deltas from here on
+        for day in range(4, 9):
+            get_daily_rollup(date(2024, 3, day))
+            for department in departments:
+                get_daily_rollup(date(2024, 3, day), department.id)
+        for student in self.students:
+            get_attendance_counter(student.id)
+
+    def mark(self, command='mark_absences'):
+        out = StringIO()
+        call_command(command, '--from', self.DAYS[0], '--to', self.DAYS[1], '--chunk-size', '2', stdout=out)
+        return out.getvalue()
+
+    def assertMatchesRaw(self, absences):
+        self.assertEqual(Attendance.objects.filter(status='absent').count(), absences)
+        for command in ('rebuild_attendance_rollups', 'reconcile_attendance_counters', 'reconcile_monthly_attendance'):
+            call_command(command, verify=True, stdout=StringIO())
+
+    def test_resume_and_rerun(self):
+        command = MarkAbsences()
+        insert = command.insert
+        calls = []
+
+        def interrupted(day, chunk):
+            calls.append(day)
+            if len(calls) == 4:
+                raise KeyboardInterrupt
+            insert(day, chunk)
+
+        command.insert = interrupted
+        with self.assertRaises(KeyboardInterrupt):
+            self.mark(command)
+        self.assertEqual(Attendance.objects.filter(status='absent').count(), 6)
+
+        self.assertIn("17 absence(s) marked", self.mark())
+        self.assertMatchesRaw(5 * 5 - 2)
+        self.assertIn("0 absence(s) marked", self.mark())
+        self.assertMatchesRaw(5 * 5 - 2)
+
+    def test_row_written_after_the_read(self):
+        late = self.students[2]
+        Attendance.objects.create(user=late, date=date(2024, 3, 6), status='present')
+        command = MarkAbsences()
+        next_chunk = command.next_chunk
+        reads = []
+
+        def stale(missing, last_id, chunk_size):
+            # The first read of 2024-03-06 still misses the late clock-in
+            reads.append(missing)
+            if len(reads) == 1:
+                return next_chunk(CustomUser.objects.filter(role='student'), last_id, chunk_size)
+            return next_chunk(missing, last_id, chunk_size)
+
+        command.next_chunk = stale
+        call_command(command, '--date', '2024-03-06', stdout=StringIO())
+        self.assertEqual(len(reads), 3)
+        self.assertEqual(Attendance.objects.get(user=late, date=date(2024, 3, 6)).status, 'present')
+        self.mark()
+        self.assertMatchesRaw(5 * 5 - 3)
+
+
+class StudentReportTestCase(TestCase):
+    """The monthly summary report matches a direct aggregate over raw Attendance."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.students = generate_school(departments=2, students=12, days=120, events=0, end_date=date(2024, 6, 14))
+        cls.admin = CustomUser.objects.create_user('admin@example.com', 'admin-pass', role='admin', username='Admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def raw_report(self, start_date=None, end_date=None, status_filter=None, department_filter=None, student_name_filter=None):
+        # The per-request aggregate StudentReportView used to run
+        filters = Q()
+        if start_date and end_date:
+            filters &= Q(attendance_records__date__range=[start_date, end_date])
+        if status_filter:
+            filters &= Q(attendance_records__status=status_filter)
+        if student_name_filter:
+            filters &= Q(username__icontains=student_name_filter)
+        students = CustomUser.objects.filter(role='student')
+        if department_filter:
+            students = students.filter(department__name=department_filter)
+        rows = students.annotate(
+            total_attendance=Count('attendance_records', filter=filters),
+            present_attendance=Count('attendance_records', filter=filters & Q(attendance_records__status='present')),
+            absent_attendance=Count('attendance_records', filter=filters & Q(attendance_records__status='absent')),
+            latest_attendance_date=Max('attendance_records__date', filter=filters),
+        ).order_by('id').values(
+            'id', 'username', 'student_id', 'department__name',
+            'total_attendance', 'present_attendance', 'absent_attendance', 'latest_attendance_date',
+        )
+        for row in rows:
+            total = row['total_attendance']
+            row['attendance_percentage'] = row['present_attendance'] * 100.0 / total if total else 0.0
+            yield row
+
+    def assertReportsMatch(self):
+        cases = [
+            {},
+            {'start_date': date(2024, 3, 1), 'end_date': date(2024, 5, 31)},
+            {'start_date': date(2024, 2, 20), 'end_date': date(2024, 6, 3)},
+            {'start_date': date(2024, 4, 2), 'end_date': date(2024, 4, 29)},
+            {'start_date': date(2024, 3, 15), 'end_date': date(2024, 4, 30), 'status_filter': 'late'},
+            {'start_date': date(2024, 2, 1), 'end_date': date(2024, 6, 10), 'status_filter': 'present',
+             'department_filter': 'Department 2'},
+            {'status_filter': 'pending', 'student_name_filter': 'student 1'},
+            {'start_date': date(2024, 5, 1)},
+        ]
+        for case in cases:
+            with self.subTest(**case):
+                self.assertEqual(list(student_report(**case, chunk_size=5)), list(self.raw_report(**case)))
+
+    def test_split_range(self):
+        self.assertEqual(split_range(date(2024, 3, 1), date(2024, 5, 31)), (date(2024, 3, 1), date(2024, 6, 1), []))
+        self.assertEqual(split_range(date(2024, 2, 20), date(2024, 6, 3)), (
+            date(2024, 3, 1), date(2024, 6, 1), [(date(2024, 2, 20), date(2024, 2, 29)), (date(2024, 6, 1), date(2024, 6, 3))]
+        ))
+        self.assertEqual(split_range(date(2024, 4, 2), date(2024, 4, 29)), (None, None, [(date(2024, 4, 2), date(2024, 4, 29))]))
+
+    def test_report_matches_raw_rows(self):
+        self.assertReportsMatch()
+
+        # Every write path keeps the monthly rows exact, including latest dates
+        student = self.students[0]
+        latest = student.attendance_records.order_by('-date').first()
+        latest.status = 'late' if latest.status != 'late' else 'present'
+        latest.save()
+        student.attendance_records.filter(date__gte=date(2024, 5, 28)).delete()
+        Attendance.objects.create(user=self.students[1], date=date(2024, 6, 15), status='present')
+        Attendance.objects.filter(user=self.students[2], date=date(2024, 4, 10)).delete()
+        events = [{'student_id': student.student_id, 'action': 'clock_in'} for student in self.students[3:6]]
+        self.assertEqual(self.client.post(reverse('clock-batch'), {'events': events}, format='json').status_code, 200)
+        self.assertReportsMatch()
+        call_command('reconcile_monthly_attendance', verify=True, stdout=StringIO())
+
+    def test_year_report_reads_summary(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/attendance/reports/?startDate=2024-01-01&endDate=2024-12-31')
+        self.assertEqual(len(response.data), len(self.students))
+        self.assertFalse(any(ATTENDANCE in query['sql'] for query in context.captured_queries))
+
+
+class AttendanceCalendarTestCase(TestCase):
+    """Yearly 2-bit calendars follow every Attendance write and answer streak questions."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.students = generate_school(departments=1, students=4, days=90, events=0, end_date=date(2024, 3, 29))
+        cls.admin = CustomUser.objects.create_user('admin@example.com', 'admin-pass', role='admin', username='Admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def calendar(self, student, year=2024, max_queries=2):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('attendance-calendar', args=[student.pk]) + f'?year={year}')
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(context.captured_queries), max_queries)
+        return response.data, base64.b64decode(response.data['calendar'])
+
+    def assertCalendarMatches(self, student, year=2024, max_queries=2):
+        data, bits = self.calendar(student, year, max_queries)
+        expected = [CODE_NAMES[NONE]] * data['days']
+        for day, status in student.attendance_records.filter(date__year=year).values_list('date', 'status'):
+            expected[day_index(day, year)] = 'present' if status == 'pending' else status
+        self.assertEqual([CODE_NAMES[code] for code in day_codes(bits, year)], expected)
+
+    def test_streak_helpers(self):
+        # Mon-Fri present, weekend, then late, absent, absent, present, present
+        codes = [PRESENT] * 5 + [NONE, NONE] + [LATE, ABSENT, ABSENT, PRESENT, PRESENT]
+        bits = set_days(bytes(92), dict(enumerate(codes)))
+        self.assertEqual(longest_streak(bits), 6)
+        self.assertEqual(longest_absence(bits), 2)
+        self.assertEqual(current_streak(bits, 11), 2)
+        self.assertEqual(current_streak(bits, 8), 0)
+        self.assertEqual(current_streak(bits, 6), 5)
+
+    def test_calendar_follows_writes(self):
+        student = self.students[0]
+        data, bits = self.calendar(student)
+        self.assertLessEqual(len(bits), 100)
+        self.assertEqual(data['start_date'], date(2024, 1, 1))
+        self.assertEqual(data['days'], 366)
+        self.assertEqual(data['longest_streak'], longest_streak(bits))
+        self.assertCalendarMatches(student)
+
+        record = student.attendance_records.filter(date__year=2024).order_by('date').first()
+        record.status = 'absent' if record.status != 'absent' else 'late'
+        record.save()
+        student.attendance_records.filter(date__gte=date(2024, 3, 20)).delete()
+        events = [{'student_id': student.student_id, 'action': 'clock_in'}]
+        self.assertEqual(self.client.post(reverse('clock-batch'), {'events': events}, format='json').status_code, 200)
+        self.assertCalendarMatches(student)
+        # Years without a row are built from raw rows on first access
+        self.assertCalendarMatches(student, 2023, max_queries=4)
+
+    def test_years_without_attendance(self):
+        student = self.students[0]
+        for year in (1200, 9999):
+            response = self.client.get(reverse('attendance-calendar', args=[student.pk]) + f'?year={year}')
+            self.assertEqual(response.status_code, 400)
+        # Served empty, but not stored
+        data, bits = self.calendar(student, 2020, max_queries=3)
+        self.assertEqual(bits, bytes(92))
+        self.assertEqual(data['longest_streak'], 0)
+        self.assertFalse(StudentAttendanceCalendar.objects.filter(year=2020).exists())
+
+
+class CohortAnalyticsTestCase(TestCase):
+    """Vectorized cohort metrics agree with the raw rows they summarize."""
+
+    def test_cohort_metrics(self):
+        codes = np.array([
+            [PRESENT, PRESENT, NONE, ABSENT, ABSENT, NONE, ABSENT, LATE],
+            [PRESENT, LATE, NONE, PRESENT, PRESENT, NONE, PRESENT, PRESENT],
+            [NONE] * 8,
+        ], dtype=np.uint8)
+        metrics = cohort_metrics(codes, np.array([0, 1, 1]), threshold=0.1)
+        self.assertEqual(metrics['school_days'].tolist(), [6, 6, 0])
+        self.assertEqual(metrics['absences'].tolist(), [3, 0, 0])
+        self.assertEqual(metrics['chronic'].tolist(), [True, False, False])
+        self.assertEqual(metrics['current_streak'].tolist(), [1, 6, 0])
+        self.assertEqual(metrics['longest_absence'].tolist(), [3, 0, 0])
+        self.assertEqual(metrics['group_students'].tolist(), [1, 2])
+        self.assertEqual(metrics['group_rate'].tolist(), [0.5, 1.0])
+        self.assertTrue(np.isnan(metrics['daily_rate'][2]))
+        self.assertEqual(rolling_rate(np.array([1, 0, 2]), np.array([2, 0, 2]), 2).tolist(), [0.5, 0.5, 1.0])
+
+    def test_endpoint(self):
+        generate_school(departments=2, students=30, days=60, events=0, end_date=date(2024, 1, 20))
+        admin = CustomUser.objects.create_user('admin@example.com', 'admin-pass', role='admin', username='Admin')
+        client = APIClient()
+        client.force_authenticate(admin)
+        url = reverse('cohort-analytics') + '?startDate=2023-12-01&endDate=2024-01-20&threshold=0.08'
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(data['students'], 30)
+        self.assertEqual(len(data['trend']), 51)
+        self.assertEqual(sum(department['students'] for department in data['departments']), 30)
+
+        absences = dict(
+            Attendance.objects.filter(status='absent', date__range=(date(2023, 12, 1), date(2024, 1, 20)))
+            .values_list('user_id').annotate(Count('id'))
+        )
+        self.assertTrue(data['chronic_students'])
+        for student in data['chronic_students']:
+            self.assertEqual(student['absences'], absences[student['id']])
+            self.assertGreaterEqual(student['absence_rate'], 0.08)
+        rates = [student['absence_rate'] for student in data['chronic_students']]
+        self.assertEqual(rates, sorted(rates, reverse=True))
+
+        for query in (
+            '?startDate=2024-02-01&endDate=2024-01-01',
+            '?startDate=1900-01-01&endDate=2024-01-01',
+            '?endDate=9999-12-31',
+            '?limit=-1',
+        ):
+            self.assertEqual(client.get(reverse('cohort-analytics') + query).status_code, 400)
+
+        # Years outside the attendance data are blank and get no calendars
+        calendars = StudentAttendanceCalendar.objects.count()
+        response = client.get(reverse('cohort-analytics') + '?startDate=2022-12-01&endDate=2023-01-31')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(StudentAttendanceCalendar.objects.filter(year=2022).exists())
+        self.assertEqual(StudentAttendanceCalendar.objects.count(), calendars)
+
+
+class AnalyticsSnapshotTestCase(TestCase):
+    """The mapped snapshot serves the same data as the database while it is current."""
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/snapshot.bin'
+        override = override_settings(ANALYTICS_SNAPSHOT_PATH=self.path, ANALYTICS_SNAPSHOT_MAX_AGE=0)
+        override.enable()
+        self.addCleanup(override.disable)
+        generate_school(departments=3, students=40, days=20, events=0)
+        admin = CustomUser.objects.create_user('admin@example.com', 'admin-pass', role='admin', username='Admin')
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def test_snapshot_matches_database(self):
+        departments = department_stats()
+        self.assertIsNone(current_snapshot())
+        call_command('refresh_snapshot', stdout=StringIO())
+        snapshot = current_snapshot()
+        self.assertIsNotNone(snapshot)
+        self.assertFalse(snapshot.students.flags.writeable)
+        self.assertEqual(len(snapshot.students), 40)
+        self.assertEqual(snapshot.department_stats(), departments)
+
+        with CaptureQueriesContext(connection) as context:
+            from_snapshot = self.client.get(reverse('percentage')).content
+        self.assertEqual(len(context.captured_queries), 0)
+        cache.clear()
+        with self.settings(ANALYTICS_SNAPSHOT_PATH=''):
+            self.assertEqual(self.client.get(reverse('percentage')).content, from_snapshot)
+
+    def test_writes_make_it_stale(self):
+        call_command('refresh_snapshot', stdout=StringIO())
+        old = current_snapshot()
+        student = CustomUser.objects.filter(role='student').order_by('id').first()
+        Attendance.objects.filter(user=student).update(status='absent')
+        call_command('reconcile_attendance_counters', stdout=StringIO())
+        self.assertIsNone(current_snapshot())
+        percentage = next(row for row in self.client.get(reverse('percentage')).json() if row['id'] == student.id)
+        self.assertEqual(percentage['attendance_percentage'], 0.0)
+
+        out = StringIO()
+        call_command('refresh_snapshot', '--if-stale', stdout=out)
+        self.assertIn('Wrote', out.getvalue())
+        new = current_snapshot()
+        self.assertNotEqual(new.key, old.key)
+        self.assertEqual(new.attendance_percentages()[0]['attendance_percentage'], 0.0)
+        # The old mapping is still readable by requests that hold it
+        self.assertEqual(old.students['id'][0], student.id)
+
+        out = StringIO()
+        call_command('refresh_snapshot', '--if-stale', stdout=out)
+        self.assertIn('nothing to do', out.getvalue())
+        self.assertIs(get_snapshot(), new)
+
+    @override_settings(ANALYTICS_SNAPSHOT_MAX_AGE=60)
+    def test_stale_snapshot_is_rebuilt(self):
+        call_command('refresh_snapshot', stdout=StringIO())
+        old = current_snapshot()
+        student = CustomUser.objects.filter(role='student').order_by('id').first()
+        Attendance.objects.filter(user=student).update(status='absent')
+        call_command('reconcile_attendance_counters', stdout=StringIO())
+
+        # Run the background rebuild in this thread, which sees the test's writes
+        with mock.patch('edulog_app.snapshot._refresh_in_background', side_effect=snapshot.refresh) as rebuild:
+            # Stale but young: still served, and not rebuilt yet
+            self.assertIs(current_snapshot(), old)
+            rebuild.assert_not_called()
+            # Stale and past half the max age: served while a rebuild starts
+            with mock.patch.object(Snapshot, 'age', return_value=45):
+                self.assertIs(current_snapshot(), old)
+            rebuild.assert_called_once()
+        new = current_snapshot()
+        self.assertNotEqual(new.key, old.key)
+        self.assertTrue(new.is_current())
+        self.assertEqual(new.attendance_percentages()[0]['attendance_percentage'], 0.0)
+
+        # Past the max age a stale snapshot is not served at all
+        bump_versions('attendance')
+        with mock.patch('edulog_app.snapshot._refresh_in_background') as rebuild, \
+                mock.patch.object(Snapshot, 'age', return_value=60):
+            self.assertIsNone(current_snapshot())
+        rebuild.assert_called_once()
+        # Another process holding the lock is left to finish the rebuild
+        with open(self.path + '.lock') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.assertIsNone(snapshot.refresh())
+        self.assertIsNotNone(snapshot.refresh())
+
+
+class LiveFeedTestCase(TestCase):
+    """Dashboards get clock events and counters pushed, one read per event."""
+
+    def setUp(self):
+        cache.clear()
+        reset_broker()
+        self.addCleanup(reset_broker)
+        generate_school(departments=2, students=10, days=1, events=0)
+        self.student = CustomUser.objects.filter(role='student').order_by('id').first()
+        self.admin = CustomUser.objects.create_user('admin@example.com', 'admin-pass', role='admin', username='Admin')
+        get_daily_rollup()
+
+    def bearer(self, user):
+        return {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+    async def test_stream(self):
+        client = AsyncClient()
+        response = await client.get(reverse('live-feed'), headers=self.bearer(self.admin))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        first = (await anext(events)).decode()
+        self.assertTrue(first.startswith('event: counters\n'))
+        present = json.loads(first.split('data: ', 1)[1])['counters']['attendancePercentage']
+
+        self.assertEqual((await client.post(reverse('clock-in'), headers=self.bearer(self.student))).status_code, 201)
+        event = (await anext(events)).decode()
+        self.assertTrue(event.startswith('event: clock_in\n'))
+        payload = json.loads(event.split('data: ', 1)[1])
+        self.assertEqual(payload['log']['student_id'], self.student.student_id)
+        self.assertEqual(payload['log']['status'], 'present')
+        self.assertGreater(payload['counters']['attendancePercentage'], present)
+        await events.aclose()
+
+    def publish_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            publish_counters()
+        return len(context.captured_queries)
+
+    async def test_fan_out(self):
+        broker = get_broker()
+        subscriptions = [broker.subscribe() for _ in range(3)]
+        self.assertEqual(await sync_to_async(self.publish_queries)(), 1)
+        for subscription in subscriptions:
+            self.assertEqual((await subscription.get(1))['type'], 'counters')
+
+        # Without streams nothing is read
+        for subscription in subscriptions:
+            broker.unsubscribe(subscription)
+        self.assertEqual(await sync_to_async(self.publish_queries)(), 0)
+
+        # A closed stream unsubscribes
+        events = stream()
+        await anext(events)
+        self.assertTrue(broker.has_subscribers())
+        await events.aclose()
+        self.assertFalse(broker.has_subscribers())
+
+    async def test_unix_socket_broker(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        receiver = UnixSocketBroker(directory.name)
+        subscription = receiver.subscribe()
+        # A socket left behind by a dead worker
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        stale.bind(f'{directory.name}/1.sock')
+        stale.close()
+
+        # Another process's broker: it has no streams of its own
+        publisher = UnixSocketBroker(directory.name)
+        self.assertTrue(publisher.has_subscribers())
+        publisher.publish({'type': 'counters', 'counters': {'total': 3}})
+        self.assertEqual(await subscription.get(5), {'type': 'counters', 'counters': {'total': 3}})
+        self.assertEqual(os.listdir(directory.name), [f'{os.getpid()}.sock'])
+
+
+class EndpointBenchmarkTestCase(TestCase):
+    """The endpoint benchmark covers every route and each of its requests succeeds."""
+
+    def test_every_route_runs(self):
+        self.assertEqual(uncovered_routes(), [])
+        self.assertIn('GET /api/attendance/reports/', routes())
+        self.assertIn('DELETE /admin/attendance/<pk>/', routes())
+
+        today = timezone.now().date()
+        students = generate_school(departments=2, students=60, days=10, events=5, end_date=today)
+        results = run(students, today, iterations=1)
+        self.assertEqual(set(results), set(ENDPOINTS))
+        for key, result in results.items():
+            self.assertEqual(result['failures'], [], key)
+            self.assertGreater(result['peak_kib'], 0, key)
+        # The live feed was read to its first event and let go
+        self.assertFalse(get_broker().has_subscribers())
+
+    def test_command_invalidates_its_responses(self):
+        cached_under = []
+
+        def run_and_record(*args):
+            results = run(*args)
+            cached_under.extend(get_versions(DOMAINS))
+            return results
+
+        with mock.patch('edulog_app.management.commands.benchmark_endpoints.run', side_effect=run_and_record):
+            call_command(
+                'benchmark_endpoints', '--departments=1', '--students=10', '--days=2', '--events=1',
+                '--iterations=1', '--only=GET /api/attendance/stats/percentage/', stdout=StringIO(),
+            )
+        # Responses of the rolled-back school are cached under versions that are now gone
+        self.assertTrue(all(old != new for old, new in zip(cached_under, get_versions(DOMAINS))))
+
+
+class ArchiveLogsTestCase(TestCase):
+    """archive_logs moves old logs out in batches without losing any."""
+
+    def setUp(self):
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        settings_override = override_settings(ATTENDANCE_LOG_ARCHIVE_DIR=archive_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        generate_school(departments=2, students=10, days=40, events=0)
+        self.admin = CustomUser.objects.create_user('admin@example.com', 'admin-pass', role='admin', username='Admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def history(self, query):
+        response = self.client.get('/attendance/history/?' + query)
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_archive_and_read_back(self):
+        total = AttendanceLog.objects.count()
+        cutoff = retention_cutoff(7)
+        old = AttendanceLog.objects.filter(timestamp__lt=cutoff).count()
+        self.assertTrue(0 < old < total)
+
+        call_command('archive_logs', days=7, batch_size=37, stdout=StringIO())
+        self.assertFalse(AttendanceLog.objects.filter(timestamp__lt=cutoff).exists())
+        self.assertEqual(AttendanceLog.objects.count(), total - old)
+        self.assertEqual(sum(AttendanceLogArchive.objects.values_list('count', flat=True)), old)
+        # Re-running finds nothing left to move
+        call_command('archive_logs', days=7, stdout=StringIO())
+        self.assertEqual(sum(AttendanceLogArchive.objects.values_list('count', flat=True)), old)
+
+        today = cutoff.date() + timedelta(days=7)
+        rows = self.history(f'from={today - timedelta(days=60)}&to={today}')
+        self.assertEqual(len(rows), total)
+        self.assertEqual(len({row['id'] for row in rows}), total)
+        self.assertEqual([row['timestamp'] for row in rows], sorted(row['timestamp'] for row in rows))
+
+        student = rows[0]['user']
+        rows = self.history(f'from={today - timedelta(days=60)}&to={cutoff.date()}&user={student}&action=login')
+        self.assertTrue(rows)
+        self.assertTrue(all(row['user'] == student and row['action'] == 'login' for row in rows))
+
+        response = self.client.get(f'/attendance/history/?from={today - timedelta(days=60)}&to={today}&summary=1')
+        self.assertEqual(sum(row['count'] for row in response.data), old)
+
+    @override_settings(ATTENDANCE_LOG_ARCHIVE_DIR=None)
+    def test_no_archive_dir(self):
+        total = AttendanceLog.objects.count()
+        with self.assertRaisesMessage(CommandError, "ATTENDANCE_LOG_ARCHIVE_DIR"):
+            call_command('archive_logs', days=7, stdout=StringIO())
+        self.assertEqual(AttendanceLog.objects.count(), total)
+        call_command('archive_logs', days=7, dry_run=True, stdout=StringIO())
+
+
+@override_settings(ATTENDANCE_LOG_BUFFER=True, ATTENDANCE_LOG_BUFFER_SIZE=1000, ATTENDANCE_LOG_FLUSH_INTERVAL=3600)
+class LogBufferTestCase(TestCase):
+    """Buffered login/logout logs are queued by the request and written in one flush."""
+
+    def setUp(self):
+        self.addCleanup(log_buffer.stop)
+        self.student = CustomUser.objects.create_user('student@example.com', 'pass', role='student', username='Student')
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_buffered_logs(self):
+        before = log_buffer.stats()
+        with CaptureQueriesContext(connection) as context:
+            for _ in range(3):
+                self.assertEqual(self.client.post('/attendance/login_log/').status_code, 202)
+            self.assertEqual(self.client.post('/attendance/logout_log/').status_code, 202)
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(log_buffer.stats()['queue_depth'], 4)
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(log_buffer.flush(), 4)
+        inserts = [query for query in context.captured_queries if not TRANSACTION_CONTROL.match(query['sql'])]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(AttendanceLog.objects.filter(user=self.student, action='login').count(), 3)
+        stats = log_buffer.stats()
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['flushed'] - before['flushed'], 4)
+
+    def test_bad_event_only_drops_itself(self):
+        before = log_buffer.stats()
+        now = timezone.now()
+        log_buffer.enqueue(self.student.id, 'login', now)
+        log_buffer.enqueue(None, 'login', now)
+        log_buffer.enqueue(self.student.id, 'logout', now)
+        with self.assertLogs('edulog_app.log_buffer', 'ERROR') as logs:
+            self.assertEqual(log_buffer.flush(), 2)
+        self.assertEqual(len(logs.output), 1)
+        self.assertEqual(sorted(AttendanceLog.objects.filter(user=self.student).values_list('action', flat=True)),
+                         ['login', 'logout'])
+        stats = log_buffer.stats()
+        self.assertEqual((stats['flushed'] - before['flushed'], stats['dropped'] - before['dropped']), (2, 1))
+
+    @override_settings(ATTENDANCE_LOG_BUFFER_MAX=0)
+    def test_full_buffer_writes_through(self):
+        self.assertEqual(self.client.post('/attendance/login_log/').status_code, 201)
+        self.assertTrue(AttendanceLog.objects.filter(user=self.student).exists())
+
+
+class RosterImportTestCase(TestCase):
+    """Roster imports upsert users and departments, skip bad rows and keep derived rows in step."""
+
+    ROSTER = (
+        "email,username,student_id,department,role,password\n"
+        "new1@example.com,New One,N001,Science,,first-pass\n"
+        "new2@example.com,New Two,N002,History,student,second-pass\n"
+        "KEPT@Example.com,Kept Renamed,K001,History,,ignored-pass\n"
+        "not-an-email,Bad Email,N003,,,\n"
+        "new1@example.com,Duplicate,N004,,,\n"
+        "thief@example.com,Thief,O001,,,\n"
+        "teacher@example.com,Teacher,,,admin,\n"
+        ",No Email,N005,,,\n"
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.science = Department.objects.create(name='Science')
+        self.kept = CustomUser.objects.create_user('KEPT@example.com', 'kept-pass', username='Kept', student_id='K001')
+        CustomUser.objects.create_user('other@example.com', 'other-pass', username='Other', student_id='O001')
+        get_daily_rollup()
+
+    def assertImported(self, report):
+        self.assertEqual(report['rows'], 8)
+        self.assertEqual((report['created'], report['updated'], report['departments_created']), (3, 1, 1))
+        self.assertEqual({error['line']: list(error['errors']) for error in report['errors']}, {
+            5: ['email'], 6: ['email'], 7: ['student_id'], 9: ['email'],
+        })
+
+        new = CustomUser.objects.get(email='new1@example.com')
+        self.assertTrue(new.check_password('first-pass'))
+        self.assertEqual((new.student_id, new.department_id), ('N001', self.science.id))
+        self.assertFalse(CustomUser.objects.get(email='teacher@example.com').has_usable_password())
+        self.kept.refresh_from_db()
+        self.assertEqual((self.kept.username, self.kept.department.name), ('Kept Renamed', 'History'))
+        self.assertTrue(self.kept.check_password('kept-pass'))
+
+        # What the save signals would have maintained
+        self.assertEqual([row['id'] for row in search_students('N002')], [CustomUser.objects.get(student_id='N002').id])
+        self.assertEqual([row['id'] for row in search_students('kept renamed')], [self.kept.id])
+        self.assertEqual(get_daily_rollup().student_total, CustomUser.objects.filter(role='student').count())
+        history = Department.objects.get(name='History')
+        self.assertEqual(get_daily_rollup(department_id=history.id).student_total, 2)
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(self.ROSTER)
+        self.addCleanup(os.unlink, f.name)
+        out = StringIO()
+        call_command('import_roster', f.name, '--chunk-size', '2', '--workers', '2', '--json', stdout=out)
+        self.assertImported(json.loads(out.getvalue()))
+
+        # A second run only updates
+        report = import_roster(StringIO(self.ROSTER), workers=1)
+        self.assertEqual((report['created'], report['updated'], report['departments_created']), (0, 4, 0))
+
+    def test_missing_columns_are_kept(self):
+        admin = CustomUser.objects.create_user('admin@example.com', 'admin-pass', role='admin', username='Admin')
+        self.kept.department = self.science
+        self.kept.save()
+        report = import_roster(StringIO(
+            "email,username\n"
+            "admin@example.com,Admin Renamed\n"
+            "KEPT@example.com,Kept Renamed\n"
+            "fresh@example.com,Fresh\n"
+        ))
+        self.assertEqual((report['created'], report['updated'], report['errors']), (1, 2, []))
+        admin.refresh_from_db()
+        self.kept.refresh_from_db()
+        self.assertEqual((admin.username, admin.role), ('Admin Renamed', 'admin'))
+        self.assertEqual((self.kept.username, self.kept.student_id, self.kept.department_id), ('Kept Renamed', 'K001', self.science.id))
+        self.assertEqual(CustomUser.objects.get(email='fresh@example.com').role, 'student')
+        self.assertEqual([row['id'] for row in search_students('K001')], [self.kept.id])
+        self.assertEqual(get_daily_rollup(department_id=self.science.id).student_total, 1)
+
+        # A blank role cell keeps the role too
+        import_roster(StringIO("email,username,role\nadmin@example.com,Admin,\n"))
+        admin.refresh_from_db()
+        self.assertEqual(admin.role, 'admin')
+
+    def test_endpoint(self):
+        admin = CustomUser.objects.create_user('admin@example.com', 'admin-pass', role='admin', username='Admin')
+        client = APIClient()
+        url = reverse('roster-import')
+        upload = SimpleUploadedFile('roster.csv', self.ROSTER.encode('utf-8-sig'), content_type='text/csv')
+        client.force_authenticate(self.kept)
+        self.assertEqual(client.post(url, {'file': upload}).status_code, 403)
+
+        client.force_authenticate(admin)
+        with mock.patch('edulog_app.roster.ProcessPoolExecutor') as pool:
+            response = client.post(url, {'file': upload.open()})
+        pool.assert_not_called()
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertImported(response.data)
+
+        self.assertEqual(client.post(url, {}).status_code, 400)
+        headerless = SimpleUploadedFile('roster.csv', b'a,b\n1,2\n', content_type='text/csv')
+        self.assertEqual(client.post(url, {'file': headerless}).status_code, 400)
+
+
+class LoginTestCase(TestCase):
+    """A login attempt costs one user lookup and one password hash."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('login@example.com', 'login-pass', role='student', username='Login')
+        self.client = APIClient()
+
+    def login(self, email, password):
+        with count_hashes() as hashes, CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/login/', {'email': email, 'password': password}, format='json')
+        return response, hashes[0], len(queries.captured_queries)
+
+    def test_single_hash(self):
+        for email, password, expected in [
+            ('login@example.com', 'login-pass', 200),
+            ('login@example.com', 'wrong-pass', 401),
+            ('nobody@example.com', 'login-pass', 401),
+        ]:
+            response, hashes, queries = self.login(email, password)
+            self.assertEqual(response.status_code, expected)
+            self.assertEqual((hashes, queries), (1, 1), email)
+
+    def test_hash_upgrade(self):
+        # A password stored with an outdated work factor is re-hashed on login
+        self.user.password = PBKDF2PasswordHasher().encode('login-pass', 'oldsalt', iterations=1000)
+        self.user.save(update_fields=['password'])
+        response, _, _ = self.login('login@example.com', 'login-pass')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertFalse(get_hasher().must_update(self.user.password))
+        self.assertEqual(self.login('login@example.com', 'login-pass')[0].status_code, 200)
+
+
+class CachedJWTAuthenticationTestCase(TestCase):
+    """Token requests reuse the cached user until the user is saved."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.admin = CustomUser.objects.create_user('jwt@example.com', 'jwt-pass', role='admin', username='JWT')
+        self.client = APIClient()
+        response = self.client.post('/api/login/', {'email': 'jwt@example.com', 'password': 'jwt-pass'}, format='json')
+        self.token = response.data['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def user_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        return response, [q['sql'] for q in context.captured_queries if f'FROM "{USER}"' in q['sql']]
+
+    def test_claims(self):
+        claims = AccessToken(self.token)
+        self.assertEqual((claims['role'], claims['student_id'], claims['is_active']), ('admin', None, True))
+
+    def test_cached_user(self):
+        url = reverse('response-cache-stats')
+        response, queries = self.user_queries(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        response, queries = self.user_queries(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+        # Demotion takes effect on the next request
+        self.admin.role = 'student'
+        self.admin.save()
+        response, queries = self.user_queries(url)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(len(queries), 1)
+
+        self.admin.is_active = False
+        self.admin.save()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    async def test_async_views(self):
+        clock_in = reverse('clock-in')
+        self.assertTrue(iscoroutinefunction(resolve(clock_in).func))
+        client, headers = AsyncClient(), {'Authorization': f'Bearer {self.token}'}
+        response = await client.post(clock_in, headers=headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['updated_present_count'], 1)
+
+        hits = user_cache.hits
+        status_url = reverse('attendance-status', args=[self.admin.pk])
+        self.assertEqual((await client.get(status_url, headers=headers)).json(), {'is_clocked_in': True})
+        self.assertEqual((await client.post(reverse('clock-out'), headers=headers)).status_code, 200)
+        self.assertEqual((await client.get(status_url, headers=headers)).json(), {'is_clocked_in': False})
+        self.assertEqual(user_cache.hits, hits + 3)
+
+        self.assertEqual((await client.post(clock_in)).status_code, 401)
+        self.assertEqual((await client.get(reverse('attendance-status', args=[0]), headers=headers)).status_code, 404)
+
+
+@override_settings(DB_INSTRUMENTATION_SAMPLE_RATE=1.0, SLOW_REQUEST_MS=60000, SLOW_REQUEST_QUERIES=1000)
+class QueryInstrumentationTestCase(TestCase):
+    """Sampled requests report their queries in Server-Timing and the slow-request log."""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('timing@example.com', 'timing-pass', role='admin', username='Timing')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    @staticmethod
+    def timing(response):
+        return dict(
+            (name, float(re.search(r'dur=([\d.]+)', entry).group(1)))
+            for name, entry in (entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+        ), int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+
+    def test_server_timing(self):
+        url = reverse('attendance-records') + '?page_size=5'
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        durations, queries = self.timing(response)
+        self.assertEqual(queries, len(context.captured_queries))
+        self.assertLessEqual(durations['db'], durations['total'])
+
+        with override_settings(DB_INSTRUMENTATION_SAMPLE_RATE=0):
+            self.assertNotIn('Server-Timing', self.client.get(url))
+
+    def test_slow_request_log(self):
+        with override_settings(SLOW_REQUEST_QUERIES=0, SLOW_REQUEST_TOP_QUERIES=2), \
+                self.assertLogs('edulog.slow_requests', 'WARNING') as logs:
+            response = self.client.get(reverse('attendance-calendar', args=[self.admin.pk]) + '?year=2024')
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['view'], 'attendance-calendar')
+        self.assertEqual(entry['params'], {'url': {'student_id': self.admin.pk}, 'query': {'year': '2024'}})
+        self.assertEqual(entry['queries'], self.timing(response)[1])
+        self.assertEqual(len(entry['slowest_queries']), 2)
+        self.assertGreaterEqual(entry['slowest_queries'][0]['ms'], entry['slowest_queries'][1]['ms'])
+
+    async def test_async_view(self):
+        # The async view's queries run in another thread, under the request's context
+        await sync_to_async(instrument)(connection)
+        token = str(AccessToken.for_user(self.admin))
+        response = await AsyncClient().get(
+            reverse('attendance-status', args=[self.admin.pk]), headers={'Authorization': f'Bearer {token}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(self.timing(response)[1], 2)
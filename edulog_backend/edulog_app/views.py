@@ -3,20 +3,50 @@ from rest_framework import permissions, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status, generics
-from .models import AttendanceLog, CustomUser, Department, Attendance, SchoolEvent
-from .serializers import AttendanceLogSerializer, CustomUserSerializer, DepartmentStatsSerializer, AttendancePercentageSerializer, AdminAttendanceSerializer, DepartmentSerializer, AttendanceSerializer, SchoolEventSerializer
+from .models import AttendanceLog, AttendanceLogArchive, CustomUser, Department, Attendance, SchoolEvent
+from .serializers import AttendanceLogSerializer, CustomUserSerializer, DepartmentStatsSerializer, AttendancePercentageSerializer, AdminAttendanceSerializer, DepartmentSerializer, AttendanceSerializer, SchoolEventSerializer, ClockEventSerializer, ClockEventBatchSerializer
 from .permissions import IsAdmin
+from .rollups import aget_attendance_counter, get_attendance_counter
+from .attendance_calendar import (
+    CODE_NAMES, academic_year, current_streak, day_index, encode, get_calendar, longest_absence, longest_streak,
+    served_years, year_days, year_start,
+)
+from .renderers import CSVRenderer, NDJSONRenderer
+from .exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, streaming_export
+from .clock_events import apply_clock_events
+from .analytics import CHRONIC_THRESHOLD, cohort_report
+from .dashboard import department_stats, get_dashboard, recent_attendance, today_summary, upcoming_events
+from .log_archive import LOG_FIELDS, month_of, read_logs
+from .log_buffer import log_buffer
+from .response_cache import cache_stats, cached_response
+from .conditional import conditional_get
+from .pagination import KeysetPagination
+from .search import search_students
+from .snapshot import current_snapshot
+from .student_report import REPORT_CHUNK_SIZE, student_report
+from .authentication import CachedJWTAuthentication, ClaimsRefreshToken
+from .async_views import AsyncAPIView
+from .live_feed import apublish_attendance, publish_counters, stream
+from .row_serializers import ValuesListMixin
+from .roster import import_roster
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
+from rest_framework.parsers import MultiPartParser
+from rest_framework.settings import api_settings
+from django.conf import settings
 from django.contrib.auth import authenticate
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken,AccessToken
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Count, Q, F, ExpressionWrapper, FloatField, Case, When, Value, Max
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from django.db import transaction
+from django.db.models import Count, Q, F, ExpressionWrapper, FloatField, Case, When, Value
+from django.db.models.functions import Coalesce
 from rest_framework_simplejwt.tokens import AccessToken
 from datetime import datetime, date, timedelta
 from rest_framework.permissions import BasePermission
 
+import io
 import logging
 logger = logging.getLogger(__name__)
 
@@ -30,21 +60,11 @@ class LoginUserView(APIView):
         if not email or not password:
             return Response({"error": "Email and password required"}, status=400)
 
-        # Manual authentication check
-        try:
-            user = CustomUser.objects.get(email=email)
-            print(f"User found: {user}")
-            print(f"Password valid: {user.check_password(password)}")
-        except CustomUser.DoesNotExist:
-            print("User not found")
-            user = None
-
-        # System authentication
-        auth_user = authenticate(email=email, password=password)
-        print(f"Auth backend returned: {auth_user}")
+        # One user lookup and one password hash (see EmailAuthBackend)
+        auth_user = authenticate(request, email=email, password=password)
 
         if auth_user:
-            refresh = RefreshToken.for_user(auth_user)
+            refresh = ClaimsRefreshToken.for_user(auth_user)
             return Response({
                 "access_token": str(refresh.access_token),
                 "refresh_token": str(refresh),
@@ -67,18 +87,56 @@ class RegisterUserView(APIView):
             logger.error("Registration validation errors: %s", serializer.errors) 
             return Response({"success": False, "errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
+class RosterImportView(APIView):
+    """
+    Import a roster CSV uploaded as the multipart field `file`: students
+    and admins are created or updated by email, their departments created
+    as needed (see edulog_app.roster). Rows with errors are skipped and
+    listed by line number in the response. Passwords are hashed in this
+    process: forking a pool from a server worker is not safe, so large
+    rosters with passwords belong to the import_roster command.
+    """
+    permission_classes = [IsAdmin]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "Upload the roster CSV as the multipart field 'file'"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            report = import_roster(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
+
 class DepartmentViewSet(viewsets.ModelViewSet):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
     permission_classes = [IsAdmin]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('id',)
 
-class AttendanceRecordListCreateView(generics.ListCreateAPIView):
-    queryset = Attendance.objects.all()
+    @conditional_get(Department)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get(Department)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+class AttendanceRecordListCreateView(ValuesListMixin, generics.ListCreateAPIView):
+    queryset = Attendance.objects.all().select_related('user')
     serializer_class = AttendanceSerializer
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-date', '-id')
 
     def get_queryset(self):
         return super().get_queryset().order_by('-date')
 
+    @transaction.atomic
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+
 class AttendanceRecordRetrieveUpdateView(generics.RetrieveUpdateAPIView):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
@@ -86,10 +144,12 @@ class AttendanceRecordRetrieveUpdateView(generics.RetrieveUpdateAPIView):
     def perform_update(self, serializer):
         serializer.save(updated_at=timezone.now())
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(ValuesListMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.all().select_related('user') 
     serializer_class = AdminAttendanceSerializer
     permission_classes = [IsAdmin]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-date', '-id')
 
     def get_queryset(self):
         # Filter only student records (non-admin users)
@@ -106,7 +166,20 @@ class AttendanceViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(date__lte=date_to)
             
         return queryset.order_by('-date')  # Newest first
-    
+
+    # Writes share one transaction with the rollup updates they trigger
+    @transaction.atomic
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+
 class AttendanceStatsView(APIView):
     def get(self, request, student_id):
         try:
@@ -118,49 +191,129 @@ class AttendanceStatsView(APIView):
             if not student:
                 return Response({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
 
-            # Get counts for all status types
-            counts = Attendance.objects.filter(user=student).aggregate(
-                total=Count('id'),
-                present=Count('id', filter=Q(status='present')),
-                absent=Count('id', filter=Q(status='absent')),
-                late=Count('id', filter=Q(status='late'))
-            )
+            # Counts for all status types, maintained on every attendance write
+            counts = get_attendance_counter(student.id)
             
             return Response({
-                "total": counts['total'],
-                "present": counts['present'],
-                "absent": counts['absent'],
-                "late": counts['late'],
-                "percentage": (counts['present'] / counts['total'] * 100) if counts['total'] > 0 else 0
+                "total": counts.total,
+                "present": counts.present,
+                "absent": counts.absent,
+                "late": counts.late,
+                "percentage": (counts.present / counts.total * 100) if counts.total > 0 else 0
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-class AttendanceLogViewSet(viewsets.ModelViewSet):
+class AttendanceCalendarView(APIView):
+    """
+    A student's attendance for one academic year (?year=, default the
+    current one) as a base64 calendar of 2-bit day codes, with streaks.
+    """
+
+    def get(self, request, student_id):
+        student = CustomUser.objects.filter(Q(id=student_id) | Q(student_id=student_id)).values_list('id', flat=True).first()
+        if student is None:
+            return Response({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        today = timezone.now().date()
+        try:
+            year = int(request.query_params.get('year', academic_year(today)))
+        except ValueError:
+            return Response({"error": "year must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        years = served_years(today)
+        if year not in years:
+            return Response({"error": f"year must be between {years[0]} and {years[-1]}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        bits = get_calendar(student, year)
+        days = year_days(year)
+        # Streaks run up to today, or the whole year once it is over
+        through = min(day_index(today, year), days - 1)
+        return Response({
+            "student": student,
+            "year": year,
+            "start_date": year_start(year),
+            "days": days,
+            "codes": CODE_NAMES,
+            "calendar": encode(bits),
+            "current_streak": current_streak(bits, through) if through >= 0 else 0,
+            "longest_streak": longest_streak(bits),
+            "longest_absence": longest_absence(bits),
+        }, status=status.HTTP_200_OK)
+
+class AttendanceLogViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """API endpoint to manage attendance logs"""
     queryset = AttendanceLog.objects.all()
     serializer_class = AttendanceLogSerializer
     permission_classes = [IsAdmin]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-timestamp', '-id')
+
+    def record(self, request, log_action):
+        """
+        Write one log event, or with ATTENDANCE_LOG_BUFFER on, queue it for
+        the next bulk flush and answer 202 straight away.
+        """
+        if settings.ATTENDANCE_LOG_BUFFER and log_buffer.enqueue(request.user.pk, log_action, timezone.now()):
+            return Response({"message": f"{log_action.capitalize()} queued."}, status=status.HTTP_202_ACCEPTED)
+        AttendanceLog.objects.create(user=request.user, action=log_action)
+        return Response({"message": f"{log_action.capitalize()} recorded."}, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def login_log(self, request):
         """Log student login"""
-        AttendanceLog.objects.create(user=request.user, action="login")
-        return Response({"message": "Login recorded."}, status=status.HTTP_201_CREATED)
+        return self.record(request, "login")
 
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def logout_log(self, request):
         """Log student logout"""
-        AttendanceLog.objects.create(user=request.user, action="logout")
-        return Response({"message": "Logout recorded."}, status=status.HTTP_201_CREATED)
+        return self.record(request, "logout")
+
+    @action(detail=False, methods=['get'], url_path='buffer-stats')
+    def buffer_stats(self, request):
+        """Queue depth, flush latency and drop counters of this worker's log buffer"""
+        return Response(log_buffer.stats())
+
+    @action(detail=False, methods=['get'], renderer_classes=api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer, CSVRenderer])
+    def history(self, request):
+        """
+        Logs dated ?from=YYYY-MM-DD to ?to=YYYY-MM-DD (optionally ?user=<id>,
+        ?action=login|logout), read from the archive for the part of the range
+        archive_logs has moved out and from the table for the rest. Streams
+        NDJSON (default) or CSV; ?summary=1 returns the archived monthly
+        counts for the range instead.
+        """
+        try:
+            start_date = datetime.strptime(request.query_params['from'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(request.query_params['to'], '%Y-%m-%d').date()
+            user_id = int(request.query_params['user']) if request.query_params.get('user') else None
+        except (KeyError, ValueError):
+            return Response({"error": "from and to (YYYY-MM-DD) are required; user must be an id"}, status=status.HTTP_400_BAD_REQUEST)
+        log_action = request.query_params.get('action') or None
+
+        if request.query_params.get('summary'):
+            summaries = AttendanceLogArchive.objects.filter(month__range=[month_of(start_date), month_of(end_date)])
+            if user_id is not None:
+                summaries = summaries.filter(user_id=user_id)
+            if log_action is not None:
+                summaries = summaries.filter(action=log_action)
+            return Response(list(summaries.order_by('month', 'user_id', 'action').values(
+                'month', 'user', 'action', 'count', 'first_timestamp', 'last_timestamp'
+            )))
+
+        export_format = request.accepted_renderer.format
+        if export_format not in EXPORT_FORMATS:
+            export_format = NDJSONRenderer.format
+        rows = read_logs(start_date, end_date, user_id, log_action)
+        return streaming_export(rows, LOG_FIELDS, export_format, f'attendance-logs-{start_date}-{end_date}')
 
 class AttendanceUpdateView(APIView):
     permission_classes = [IsAdmin]
     
+    @transaction.atomic
     def put(self, request, pk):
         try:
-            attendance_record = Attendance.objects.get(id=pk)
+            attendance_record = Attendance.objects.select_for_update().get(id=pk)
             
             # Creating a copy of request data without read-only fields
             update_data = request.data.copy()
@@ -193,17 +346,17 @@ class StudentDetailView(APIView):
         except CustomUser.DoesNotExist:
             return Response({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
 
-class ClockInView(APIView):
-    authentication_classes = [JWTAuthentication]
+class ClockInView(AsyncAPIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
-    def post(self, request):
+    async def post(self, request):
         student = request.user
         now = timezone.now()
         today = now.date()
         
         # Create or update attendance record
-        attendance, created = Attendance.objects.update_or_create(
+        attendance, created = await Attendance.objects.aupdate_or_create(
             user=student,
             date=today,
             defaults={
@@ -212,8 +365,9 @@ class ClockInView(APIView):
             }
         )
         
-        # Calculate the updated present count
-        present_count = Attendance.objects.filter(user=student, status='present').count()
+        # Updated present count, kept current by the write above
+        present_count = (await aget_attendance_counter(student.id)).present
+        await apublish_attendance('clock_in', attendance, student, now)
         
         return Response({
             "message": "Clocked in successfully",
@@ -222,31 +376,20 @@ class ClockInView(APIView):
             "updated_present_count": present_count  # Added field
         }, status=status.HTTP_201_CREATED)
 
-class ClockOutView(APIView):
-    authentication_classes = [JWTAuthentication]
+class ClockOutView(AsyncAPIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
-    def post(self, request):
-        student = request.user
+    async def post(self, request):
         now = timezone.now()
-        today = now.date()
-        
-        # Get today's attendance record
-        attendance = Attendance.objects.filter(
-            user=student,
-            date=today
-        ).first()
+        attendance = await sync_to_async(self.clock_out)(request.user, now)
 
         if not attendance:
             return Response(
                 {"error": "No attendance record found for today"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-            
-        # Update the attendance record
-        attendance.clock_out_time = now.time()
-        attendance.status = 'present'  # Ensure status is marked present
-        attendance.save()
+        await apublish_attendance('clock_out', attendance, request.user, now)
         
         return Response(
             {
@@ -255,19 +398,73 @@ class ClockOutView(APIView):
             },
             status=status.HTTP_200_OK
         )
+
+    # The async ORM has no transactions; the locked read-modify-write runs in one thread
+    @staticmethod
+    @transaction.atomic
+    def clock_out(student, now):
+        # Get today's attendance record
+        attendance = Attendance.objects.select_for_update().filter(
+            user=student,
+            date=now.date()
+        ).first()
+
+        if attendance:
+            # Update the attendance record
+            attendance.clock_out_time = now.time()
+            attendance.status = 'present'  # Ensure status is marked present
+            attendance.save()
+        return attendance
     
+class BatchClockView(APIView):
+    """
+    Apply a burst of gate/kiosk scans: {"events": [{"student_id", "action", "timestamp"}]}
+    where action is clock_in or clock_out and timestamp defaults to now.
+    Returns one result per event, in order. Admins only: a scanner posts
+    with an admin account's token.
+    """
+    permission_classes = [IsAdmin]
+
+    def post(self, request):
+        batch = ClockEventBatchSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+
+        now = timezone.now()
+        valid, results = [], []
+        for index, item in enumerate(batch.validated_data['events']):
+            event = ClockEventSerializer(data=item)
+            if event.is_valid():
+                valid.append((index, {'timestamp': now, **event.validated_data}))
+            else:
+                results.append({'index': index, 'student_id': item.get('student_id'), 'action': item.get('action'), 'ok': False, 'error': event.errors})
+
+        applied = apply_clock_events([event for _, event in valid])
+        for (index, _), result in zip(valid, applied):
+            result['index'] = index
+            results.append(result)
+        results.sort(key=lambda result: result['index'])
+        if valid:
+            publish_counters()
+
+        return Response({
+            "processed": sum(result['ok'] for result in results),
+            "failed": sum(not result['ok'] for result in results),
+            "results": results,
+        }, status=status.HTTP_200_OK)
+
 class TotalStudentsView(APIView):
+    @cached_response('students')
     def get(self, request):
-        total_students = CustomUser.objects.filter(role='student').count()
+        total_students = today_summary()["total"]
         return Response({"total": total_students}, status=status.HTTP_200_OK)
 
-class AttendanceStatusView(APIView):
-    authentication_classes = [JWTAuthentication]
+class AttendanceStatusView(AsyncAPIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
-    def get(self, request, student_id):  
+    async def get(self, request, student_id):  
         try:
-            student = CustomUser.objects.filter(Q(id=student_id) | Q(student_id=student_id)).first()
+            student = await CustomUser.objects.filter(Q(id=student_id) | Q(student_id=student_id)).only('id').afirst()
             
             if not student:
                 return Response({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -275,12 +472,12 @@ class AttendanceStatusView(APIView):
             today = timezone.now().date()
             
             # Check if clocked in today and not yet clocked out
-            is_clocked_in = Attendance.objects.filter(
+            is_clocked_in = await Attendance.objects.filter(
                 user=student,
                 date=today,
                 clock_in_time__isnull=False,
                 clock_out_time__isnull=True
-            ).exists()
+            ).aexists()
             
             return Response({
                 "is_clocked_in": is_clocked_in
@@ -291,23 +488,26 @@ class AttendanceStatusView(APIView):
         
 class AttendanceTodayView(APIView):
     def get(self, request):
-        today = timezone.now().date()
-        total_students = CustomUser.objects.filter(role='student').count()
-        present_students = Attendance.objects.filter(date=today, status='present').count()
-        attendance_percentage = (present_students / total_students) * 100 if total_students > 0 else 0
+        attendance_percentage = today_summary()["attendancePercentage"]
         return Response({"attendancePercentage": attendance_percentage}, status=status.HTTP_200_OK)
 
 class AbsentStudentsView(APIView):
     def get(self, request):
-        today = timezone.now().date()
-        absent_students = Attendance.objects.filter(date=today, status='absent').count()
+        absent_students = today_summary()["absentCount"]
         return Response({"absentCount": absent_students}, status=status.HTTP_200_OK)
 
 class AttendancePercentageView(APIView):
+    @cached_response('attendance', 'students')
     def get(self, request):
+        snapshot = current_snapshot()
+        if snapshot is not None:
+            serializer = AttendancePercentageSerializer(snapshot.attendance_percentages(), many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        # Students with no counter row have no attendance yet
         attendance_data = CustomUser.objects.filter(role='student').annotate(
-            total_attendance=Count('attendance_records'),
-            present_attendance=Count('attendance_records', filter=Q(attendance_records__status='present')),
+            total_attendance=Coalesce('attendance_counter__total', 0),
+            present_attendance=Coalesce('attendance_counter__present', 0),
         ).annotate(
             attendance_percentage=Case(
                 When(total_attendance=0, then=Value(0.0)),
@@ -317,7 +517,7 @@ class AttendancePercentageView(APIView):
                 ),
                 output_field=FloatField()
             )
-        ).values('id', 'username', 'attendance_percentage')
+        ).order_by('id').values('id', 'username', 'attendance_percentage')
 
         serializer = AttendancePercentageSerializer(attendance_data, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -325,75 +525,155 @@ class AttendancePercentageView(APIView):
 class DepartmentStatsView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @cached_response('departments')
     def get(self, request):
-        department_stats = Department.objects.annotate(
-            student_count=Count('students')
-        ).values('name', 'student_count')
-        serializer = DepartmentStatsSerializer(department_stats, many=True)
+        serializer = DepartmentStatsSerializer(department_stats(), many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
-class StudentReportView(APIView):
+class DashboardView(APIView):
+    """
+    Everything the admin dashboard shows in one response: the total,
+    today and absent counts, department stats, recent attendance and
+    upcoming events (see edulog_app.dashboard).
+    """
+    permission_classes = [IsAdmin]
+
     def get(self, request):
+        return Response(get_dashboard(), status=status.HTTP_200_OK)
+
+class CohortAnalyticsView(APIView):
+    """
+    Attendance analytics for every student over a date range (default the
+    last 90 days): chronic absentees, daily and rolling 7/30-day rates and
+    department comparisons (see edulog_app.analytics).
+    """
+    permission_classes = [IsAdmin]
+    DEFAULT_DAYS = 90
+    # One academic year and some slack; longer ranges would build calendars for every student and year
+    MAX_DAYS = 400
+
+    @cached_response('attendance', 'students', 'departments')
+    def get(self, request):
+        today = timezone.now().date()
+        try:
+            end_date = datetime.strptime(request.query_params.get('endDate', str(today)), '%Y-%m-%d').date()
+            start_date = request.query_params.get('startDate')
+            start_date = (datetime.strptime(start_date, '%Y-%m-%d').date() if start_date
+                          else end_date - timedelta(days=self.DEFAULT_DAYS - 1))
+            threshold = float(request.query_params.get('threshold', CHRONIC_THRESHOLD))
+            limit = int(request.query_params.get('limit', 100))
+        except ValueError:
+            return Response({"error": "Dates must be YYYY-MM-DD; threshold and limit must be numbers"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if start_date > end_date:
+            return Response({"error": "startDate must not be after endDate"}, status=status.HTTP_400_BAD_REQUEST)
+        if (end_date - start_date).days >= self.MAX_DAYS:
+            return Response({"error": f"The range must not be longer than {self.MAX_DAYS} days"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        years = served_years(today)
+        if academic_year(start_date) not in years or academic_year(end_date) not in years:
+            return Response({"error": f"Dates must fall in the academic years {years[0]} to {years[-1]}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if limit < 0:
+            return Response({"error": "limit must not be negative"}, status=status.HTTP_400_BAD_REQUEST)
+
+        department_id = None
+        department_filter = request.query_params.get('departmentFilter')
+        if department_filter:
+            department_id = Department.objects.filter(name=department_filter).values_list('id', flat=True).first()
+            if department_id is None:
+                return Response({"error": "Department not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        report = cohort_report(start_date, end_date, department_id, threshold=threshold, limit=limit)
+        return Response(report, status=status.HTTP_200_OK)
+
+class StudentReportView(APIView):
+    # ?format=csv / ?format=ndjson stream the report instead of returning JSON
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [CSVRenderer, NDJSONRenderer]
+
+    REPORT_FIELDS = ['attendanceDate', 'studentName', 'status', 'department', 'attendancePercentage']
+
+    def get_report_rows(self, request, chunk_size=REPORT_CHUNK_SIZE):
         # Extract filters from query parameters
         start_date = request.query_params.get('startDate')
         end_date = request.query_params.get('endDate')
-        status_filter = request.query_params.get('statusFilter')
-        department_filter = request.query_params.get('departmentFilter')
-        student_name_filter = request.query_params.get('studentNameFilter')
-
-        # filters for attendance records
-        attendance_filters = Q()
         if start_date and end_date:
             start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-            attendance_filters &= Q(attendance_records__date__range=[start_date, end_date])
-        if status_filter:
-            attendance_filters &= Q(attendance_records__status=status_filter)
-        if student_name_filter:
-            attendance_filters &= Q(username__icontains=student_name_filter)
-
-        # Fetch and annotate data
-        report_data = CustomUser.objects.filter(
-            role='student',
-            **({'department__name': department_filter} if department_filter else {})
-        ).annotate(
-            total_attendance=Count('attendance_records', filter=attendance_filters),
-            present_attendance=Count('attendance_records', 
-                                   filter=attendance_filters & Q(attendance_records__status='present')),
-            absent_attendance=Count('attendance_records', 
-                                  filter=attendance_filters & Q(attendance_records__status='absent')),
-            latest_attendance_date=Max('attendance_records__date', filter=attendance_filters),
-        ).annotate(
-            attendance_percentage=Case(
-                When(total_attendance=0, then=Value(0.0)),
-                default=ExpressionWrapper(
-                    F('present_attendance') * 100.0 / F('total_attendance'),
-                    output_field=FloatField()
-                ),
-                output_field=FloatField()
-            )
-        ).values(
-            'id', 'username', 'student_id', 'department__name',
-            'total_attendance', 'present_attendance', 'absent_attendance',
-            'attendance_percentage', 'latest_attendance_date'
+
+        # Whole months come from the monthly summary, edge days from raw rows
+        return student_report(
+            start_date, end_date,
+            status_filter=request.query_params.get('statusFilter'),
+            department_filter=request.query_params.get('departmentFilter'),
+            student_name_filter=request.query_params.get('studentNameFilter'),
+            chunk_size=chunk_size,
         )
 
+    @staticmethod
+    def format_report_row(record):
         # Format data for the frontend
-        formatted_data = []
-        for record in report_data:
-            formatted_data.append({
-                'attendanceDate': record['latest_attendance_date'] if record['latest_attendance_date'] else 'N/A',
-                'studentName': record['username'],
-                'status': 'present' if record['present_attendance'] > 0 else 'absent',
-                'department': record['department__name'] if record['department__name'] else 'N/A',
-                'attendancePercentage': record['attendance_percentage'],
-            })
+        return {
+            'attendanceDate': record['latest_attendance_date'] if record['latest_attendance_date'] else 'N/A',
+            'studentName': record['username'],
+            'status': 'present' if record['present_attendance'] > 0 else 'absent',
+            'department': record['department__name'] if record['department__name'] else 'N/A',
+            'attendancePercentage': record['attendance_percentage'],
+        }
+
+    # Only the JSON report is cached; streamed exports always run the query
+    @cached_response('attendance', 'students', 'departments')
+    def get(self, request):
+        export_format = request.accepted_renderer.format
+        if export_format in EXPORT_FORMATS:
+            rows = self.get_report_rows(request, chunk_size=EXPORT_CHUNK_SIZE)
+            return streaming_export(
+                (self.format_report_row(record) for record in rows),
+                self.REPORT_FIELDS, export_format, 'student-report'
+            )
 
+        formatted_data = [self.format_report_row(record) for record in self.get_report_rows(request)]
         return Response(formatted_data, status=status.HTTP_200_OK)
 
+class AttendanceExportView(APIView):
+    """Stream raw attendance records for a date range as CSV (default) or NDJSON."""
+    permission_classes = [IsAdmin]
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [CSVRenderer, NDJSONRenderer]
+
+    EXPORT_FIELDS = ['id', 'date', 'student_id', 'student_name', 'department', 'status', 'clock_in_time', 'clock_out_time']
+
+    def get(self, request):
+        try:
+            start_date = datetime.strptime(request.query_params['startDate'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(request.query_params['endDate'], '%Y-%m-%d').date()
+        except (KeyError, ValueError):
+            return Response({"error": "startDate and endDate (YYYY-MM-DD) are required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        records = Attendance.objects.filter(date__range=[start_date, end_date])
+        status_filter = request.query_params.get('statusFilter')
+        department_filter = request.query_params.get('departmentFilter')
+        if status_filter:
+            records = records.filter(status=status_filter)
+        if department_filter:
+            records = records.filter(user__department__name=department_filter)
+
+        rows = records.order_by('date', 'id').values(
+            'id', 'date', 'status', 'clock_in_time', 'clock_out_time',
+            student_id=F('user__student_id'),
+            student_name=F('user__username'),
+            department=F('user__department__name'),
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+        export_format = request.accepted_renderer.format
+        if export_format not in EXPORT_FORMATS:
+            export_format = CSVRenderer.format
+        return streaming_export(rows, self.EXPORT_FIELDS, export_format, f'attendance-{start_date}-{end_date}')
+
 class ReportFilterOptionsView(APIView):
     permission_classes = [IsAdmin]
     
+    @conditional_get(Department)
+    @cached_response('departments')
     def get(self, request):
         # all available filter options
         departments = Department.objects.values_list('name', flat=True).distinct()
@@ -404,50 +684,60 @@ class ReportFilterOptionsView(APIView):
             'status_choices': status_choices
         })
 
+class ResponseCacheStatsView(APIView):
+    """Hit/miss counts of the response cache in this worker, per view"""
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return Response(cache_stats(), status=status.HTTP_200_OK)
+
 class StudentSearchView(APIView):
     permission_classes = [IsAdmin]
     
     def get(self, request):
         search_query = request.query_params.get('q', '')
-        
-        students = CustomUser.objects.filter(
-            Q(role='student') & 
-            (Q(username__icontains=search_query) | 
-             Q(student_id__icontains=search_query))
-        ).values('id', 'username', 'student_id')[:10]  # Limit to 10 results
-        
+        # Ranked: exact student id, then prefix, then substring matches (max 10)
+        students = search_students(search_query)
         return Response(students)
 
+class LiveFeedView(AsyncAPIView):
+    """
+    Server-sent events for the admin dashboard: today's counters on
+    connect, then each clock-in and clock-out with the updated counters
+    (see edulog_app.live_feed). Needs an ASGI server; under WSGI the
+    stream would hold a worker for as long as it is open.
+    """
+    permission_classes = [IsAdmin]
+
+    async def get(self, request):
+        response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Stop nginx-style proxies from buffering the stream
+        return response
+
 class RecentAttendanceLogsView(APIView):
     permission_classes = [IsAdmin]
     
     def get(self, request):
-        logs = Attendance.objects.select_related('user').order_by('-date', '-id')[:10]
-        data = [{
-            'student_name': log.user.username,
-            'student_id': log.user.student_id,
-            'date': log.date.strftime('%Y-%m-%d'),
-            'status': log.status
-        } for log in logs]
-        return Response(data)
+        return Response(recent_attendance())
 
 class UpcomingEventsView(APIView):
     permission_classes = [IsAuthenticated]
     
+    # What counts as upcoming also moves with the date
+    @conditional_get(SchoolEvent, vary=lambda request: timezone.now().date())
     def get(self, request):
-        today = timezone.now().date()
-        events = SchoolEvent.objects.filter(date__gte=today).order_by('date')[:5]
-        data = [{
-            'title': event.title,
-            'date': event.date.strftime('%Y-%m-%d'),
-            'location': event.location,
-            'description': event.description
-        } for event in events]
-        return Response(data)
+        return Response(upcoming_events())
     
 class EventListCreateView(generics.ListCreateAPIView):
     queryset = SchoolEvent.objects.all().order_by('-date')
     serializer_class = SchoolEventSerializer
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-date', '-id')
+
+    @conditional_get(SchoolEvent)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 class EventRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     queryset = SchoolEvent.objects.all()
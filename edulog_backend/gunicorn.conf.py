@@ -0,0 +1,11 @@
+# Read by gunicorn from the directory it starts in; the Procfile and
+# render.yaml pass the worker class and count on the command line.
+
+
+def post_worker_init(worker):
+    # Map the analytics snapshot, building it if this host has none or it
+    # is stale, once the worker has forked and loaded Django: a refresh
+    # thread or database connection opened before the fork (--preload, or
+    # any import of edulog.wsgi/asgi) would be shared by every worker.
+    from edulog_app.snapshot import warm_snapshot
+    warm_snapshot()
@@ -26,6 +26,7 @@ import {
 import { useNavigate } from 'react-router-dom';
 import CustomAppBar from '../components//CustomAppBar';
 import axiosInstance from '../utils/axiosInstance';
+import { subscribeLiveFeed } from '../utils/liveFeed';
 import EventIcon from '@mui/icons-material/Event';
 import PersonIcon from '@mui/icons-material/Person';
 import CheckCircleIcon from '@mui/icons-material/CheckCircle';
@@ -63,42 +64,19 @@ const AdminHome = () => {
         const storedUsername = sessionStorage.getItem('username');
         if (storedUsername) setUsername(storedUsername);
 
-        // 2. Fetch total students
-        const totalRes = await axiosInstance.get('/api/attendance/stats/total-students/');
-        setTotalStudents(totalRes.data.total);
+        // 2. Fetch every dashboard card in one request
+        const dashboardRes = await axiosInstance.get('/api/dashboard/');
+        setTotalStudents(dashboardRes.data.total);
+        setAttendanceToday(dashboardRes.data.attendancePercentage);
+        setAbsentStudents(dashboardRes.data.absentCount);
+        setDepartmentStats(dashboardRes.data.departmentStats);
+        setRecentLogs(dashboardRes.data.recentLogs);
+        setUpcomingEvents(dashboardRes.data.upcomingEvents);
 
-        // 3. Fetch today's attendance
-        const todayRes = await axiosInstance.get('/api/attendance/stats/attendance-today/');
-        setAttendanceToday(todayRes.data.attendancePercentage);
-
-        // 4. Fetch absent students
-        const absentRes = await axiosInstance.get('/api/attendance/stats/absent-students/');
-        setAbsentStudents(absentRes.data.absentCount);
-
-        // 5. Fetch department stats
-        const deptRes = await axiosInstance.get('/api/students/stats/department-wise/');
-        setDepartmentStats(deptRes.data);
-
-        // 6. Fetch attendance percentages
+        // 3. Fetch attendance percentages
         const percentageRes = await axiosInstance.get('/api/attendance/stats/percentage/');
         setAttendanceData(percentageRes.data);
 
-        // 7. Try to fetch recent logs (optional)
-        try {
-          const logsRes = await axiosInstance.get('/api/attendance/recent-logs/');
-          setRecentLogs(logsRes.data);
-        } catch (e) {
-          console.log('Recent logs not available');
-        }
-
-        // 8. Try to fetch events (optional)
-        try {
-          const eventsRes = await axiosInstance.get('/api/events/upcoming/');
-          setUpcomingEvents(eventsRes.data);
-        } catch (e) {
-          console.log('Events not available');
-        }
-
       } catch (error) {
         console.error('Error fetching data:', error);
       } finally {
@@ -109,6 +87,14 @@ const AdminHome = () => {
     fetchData();
   }, []);
 
+  // Counters and recent logs pushed by the server as students clock in and out
+  useEffect(() => subscribeLiveFeed((event) => {
+    setTotalStudents(event.counters.total);
+    setAttendanceToday(event.counters.attendancePercentage);
+    setAbsentStudents(event.counters.absentCount);
+    if (event.log) setRecentLogs((logs) => [event.log, ...logs].slice(0, 10));
+  }), []);
+
   // Chart data functions (same as before)
   const getDepartmentChartData = () => ({
     labels: departmentStats.map(stat => stat.name),
@@ -6,6 +6,7 @@ import { Box, Typography, Table, TableBody, TableCell, TableContainer,
 import { Edit, Delete } from '@mui/icons-material';
 import CustomAppBar from '../components/CustomAppBar';
 import axiosInstance from '../utils/axiosInstance';
+import { fetchAllPages } from '../utils/api';
 
 const AttendanceManagement = () => {
     const [attendanceRecords, setAttendanceRecords] = useState([]);
@@ -29,8 +30,7 @@ const AttendanceManagement = () => {
 
     const fetchAttendanceRecords = useCallback(async () => {
         try {
-            const response = await axiosInstance.get('/admin/attendance/');
-            setAttendanceRecords(response.data);
+            setAttendanceRecords(await fetchAllPages('/admin/attendance/'));
         } catch (error) {
             console.error('Fetch error:', error);
             setSnackbar({
@@ -16,6 +16,7 @@ import { Calendar } from 'react-calendar';
 import 'react-calendar/dist/Calendar.css';
 import { styled } from '@mui/system';
 import axiosInstance from '../utils/axiosInstance';
+import { fetchAllPages } from '../utils/api';
 import CustomAppBar from '../components//CustomAppBar';
 import EventIcon from '@mui/icons-material/Event';
 import AddIcon from '@mui/icons-material/Add';
@@ -46,8 +47,7 @@ const CalendarPage = () => {
     const fetchEvents = async () => {
       try {
         setLoading(true);
-        const response = await axiosInstance.get('/api/events/');
-        setEvents(response.data);
+        setEvents(await fetchAllPages('/api/events/'));
       } catch (error) {
         console.error('Error fetching events:', error);
       } finally {
@@ -33,10 +33,22 @@ export const registerUser = async (userData) => {
     }
 }
 
+// List endpoints are cursor-paginated ({ next, previous, results });
+// follow the `next` links and return every row.
+export const fetchAllPages = async (url) => {
+  const rows = [];
+  let next = url;
+  while (next) {
+    const response = await axiosInstance.get(next);
+    rows.push(...response.data.results);
+    next = response.data.next;
+  }
+  return rows;
+};
+
 export const fetchDepartments = async () => {
   try {
-    const response = await axiosInstance.get('/departments/');
-    return response.data;
+    return await fetchAllPages('/departments/');
   } catch (error) {
     console.error('Error fetching departments:', error);
     throw error;
@@ -94,8 +106,7 @@ export const fetchAttendanceData = async (student_id) => {
 
 export const fetchAllAttendanceRecords = async () => {
   try {
-    const response = await axiosInstance.get('/admin/attendance/');
-    return response.data;
+    return await fetchAllPages('/admin/attendance/');
   } catch (error) {
     console.error('API Error:', error.response || error);
     throw error.response?.data || { error: 'Failed to fetch records' };
@@ -1,6 +1,6 @@
 import axios from 'axios';
 
-const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:5000/';
+export const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:5000/';
 
 const axiosInstance = axios.create({
   baseURL: API_BASE_URL,
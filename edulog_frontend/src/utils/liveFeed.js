@@ -0,0 +1,55 @@
+import { API_BASE_URL } from './axiosInstance';
+
+const LIVE_FEED_URL = `${API_BASE_URL.replace(/\/$/, '')}/api/attendance/live/`;
+const MAX_RETRY_DELAY = 30000;
+
+// Reads the dashboard's server-sent events and calls onEvent with each
+// parsed event, reconnecting with backoff. EventSource cannot send the
+// Authorization header, so the stream is read with fetch.
+// Returns a function that closes the feed.
+export const subscribeLiveFeed = (onEvent) => {
+  const controller = new AbortController();
+  let retryDelay = 1000;
+
+  const connect = async () => {
+    while (!controller.signal.aborted) {
+      try {
+        const response = await fetch(LIVE_FEED_URL, {
+          headers: {
+            Accept: 'text/event-stream',
+            Authorization: `Bearer ${sessionStorage.getItem('access_token')}`,
+          },
+          signal: controller.signal,
+        });
+        if (!response.ok) throw new Error(`Live feed returned ${response.status}`);
+        retryDelay = 1000;
+
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += value;
+          const messages = buffer.split('\n\n');
+          buffer = messages.pop();
+          messages.forEach((message) => {
+            const data = message
+              .split('\n')
+              .filter((line) => line.startsWith('data: '))
+              .map((line) => line.slice(6))
+              .join('\n');
+            if (data) onEvent(JSON.parse(data));
+          });
+        }
+      } catch (error) {
+        if (controller.signal.aborted) return;
+        console.error('Live feed disconnected:', error);
+      }
+      await new Promise((resolve) => setTimeout(resolve, retryDelay));
+      retryDelay = Math.min(retryDelay * 2, MAX_RETRY_DELAY);
+    }
+  };
+
+  connect();
+  return () => controller.abort();
+};